@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+CPU cost of touchpad_viewer.py at idle and under multi-finger load.
+
+Creates a virtual multitouch touchpad with uinput, starts the viewer on it and samples the
+viewer's CPU time and context switches from /proc, first with the pad idle and then while
+N fingers circle at the given report rate. Pass several viewer scripts to compare revisions:
+
+  git show HEAD~1:old/touchpad_viewer.py > /tmp/viewer_before.py
+  sudo ./bench_viewer.py /tmp/viewer_before.py touchpad_viewer.py --fingers 5
+
+Needs /dev/uinput, PyQt6 and a display (or --offscreen). No results are recorded for the
+viewer rework this was written for: it has not been run against the old and new viewer yet.
+"""
+
+import argparse
+import math
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+from evdev import AbsInfo, UInput, ecodes
+
+PAD_X = 3000
+PAD_Y = 2000
+MAX_SLOTS = 10
+
+
+def make_touchpad() -> UInput:
+    abs_axes = [
+        (ecodes.ABS_X, AbsInfo(0, 0, PAD_X, 0, 0, 30)),
+        (ecodes.ABS_Y, AbsInfo(0, 0, PAD_Y, 0, 0, 30)),
+        (ecodes.ABS_MT_SLOT, AbsInfo(0, 0, MAX_SLOTS - 1, 0, 0, 0)),
+        (ecodes.ABS_MT_TRACKING_ID, AbsInfo(0, 0, 65535, 0, 0, 0)),
+        (ecodes.ABS_MT_POSITION_X, AbsInfo(0, 0, PAD_X, 0, 0, 30)),
+        (ecodes.ABS_MT_POSITION_Y, AbsInfo(0, 0, PAD_Y, 0, 0, 30)),
+        (ecodes.ABS_MT_PRESSURE, AbsInfo(0, 0, 255, 0, 0, 0)),
+    ]
+    keys = [ecodes.BTN_LEFT, ecodes.BTN_TOUCH, ecodes.BTN_TOOL_FINGER]
+    return UInput(
+        {ecodes.EV_ABS: abs_axes, ecodes.EV_KEY: keys},
+        name="bench-viewer touchpad",
+        input_props=[ecodes.INPUT_PROP_POINTER],
+    )
+
+
+def cpu_sample(pid: int) -> Tuple[float, int]:
+    # (user + system CPU seconds, voluntary + involuntary context switches)
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    ticks = int(fields[11]) + int(fields[12])
+    switches = 0
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(("voluntary_ctxt_switches", "nonvoluntary_ctxt_switches")):
+                switches += int(line.split()[1])
+    return ticks / os.sysconf("SC_CLK_TCK"), switches
+
+
+def touch_frames(ui: UInput, fingers: int, rate: int, seconds: float):
+    # N fingers on circles around the pad centre, one SYN_REPORT frame per report period
+    for slot in range(fingers):
+        ui.write(ecodes.EV_ABS, ecodes.ABS_MT_SLOT, slot)
+        ui.write(ecodes.EV_ABS, ecodes.ABS_MT_TRACKING_ID, 100 + slot)
+    ui.write(ecodes.EV_KEY, ecodes.BTN_TOUCH, 1)
+    ui.syn()
+
+    period = 1.0 / rate
+    start = time.monotonic()
+    frame = 0
+    while True:
+        due = start + frame * period
+        now = time.monotonic()
+        if now - start >= seconds:
+            break
+        if due > now:
+            time.sleep(due - now)
+        t = frame * period
+        for slot in range(fingers):
+            angle = t * 2.0 + slot * 2.0 * math.pi / fingers
+            radius = 300 + 80 * slot
+            ui.write(ecodes.EV_ABS, ecodes.ABS_MT_SLOT, slot)
+            ui.write(ecodes.EV_ABS, ecodes.ABS_MT_POSITION_X, int(PAD_X / 2 + radius * math.cos(angle)))
+            ui.write(ecodes.EV_ABS, ecodes.ABS_MT_POSITION_Y, int(PAD_Y / 2 + radius * math.sin(angle)))
+            ui.write(ecodes.EV_ABS, ecodes.ABS_MT_PRESSURE, 40 + slot)
+        ui.syn()
+        frame += 1
+
+    for slot in range(fingers):
+        ui.write(ecodes.EV_ABS, ecodes.ABS_MT_SLOT, slot)
+        ui.write(ecodes.EV_ABS, ecodes.ABS_MT_TRACKING_ID, -1)
+    ui.write(ecodes.EV_KEY, ecodes.BTN_TOUCH, 0)
+    ui.syn()
+
+
+def measure(pid: int, seconds: float, load=None) -> Dict[str, float]:
+    cpu0, sw0 = cpu_sample(pid)
+    t0 = time.monotonic()
+    if load is None:
+        time.sleep(seconds)
+    else:
+        load(seconds)
+    elapsed = time.monotonic() - t0
+    cpu1, sw1 = cpu_sample(pid)
+    return {"cpu_pct": 100.0 * (cpu1 - cpu0) / elapsed, "switches_per_s": (sw1 - sw0) / elapsed}
+
+
+def bench(viewer: str, ui: UInput, args) -> List[Tuple[str, Dict[str, float]]]:
+    env = dict(os.environ)
+    if args.offscreen:
+        env["QT_QPA_PLATFORM"] = "offscreen"
+    proc = subprocess.Popen([sys.executable, viewer, ui.device.path], env=env)
+    try:
+        time.sleep(args.settle)
+        if proc.poll() is not None:
+            raise SystemExit(f"{viewer} exited with {proc.returncode}")
+        idle = measure(proc.pid, args.idle)
+        busy = measure(proc.pid, args.load, lambda s: touch_frames(ui, args.fingers, args.rate, s))
+    finally:
+        proc.terminate()
+        proc.wait()
+    return [("idle", idle), (f"{args.fingers} fingers @ {args.rate} Hz", busy)]
+
+
+def main():
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="touchpad_viewer.py CPU use at idle and under load")
+    parser.add_argument("viewers", nargs="*", default=[os.path.join(here, "touchpad_viewer.py")])
+    parser.add_argument("--fingers", type=int, default=5, help=f"fingers down under load (max {MAX_SLOTS})")
+    parser.add_argument("--rate", type=int, default=240, help="report rate in Hz")
+    parser.add_argument("--idle", type=float, default=10.0, help="seconds measured with the pad idle")
+    parser.add_argument("--load", type=float, default=10.0, help="seconds measured under load")
+    parser.add_argument("--settle", type=float, default=2.0, help="seconds to let the viewer start")
+    parser.add_argument("--offscreen", action="store_true", help="run the viewer with QT_QPA_PLATFORM=offscreen")
+    args = parser.parse_args()
+    args.fingers = max(1, min(MAX_SLOTS, args.fingers))
+
+    ui = make_touchpad()
+    try:
+        time.sleep(0.5)  # let udev create the device node
+        for viewer in args.viewers:
+            print(viewer)
+            for label, r in bench(viewer, ui, args):
+                print(f"  {label:22s} cpu {r['cpu_pct']:6.2f} %   context switches {r['switches_per_s']:8.1f} /s")
+    finally:
+        ui.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -5,19 +5,30 @@ Touchpad MT visualizer (Arch Linux)
 - Draws touch points on a canvas normalized to touchpad coordinate range
 - Uses evdev MT protocol: ABS_MT_SLOT, ABS_MT_TRACKING_ID, ABS_MT_POSITION_X/Y, etc.
 
+Event driven: the evdev fd is watched with a QSocketNotifier, events are applied a whole
+SYN_REPORT frame at a time, and repaints are limited to the rectangles of fingers that changed,
+coalesced to one UI update per display refresh. An idle pad costs no wakeups.
+
+Optional overlays: --trails SECONDS draws each slot's recent path from a fixed-size NumPy ring
+as one polyline, --heatmap accumulates an occupancy map into a cached QImage that is updated
+only at the cells new samples land in.
+
 Usage:
-  sudo ./touchpad_viewer.py /dev/input/eventXX
+  sudo ./touchpad_viewer.py /dev/input/eventXX [--trails 2] [--heatmap]
 """
 
+import argparse
+import math
 import sys
 import time
 from dataclasses import dataclass, field
-from typing import Dict, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
+import numpy as np
 from evdev import InputDevice, categorize, ecodes
 
-from PyQt6.QtCore import Qt, QTimer, QRectF
-from PyQt6.QtGui import QPainter, QPen, QFont
+from PyQt6.QtCore import Qt, QTimer, QPointF, QRect, QRectF, QSocketNotifier
+from PyQt6.QtGui import QColor, QImage, QPainter, QPen, QFont, QFontMetrics, QPolygonF, QRegion
 from PyQt6.QtWidgets import (
     QApplication,
     QWidget,
@@ -27,6 +38,14 @@ from PyQt6.QtWidgets import (
     QFrame,
 )
 
+# Fingers that stop reporting fade out between these ages (seconds); see TouchCanvas.paintEvent.
+FADE_START = 0.2
+FADE_END = 1.92  # 255 * 0.6 / age reaches the 80 floor here
+FADE_INTERVAL_MS = 100
+
+# Trail rings are sized for this report rate; faster pads get proportionally shorter trails.
+TRAIL_MAX_RATE = 500
+
 # ---------- Data model ----------
 
 @dataclass
@@ -42,6 +61,116 @@ class Finger:
     def is_active(self) -> bool:
         return self.tracking_id is not None and self.tracking_id != -1
 
+
+class TrailBuffer:
+    """Recent device-space positions per slot, in fixed-size NumPy rings (no per-sample allocation)."""
+
+    def __init__(self, slots: int, seconds: float, max_rate: int = TRAIL_MAX_RATE):
+        self.slots = slots
+        self.seconds = seconds
+        self.capacity = max(2, int(math.ceil(seconds * max_rate)) + 1)
+        self.xs = np.zeros((slots, self.capacity), np.float64)
+        self.ys = np.zeros((slots, self.capacity), np.float64)
+        self.ts = np.zeros((slots, self.capacity), np.float64)
+        self.head = [0] * slots  # next write index
+        self.count = [0] * slots
+        self.newest = [0.0] * slots
+
+    def clear(self, slot: int):
+        if slot < self.slots:
+            self.count[slot] = 0
+
+    def push(self, slot: int, x: int, y: int, t: float):
+        if slot >= self.slots:
+            return
+        i = self.head[slot]
+        self.xs[slot, i] = x
+        self.ys[slot, i] = y
+        self.ts[slot, i] = t
+        self.head[slot] = (i + 1) % self.capacity
+        if self.count[slot] < self.capacity:
+            self.count[slot] += 1
+        self.newest[slot] = t
+
+    def points(self, slot: int, now: float) -> Tuple[np.ndarray, np.ndarray]:
+        # (xs, ys) oldest first, limited to the last `seconds`
+        n = self.count[slot]
+        if n == 0 or now - self.newest[slot] > self.seconds:
+            return self.xs[slot, :0], self.ys[slot, :0]
+        idx = np.arange(self.head[slot] - n, self.head[slot]) % self.capacity
+        start = int(np.searchsorted(self.ts[slot, idx], now - self.seconds))
+        idx = idx[start:]
+        return self.xs[slot, idx], self.ys[slot, idx]
+
+    def live(self, now: float) -> List[int]:
+        # Slots with points still inside the window
+        return [s for s in range(self.slots) if self.count[s] and now - self.newest[s] <= self.seconds]
+
+
+class OccupancyHeatmap:
+    """Touch counts on a coarse grid over the pad, rendered into a QImage that shares the pixel array."""
+
+    def __init__(self, axis_range: Tuple[int, int, int, int], cells: int):
+        min_x, max_x, min_y, max_y = axis_range
+        span_x = max(1, max_x - min_x)
+        span_y = max(1, max_y - min_y)
+        self.origin = (min_x, min_y)
+        self.width = max(1, cells)
+        self.height = max(1, int(round(cells * span_y / span_x)))
+        self.scale = (self.width / (span_x + 1), self.height / (span_y + 1))
+        self.counts = np.zeros(self.width * self.height, np.uint32)
+        self.pixels = np.zeros((self.height, self.width, 4), np.uint8)
+        self.image = QImage(
+            self.pixels.ctypes.data, self.width, self.height, self.width * 4,
+            QImage.Format.Format_ARGB32_Premultiplied,
+        )
+        # Intensity -> premultiplied BGRA (little-endian ARGB32), orange at up to 70% opacity
+        level = np.arange(256, dtype=np.float64) / 255.0
+        alpha = level * 0.7
+        self.lut = np.stack([alpha * 0, alpha * 140, alpha * 255, alpha * 255], axis=1).astype(np.uint8)
+        self.pending_x: List[int] = []
+        self.pending_y: List[int] = []
+
+    def add(self, x: int, y: int):
+        self.pending_x.append(x)
+        self.pending_y.append(y)
+
+    def clear(self):
+        self.counts[:] = 0
+        self.pixels[:] = 0
+        self.pending_x.clear()
+        self.pending_y.clear()
+
+    def flush(self) -> Optional[Tuple[int, int, int, int]]:
+        # Fold pending samples in; returns the (x0, y0, x1, y1) cell box that changed, if any
+        if not self.pending_x:
+            return None
+        cx = ((np.array(self.pending_x) - self.origin[0]) * self.scale[0]).astype(np.int64)
+        cy = ((np.array(self.pending_y) - self.origin[1]) * self.scale[1]).astype(np.int64)
+        self.pending_x.clear()
+        self.pending_y.clear()
+        np.clip(cx, 0, self.width - 1, out=cx)
+        np.clip(cy, 0, self.height - 1, out=cy)
+        cells = cy * self.width + cx
+        np.add.at(self.counts, cells, 1)
+        cells = np.unique(cells)
+        # log scale that does not depend on the maximum, so untouched cells never need redrawing
+        level = np.minimum(255, 32.0 * np.log2(1.0 + self.counts[cells])).astype(np.uint8)
+        self.pixels.reshape(-1, 4)[cells] = self.lut[level]
+        return int(cx.min()), int(cy.min()), int(cx.max()) + 1, int(cy.max()) + 1
+
+
+def polyline(px: np.ndarray, py: np.ndarray) -> QPolygonF:
+    # QPolygonF filled in place through its buffer instead of one QPointF per point
+    poly = QPolygonF()
+    poly.fill(QPointF(), len(px))
+    buf = poly.data()
+    buf.setsize(len(px) * 16)
+    xy = np.frombuffer(buf, np.float64).reshape(-1, 2)
+    xy[:, 0] = px
+    xy[:, 1] = py
+    return poly
+
 # ---------- GUI widgets ----------
 
 class TouchCanvas(QWidget):
@@ -50,21 +179,133 @@ class TouchCanvas(QWidget):
         self.setMinimumHeight(360)
         self.fingers: Dict[int, Finger] = {}
         self.axis_range = None  # (min_x, max_x, min_y, max_y)
+        self.label_font = QFont("Sans", 10)
+        self.label_metrics = QFontMetrics(self.label_font)
+        # Widget rect each finger was last painted in, and the region to repaint on flush()
+        self.drawn: Dict[int, QRect] = {}
+        self.dirty = QRegion()
+        # Optional overlay layers and the rect each slot's trail was last painted in
+        self.trails: Optional[TrailBuffer] = None
+        self.heatmap: Optional[OccupancyHeatmap] = None
+        self.trail_drawn: Dict[int, QRect] = {}
+
+    def set_layers(self, trails: Optional[TrailBuffer], heatmap: Optional[OccupancyHeatmap]):
+        self.trails = trails
+        self.heatmap = heatmap
+        self.trail_drawn.clear()
+        self.update()
 
     def set_state(self, fingers: Dict[int, Finger], axis_range: Tuple[int, int, int, int]):
         self.fingers = fingers
         self.axis_range = axis_range
+        self.drawn.clear()
+        self.dirty = QRegion()
         self.update()
 
+    def pad_rect(self) -> QRect:
+        return self.rect().adjusted(12, 12, -12, -12)
+
+    def map_xy(self, pad_rect: QRect, x, y):
+        # device coords -> canvas coords (scalars or NumPy arrays)
+        min_x, max_x, min_y, max_y = self.axis_range
+        nx = (x - min_x) / max(1, max_x - min_x)
+        ny = (y - min_y) / max(1, max_y - min_y)
+        return pad_rect.left() + nx * pad_rect.width(), pad_rect.top() + ny * pad_rect.height()
+
+    def finger_geometry(self, pad_rect: QRect, slot: int, f: Finger) -> Tuple[QRectF, str, QRect]:
+        # Ellipse, label text and the widget rect covering both (with room for the pen)
+        cx, cy = self.map_xy(pad_rect, f.x, f.y)
+
+        # size hint: touch_major/minor if available, else default
+        major = f.touch_major or 22
+        minor = f.touch_minor or 18
+
+        # scale ellipse size to canvas in a reasonable way
+        # (these MT units vary by device; we just keep it visually useful)
+        ellipse_w = max(10, min(80, int(major * 2)))
+        ellipse_h = max(10, min(80, int(minor * 2)))
+        ellipse = QRectF(cx - ellipse_w / 2, cy - ellipse_h / 2, ellipse_w, ellipse_h)
+
+        label = f"slot {slot}  id {f.tracking_id}"
+        text = self.label_metrics.boundingRect(label).translated(int(cx + 10), int(cy - 10))
+        bounds = ellipse.toAlignedRect().united(text).adjusted(-3, -3, 3, 3)
+        return ellipse, label, bounds
+
+    def mark_dirty(self, slots: Iterable[int]):
+        # Queue the old and new rects of changed fingers; nothing is painted until flush()
+        if not self.axis_range:
+            return
+        pad_rect = self.pad_rect()
+        for slot in slots:
+            old = self.drawn.pop(slot, None)
+            if old is not None:
+                self.dirty += old
+            f = self.fingers.get(slot)
+            if f is None or not f.is_active() or f.x is None or f.y is None:
+                continue
+            bounds = self.finger_geometry(pad_rect, slot, f)[2]
+            self.drawn[slot] = bounds
+            self.dirty += bounds
+
+    def mark_trails(self, slots: Iterable[int], now: float):
+        # Old and new bounding rects of the given slots' trails
+        if not self.axis_range or self.trails is None:
+            return
+        pad_rect = self.pad_rect()
+        for slot in slots:
+            old = self.trail_drawn.pop(slot, None)
+            if old is not None:
+                self.dirty += old
+            xs, ys = self.trails.points(slot, now)
+            if len(xs) < 2:
+                continue
+            x0, y0 = self.map_xy(pad_rect, xs.min(), ys.min())
+            x1, y1 = self.map_xy(pad_rect, xs.max(), ys.max())
+            bounds = QRectF(x0, y0, x1 - x0, y1 - y0).toAlignedRect().adjusted(-3, -3, 3, 3)
+            self.trail_drawn[slot] = bounds
+            self.dirty += bounds
+
+    def mark_heatmap(self, box: Tuple[int, int, int, int]):
+        # Canvas rect covering a box of heatmap cells
+        if not self.axis_range or self.heatmap is None:
+            return
+        pad_rect = self.pad_rect()
+        sx = pad_rect.width() / self.heatmap.width
+        sy = pad_rect.height() / self.heatmap.height
+        x0, y0, x1, y1 = box
+        rect = QRectF(pad_rect.left() + x0 * sx, pad_rect.top() + y0 * sy, (x1 - x0) * sx, (y1 - y0) * sy)
+        self.dirty += rect.toAlignedRect().adjusted(-2, -2, 2, 2)
+
+    def flush(self):
+        if not self.dirty.isEmpty():
+            self.update(self.dirty)
+            self.dirty = QRegion()
+
+    def resizeEvent(self, event):
+        # Qt repaints everything after a resize; recompute the finger rects for the new size
+        super().resizeEvent(event)
+        self.dirty = QRegion()
+        self.drawn.clear()
+        self.trail_drawn.clear()
+        self.mark_dirty(list(self.fingers))
+        if self.trails is not None:
+            self.mark_trails(self.trails.live(time.time()), time.time())
+        self.dirty = QRegion()
+
     def paintEvent(self, event):
         painter = QPainter(self)
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        region = event.region()
 
-        # background
-        painter.fillRect(self.rect(), self.palette().window())
+        # background (only the exposed part)
+        painter.fillRect(event.rect(), self.palette().window())
+
+        # heatmap under everything; the cached image is only scaled here
+        pad_rect = self.pad_rect()
+        if self.heatmap is not None:
+            painter.drawImage(QRectF(pad_rect), self.heatmap.image)
 
         # draw "touchpad area" border
-        pad_rect = self.rect().adjusted(12, 12, -12, -12)
         painter.setPen(QPen(self.palette().text().color(), 2))
         painter.drawRoundedRect(QRectF(pad_rect), 12.0, 12.0)
 
@@ -73,61 +314,50 @@ class TouchCanvas(QWidget):
             painter.drawText(pad_rect, Qt.AlignmentFlag.AlignCenter, "No axis info yet…")
             return
 
-        min_x, max_x, min_y, max_y = self.axis_range
-        span_x = max(1, max_x - min_x)
-        span_y = max(1, max_y - min_y)
-
-        # helper for mapping device coords -> canvas coords
-        def map_xy(x, y):
-            nx = (x - min_x) / span_x
-            ny = (y - min_y) / span_y
-            cx = pad_rect.left() + nx * pad_rect.width()
-            cy = pad_rect.top() + ny * pad_rect.height()
-            return cx, cy
-
-        # draw active fingers
         now = time.time()
+        base = self.palette().highlight().color()
+
+        # one polyline per slot trail
+        if self.trails is not None:
+            trail = QColor(base)
+            trail.setAlpha(140)
+            painter.setPen(QPen(trail, 2))
+            for slot, bounds in self.trail_drawn.items():
+                if not region.intersects(bounds):
+                    continue
+                xs, ys = self.trails.points(slot, now)
+                if len(xs) >= 2:
+                    px, py = self.map_xy(pad_rect, xs, ys)
+                    painter.drawPolyline(polyline(px, py))
+
+        # draw active fingers that overlap the exposed region
+        painter.setFont(self.label_font)
         for slot, f in sorted(self.fingers.items()):
             if not f.is_active() or f.x is None or f.y is None:
                 continue
 
-            cx, cy = map_xy(f.x, f.y)
-
-            # size hint: touch_major/minor if available, else default
-            major = f.touch_major or 22
-            minor = f.touch_minor or 18
-
-            # scale ellipse size to canvas in a reasonable way
-            # (these MT units vary by device; we just keep it visually useful)
-            ellipse_w = max(10, min(80, int(major * 2)))
-            ellipse_h = max(10, min(80, int(minor * 2)))
+            ellipse, label, bounds = self.finger_geometry(pad_rect, slot, f)
+            if not region.intersects(bounds):
+                continue
 
             # fade slightly if not seen very recently
             age = now - f.last_seen
-            alpha = 255 if age < 0.2 else max(80, int(255 * (0.6 / max(age, 0.6))))
-
-            pen = QPen(self.palette().highlight().color(), 3)
+            alpha = 255 if age < FADE_START else max(80, int(255 * (0.6 / max(age, 0.6))))
 
-            c = pen.color()
+            c = QColor(base)
             c.setAlpha(alpha)
-            pen.setColor(c)
-
-            painter.setPen(pen)
+            painter.setPen(QPen(c, 3))
 
-            painter.drawEllipse(
-                QRectF(cx - ellipse_w / 2, cy - ellipse_h / 2, ellipse_w, ellipse_h)
-            )
+            painter.drawEllipse(ellipse)
 
             # label slot + tracking id
-            painter.setFont(QFont("Sans", 10))
-            label = f"slot {slot}  id {f.tracking_id}"
-            painter.drawText(int(cx + 10), int(cy - 10), label)
+            painter.drawText(int(ellipse.center().x() + 10), int(ellipse.center().y() - 10), label)
 
         painter.end()
 
 
 class TouchpadViewer(QWidget):
-    def __init__(self, dev: InputDevice):
+    def __init__(self, dev: InputDevice, trail_seconds: float = 0.0, heatmap_cells: int = 0):
         super().__init__()
         self.dev = dev
         self.setWindowTitle(f"Touchpad Visualizer - {dev.name}")
@@ -137,6 +367,15 @@ class TouchpadViewer(QWidget):
         self.fingers: Dict[int, Finger] = {i: Finger() for i in range(16)}  # up to 16 slots
         self.axis_range = self._get_axis_ranges()
 
+        # Events of the frame being read, applied together at SYN_REPORT
+        self.pending: List[Tuple[int, int]] = []
+        self.dropping = False
+        # Slots changed since the last UI update, and the per-slot readout lines
+        self.changed: Set[int] = set()
+        self.frame_slots: Set[int] = set()
+        self.lines: Dict[int, str] = {}
+        self.readout_text = ""
+
         # Layout
         root = QVBoxLayout()
         self.setLayout(root)
@@ -167,12 +406,28 @@ class TouchpadViewer(QWidget):
         self.status = QLabel("Reading events… (close window to stop)")
         root.addWidget(self.status)
 
-        # Polling timer (non-blocking)
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self._pump_events)
-        self.timer.start(10)
+        # Read only when the fd is readable
+        self.notifier = QSocketNotifier(dev.fd, QSocketNotifier.Type.Read, self)
+        self.notifier.activated.connect(self._pump_events)
+
+        # At most one UI update per display refresh, however fast frames arrive
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.frame_timer.timeout.connect(self._refresh_ui)
+
+        # Repaints fingers that stopped reporting while they fade; stopped when none do
+        self.fade_timer = QTimer(self)
+        self.fade_timer.setInterval(FADE_INTERVAL_MS)
+        self.fade_timer.timeout.connect(self._fade_tick)
+
+        # Optional overlays
+        self.trails = TrailBuffer(len(self.fingers), trail_seconds) if trail_seconds > 0 else None
+        self.heatmap = OccupancyHeatmap(self.axis_range, heatmap_cells) if heatmap_cells > 0 else None
 
         # Initial paint
+        self.canvas.set_state(self.fingers, self.axis_range)
+        self.canvas.set_layers(self.trails, self.heatmap)
         self._refresh_ui()
 
     def _get_axis_ranges(self) -> Tuple[int, int, int, int]:
@@ -198,24 +453,62 @@ class TouchpadViewer(QWidget):
         return f"<b>Axis range</b> X: {min_x}..{max_x}    Y: {min_y}..{max_y}"
 
     def _pump_events(self):
-        # Read all pending events without blocking
+        # Drain the fd; events only take effect at the SYN_REPORT that ends their frame
         try:
-            for ev in self.dev.read():
-                if ev.type != ecodes.EV_ABS:
-                    continue
-                self._handle_abs(ev.code, ev.value)
+            while True:
+                for ev in self.dev.read():
+                    if ev.type == ecodes.EV_ABS:
+                        if not self.dropping:
+                            self.pending.append((ev.code, ev.value))
+                    elif ev.type == ecodes.EV_SYN:
+                        if ev.code == ecodes.SYN_REPORT:
+                            if self.dropping:
+                                # the kernel dropped events; skip up to and including this report
+                                self.dropping = False
+                            else:
+                                self._apply_frame()
+                            self.pending.clear()
+                        elif ev.code == ecodes.SYN_DROPPED:
+                            self.dropping = True
+                            self.pending.clear()
         except BlockingIOError:
             pass
         except OSError as e:
             self.status.setText(f"Device read error: {e}")
-            self.timer.stop()
+            self.notifier.setEnabled(False)
             return
 
-        self._refresh_ui()
+        if self.changed:
+            self._schedule_ui()
 
-    def _handle_abs(self, code: int, value: int):
-        now = time.time()
+    def _schedule_ui(self):
+        if not self.frame_timer.isActive():
+            self.frame_timer.start(self._frame_interval())
+
+    def _frame_interval(self) -> int:
+        screen = self.screen()
+        hz = screen.refreshRate() if screen is not None else 0.0
+        return max(1, int(1000.0 / (hz if hz > 0 else 60.0)))
 
+    def _apply_frame(self):
+        now = time.time()
+        for code, value in self.pending:
+            self._handle_abs(code, value, now)
+
+        # feed the overlays one sample per finger that reported in this frame
+        if self.trails is not None or self.heatmap is not None:
+            for slot in self.frame_slots:
+                f = self.fingers[slot]
+                if not f.is_active() or f.x is None or f.y is None:
+                    continue
+                if self.trails is not None:
+                    self.trails.push(slot, f.x, f.y, now)
+                if self.heatmap is not None:
+                    self.heatmap.add(f.x, f.y)
+        self.changed |= self.frame_slots
+        self.frame_slots.clear()
+
+    def _handle_abs(self, code: int, value: int, now: float):
         if code == ecodes.ABS_MT_SLOT:
             self.current_slot = int(value)
             if self.current_slot not in self.fingers:
@@ -224,10 +517,13 @@ class TouchpadViewer(QWidget):
 
         f = self.fingers.setdefault(self.current_slot, Finger())
         f.last_seen = now
+        self.frame_slots.add(self.current_slot)
 
         if code == ecodes.ABS_MT_TRACKING_ID:
-            # -1 means finger lifted in this slot
+            # -1 means finger lifted in this slot; a new contact starts a new trail
             f.tracking_id = int(value)
+            if f.tracking_id != -1 and self.trails is not None:
+                self.trails.clear(self.current_slot)
             if f.tracking_id == -1:
                 # clear associated data for nicer display
                 f.x = f.y = f.pressure = f.touch_major = f.touch_minor = None
@@ -245,35 +541,72 @@ class TouchpadViewer(QWidget):
             f.touch_minor = int(value)
 
     def _refresh_ui(self):
-        # Build text readout of active fingers
-        lines = []
-        for slot in sorted(self.fingers.keys()):
+        # Rebuild readout lines and repaint rects of the slots changed since the last update
+        changed = self.changed
+        self.changed = set()
+        for slot in changed:
             f = self.fingers[slot]
             if not f.is_active():
+                self.lines.pop(slot, None)
                 continue
-            lines.append(
+            self.lines[slot] = (
                 f"slot {slot:2d}  id {f.tracking_id:5d}  x {str(f.x):>6}  y {str(f.y):>6}"
                 f"  p {str(f.pressure):>4}  major {str(f.touch_major):>4}  minor {str(f.touch_minor):>4}"
             )
 
-        if not lines:
-            lines = ["(no active touches)"]
-
-        self.readout.setText("\n".join(lines))
-        self.canvas.set_state(self.fingers, self.axis_range)
+        text = "\n".join(self.lines[slot] for slot in sorted(self.lines)) or "(no active touches)"
+        if text != self.readout_text:
+            self.readout_text = text
+            self.readout.setText(text)
+
+        self.canvas.mark_dirty(changed)
+        if self.heatmap is not None:
+            box = self.heatmap.flush()
+            if box is not None:
+                self.canvas.mark_heatmap(box)
+        if self.trails is not None:
+            # trails keep shrinking after their finger stops, so keep updating while any remain
+            now = time.time()
+            live = self.trails.live(now)
+            self.canvas.mark_trails(set(live) | set(self.canvas.trail_drawn), now)
+            if live:
+                self._schedule_ui()
+        self.canvas.flush()
+        if self.lines and not self.fade_timer.isActive():
+            self.fade_timer.start()
+
+    def _fade_tick(self):
+        now = time.time()
+        fading = []
+        waiting = False
+        for slot in self.lines:
+            age = now - self.fingers[slot].last_seen
+            if age >= FADE_START and age < FADE_END + FADE_INTERVAL_MS / 1000.0:
+                fading.append(slot)
+            elif age < FADE_START:
+                waiting = True
+        if fading:
+            self.canvas.mark_dirty(fading)
+            self.canvas.flush()
+        elif not waiting:
+            self.fade_timer.stop()
 
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: sudo ./touchpad_viewer.py /dev/input/eventXX")
-        sys.exit(2)
-
-    path = sys.argv[1]
-    dev = InputDevice(path)
+    parser = argparse.ArgumentParser(description="Touchpad MT visualizer")
+    parser.add_argument("device", help="touchpad event device, e.g. /dev/input/eventXX")
+    parser.add_argument("--trails", type=float, default=0.0, metavar="SECONDS",
+                        help="draw each finger's path over the last SECONDS (default: off)")
+    parser.add_argument("--heatmap", action="store_true", help="accumulate an occupancy heatmap under the fingers")
+    parser.add_argument("--heatmap-cells", type=int, default=160, metavar="N",
+                        help="heatmap resolution across the pad width (default: %(default)s)")
+    args = parser.parse_args()
+
+    dev = InputDevice(args.device)
     dev.grab()  # exclusive grab so other software won't swallow events (optional but useful)
 
-    app = QApplication(sys.argv)
-    w = TouchpadViewer(dev)
+    app = QApplication(sys.argv[:1])
+    w = TouchpadViewer(dev, args.trails, args.heatmap_cells if args.heatmap else 0)
     w.resize(900, 700)
     w.show()
 
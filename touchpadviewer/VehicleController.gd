@@ -1,5 +1,43 @@
 extends "res://VehicleSettings.gd"
 
+# The bridge runtime and the helper modules it imports; installed with the supervisor as a bundle.
+const BRIDGE_MODULES := [
+	"touchpad_config.py",
+	"touchpad_control.py",
+	"touchpad_discovery.py",
+	"touchpad_emit.py",
+	"touchpad_filters.py",
+	"touchpad_flight.py",
+	"touchpad_inotify.py",
+	"touchpad_joy_bridge.py",
+	"touchpad_joy_engine.py",
+	"touchpad_layout.py",
+	"touchpad_mt_sync.py",
+	"touchpad_reader.py",
+	"touchpad_realtime.py",
+	"touchpad_runtime.py",
+	"touchpad_state_shm.py",
+	"touchpad_stats.py",
+	"touchpad_stream.py",
+	"touchpad_touch_engine.py",
+	"touchpad_trace.py",
+	"touchpad_uinput_bridge.py",
+]
+const BRIDGE_ENTRY := "touchpad_supervisor.py"
+# Becomes the bundle's __main__.py (see touchpad_bundle_main.py).
+const BRIDGE_MAIN := "touchpad_bundle_main.py"
+# One directory per bundle version, named after the content of its files.
+const BRIDGE_ROOT := "user://bridge"
+# Bytecode is compiled once at install. A bundle directory never changes, so the cache needs no
+# source checks, and it does not depend on the bridge being allowed to write __pycache__.
+const BRIDGE_COMPILE_ARGS := ["-m", "compileall", "-q", "--invalidation-mode", "unchecked-hash"]
+
+# Binary HUD record published by the bridge (see touchpad_state_shm.py).
+const STATE_SHM_MAGIC := 0x48535054
+const STATE_SHM_SIZE := 72
+# Torn reads to retry before keeping the previous frame's state.
+const STATE_SHM_RETRIES := 4
+
 const GEAR_MAX_SPEED_KMH := {
 	1: 30.0,
 	2: 55.0,
@@ -7,24 +45,89 @@ const GEAR_MAX_SPEED_KMH := {
 	4: 140.0,
 }
 
-# Bridge process id
+# Supervisor process id (touchpad_supervisor.py, which runs and restarts the bridge runtime)
 var bridge_pid := -1
 var config_path := ""
 var state_path := ""
-var _last_config := {}
+var state_shm_path := ""
+# Control socket for tools (live tuning, stats, flight dumps; see touchpad_control.py). Godot has
+# no Unix socket API, so the game itself keeps using the config and state files.
+var control_path := ""
+# Restart count and crash-to-recovery times, rewritten by the supervisor.
+var supervisor_status_path := ""
+# Set by the tuning setters below; the config file is only rewritten when this is true.
+var _config_dirty := true
 
 @export var bridge_debug_terminal := false
-
-@export var steer_delta_scale := 0.1
-@export var steer_deadzone := 10.0
-@export var shift_margin := 0.12
-@export var shift_gap := 0.18
-@export var neutral_min := 0.45
-@export var neutral_max := 0.55
-@export var gear_hold_time := 0.12
-@export var neutral_reset_hold := 0.15
-@export var throttle_neutral_band := 0.2
-@export var throttle_sensitivity := 0.6
+@export var bridge_state_shm := true
+
+@export var steer_delta_scale := 0.1:
+	set(value):
+		steer_delta_scale = value
+		_config_dirty = true
+@export var steer_deadzone := 10.0:
+	set(value):
+		steer_deadzone = value
+		_config_dirty = true
+@export var shift_margin := 0.12:
+	set(value):
+		shift_margin = value
+		_config_dirty = true
+@export var shift_gap := 0.18:
+	set(value):
+		shift_gap = value
+		_config_dirty = true
+@export var neutral_min := 0.45:
+	set(value):
+		neutral_min = value
+		_config_dirty = true
+@export var neutral_max := 0.55:
+	set(value):
+		neutral_max = value
+		_config_dirty = true
+@export var gear_hold_time := 0.12:
+	set(value):
+		gear_hold_time = value
+		_config_dirty = true
+@export var neutral_reset_hold := 0.15:
+	set(value):
+		neutral_reset_hold = value
+		_config_dirty = true
+@export var throttle_neutral_band := 0.2:
+	set(value):
+		throttle_neutral_band = value
+		_config_dirty = true
+@export var throttle_sensitivity := 0.6:
+	set(value):
+		throttle_sensitivity = value
+		_config_dirty = true
+# Bridge input filters: One-Euro min cutoff (Hz, 0 = off) and speed coefficient, steering
+# prediction (ms, 0 = off) and the shifter's neutral-band hysteresis.
+@export var steer_min_cutoff := 0.0:
+	set(value):
+		steer_min_cutoff = value
+		_config_dirty = true
+@export var steer_beta := 0.0:
+	set(value):
+		steer_beta = value
+		_config_dirty = true
+@export var steer_predict_ms := 0.0:
+	set(value):
+		steer_predict_ms = value
+		_config_dirty = true
+@export var throttle_min_cutoff := 0.0:
+	set(value):
+		throttle_min_cutoff = value
+		_config_dirty = true
+@export var shift_hysteresis := 0.0:
+	set(value):
+		shift_hysteresis = value
+		_config_dirty = true
+# Touch-zone layout: a built-in name ("h4", "h4r", "sequential") or a layout JSON file; empty keeps the bridge default.
+@export var touch_layout := "":
+	set(value):
+		touch_layout = value
+		_config_dirty = true
 @export var controller_deadzone := 0.2
 @export var auto_center_steer := false
 
@@ -66,12 +169,17 @@ func _ready():
 	var os_name = OS.get_name()
 	using_bridge = os_name == "Linux"
 	if using_bridge:
-		# Start the touchpad->joystick bridge so Godot can read joystick input
-		var script_path = _ensure_bridge_script("touchpad_joy_bridge.py")
+		# Start the bridge runtime (touchpad->joystick plus HUD) under its supervisor so Godot can
+		# read joystick input, and keeps reading it after a bridge crash.
+		var bundle_path = _install_bridge()
 		config_path = ProjectSettings.globalize_path("user://touchpad_joy_config.json")
 		state_path = ProjectSettings.globalize_path("user://touchpad_joy_state.json")
+		control_path = ProjectSettings.globalize_path("user://touchpad_joy.sock")
+		supervisor_status_path = ProjectSettings.globalize_path("user://touchpad_supervisor.json")
+		if bridge_state_shm and DirAccess.dir_exists_absolute("/dev/shm"):
+			state_shm_path = "/dev/shm/touchpad_joy_state"
 		_write_config()
-		bridge_pid = _start_bridge(script_path)
+		bridge_pid = _start_bridge(bundle_path)
 		tree_exiting.connect(_on_tree_exiting)
 	else:
 		fallback_notice = "Touchpad bridge unsupported on %s. Mouse fallback: move mouse to steer, LMB gear down, RMB gear up, wheel throttle, MMB/Space brake." % os_name
@@ -93,12 +201,20 @@ func _on_tree_exiting():
 	_stop_bridge()
 
 func _stop_bridge():
+	# SIGTERM, not OS.kill()'s SIGKILL: the supervisor stops the bridge, which ungrabs the
+	# touchpad and removes the virtual joystick before exiting.
 	if bridge_pid > 0:
-		OS.kill(bridge_pid)
+		OS.execute("kill", ["-TERM", str(bridge_pid)])
 		bridge_pid = -1
 
-func _start_bridge(script_path):
-	var args = [script_path, "--auto", "--config", config_path, "--state", state_path]
+func _start_bridge(bundle_path):
+	var args = [bundle_path, "--status", supervisor_status_path, "--", "--joy", "auto", "--config", config_path]
+	if not control_path.is_empty():
+		args += ["--control", control_path]
+	if state_shm_path.is_empty():
+		args += ["--state", state_path]
+	else:
+		args += ["--state-shm", state_shm_path]
 	if not bridge_debug_terminal:
 		return OS.create_process("python3", args)
 
@@ -114,17 +230,49 @@ func _start_bridge(script_path):
 			return pid
 	return OS.create_process("python3", args)
 
-func _ensure_bridge_script(filename):
-	var src_path = "res://%s" % filename
-	var dst_path = "user://%s" % filename
-	if not FileAccess.file_exists(dst_path):
-		var bytes = FileAccess.get_file_as_bytes(src_path)
-		if bytes.size() > 0:
-			var file = FileAccess.open(dst_path, FileAccess.WRITE)
-			if file:
-				file.store_buffer(bytes)
-				file.close()
-	return ProjectSettings.globalize_path(dst_path)
+func _install_bridge():
+	# Returns the bundle directory to run as "python3 DIR". A bundle is only written once: an
+	# updated game hashes to a new directory, so neither sources nor their cached bytecode go stale.
+	var hashes := PackedStringArray()
+	for filename in BRIDGE_MODULES + [BRIDGE_ENTRY, BRIDGE_MAIN]:
+		hashes.append(FileAccess.get_md5("res://%s" % filename))
+	var version = "".join(hashes).md5_text().substr(0, 16)
+	var bundle = "%s/%s" % [BRIDGE_ROOT, version]
+	# __main__.py goes in last, so its presence marks a complete install.
+	if not FileAccess.file_exists(bundle + "/__main__.py"):
+		DirAccess.make_dir_recursive_absolute(bundle)
+		for filename in BRIDGE_MODULES + [BRIDGE_ENTRY]:
+			_copy_file("res://%s" % filename, "%s/%s" % [bundle, filename])
+		OS.execute("python3", BRIDGE_COMPILE_ARGS + [ProjectSettings.globalize_path(bundle)])
+		_copy_file("res://%s" % BRIDGE_MAIN, bundle + "/__main__.py")
+		_remove_old_bundles(version)
+	return ProjectSettings.globalize_path(bundle)
+
+func _copy_file(src_path, dst_path):
+	var bytes = FileAccess.get_file_as_bytes(src_path)
+	if bytes.size() > 0:
+		var file = FileAccess.open(dst_path, FileAccess.WRITE)
+		if file:
+			file.store_buffer(bytes)
+			file.close()
+
+func _remove_old_bundles(keep):
+	var root = DirAccess.open(BRIDGE_ROOT)
+	if root == null:
+		return
+	for version in root.get_directories():
+		if version != keep:
+			_remove_tree("%s/%s" % [BRIDGE_ROOT, version])
+
+func _remove_tree(path):
+	var dir = DirAccess.open(path)
+	if dir == null:
+		return
+	for filename in dir.get_files():
+		dir.remove(filename)
+	for sub in dir.get_directories():
+		_remove_tree("%s/%s" % [path, sub])
+	DirAccess.remove_absolute(path)
 
 func _physics_process(delta):
 	_check_respawn()
@@ -133,7 +281,7 @@ func _physics_process(delta):
 	_update_input()
 	_apply_vehicle(delta)
 	_update_steering_wheel()
-	if using_bridge:
+	if using_bridge and _config_dirty:
 		_write_config()
 
 func _update_input():
@@ -203,6 +351,9 @@ func _gear_ratio(value):
 			return 0.5
 
 func _read_bridge_state():
+	if not state_shm_path.is_empty():
+		_read_bridge_state_shm()
+		return
 	if state_path.is_empty():
 		return
 	if not FileAccess.file_exists(state_path):
@@ -227,6 +378,37 @@ func _read_bridge_state():
 	var ly = float(left.get("y", 0.5))
 	left_f1 = Vector2(lx * 2.0 - 1.0, ly * 2.0 - 1.0)
 
+func _read_bridge_state_shm():
+	# Seqlock, as ShmStateReader.read: copy the record, then read the head sequence again. An odd
+	# sequence, a head/tail mismatch or a changed head means the bridge wrote meanwhile.
+	# FileAccess is buffered (FILE*): a seek that lands inside its buffer is served from the
+	# buffer, so a file kept open would return its first snapshot forever. Every read opens the
+	# record afresh instead (two small open+read+close per tick; tmpfs, no disk I/O).
+	for _attempt in STATE_SHM_RETRIES:
+		var file = FileAccess.open(state_shm_path, FileAccess.READ)
+		if not file:
+			left_finger_active = false
+			return
+		var buf = file.get_buffer(STATE_SHM_SIZE)
+		file.close()
+		if buf.size() < STATE_SHM_SIZE or buf.decode_u32(0) != STATE_SHM_MAGIC:
+			left_finger_active = false
+			return
+		var seq = buf.decode_u64(8)
+		if seq & 1 or buf.decode_u64(64) != seq:
+			continue
+		var check = FileAccess.open(state_shm_path, FileAccess.READ)
+		if not check:
+			continue
+		check.seek(8)
+		var head = check.get_64()
+		check.close()
+		if head != seq:
+			continue
+		left_finger_active = (buf.decode_u32(28) & 1) != 0
+		left_f1 = Vector2(buf.decode_float(40) * 2.0 - 1.0, buf.decode_float(44) * 2.0 - 1.0)
+		return
+
 func _cache_wheel_nodes():
 	front_left = get_node_or_null("FrontLeft")
 	front_right = get_node_or_null("FrontRight")
@@ -327,6 +509,8 @@ func _read_gear(pad_id):
 		return 3
 	if Input.is_joy_button_pressed(pad_id, JOY_BUTTON_Y):
 		return 4
+	if Input.is_joy_button_pressed(pad_id, JOY_BUTTON_LEFT_SHOULDER):
+		return -1
 	return 0
 
 func _find_virtual_pad(pads):
@@ -405,11 +589,22 @@ func _write_config():
 		"neutral_reset_hold": neutral_reset_hold,
 		"throttle_neutral_band": throttle_neutral_band,
 		"throttle_sensitivity": throttle_sensitivity,
+		"steer_min_cutoff": steer_min_cutoff,
+		"steer_beta": steer_beta,
+		"steer_predict_ms": steer_predict_ms,
+		"throttle_min_cutoff": throttle_min_cutoff,
+		"shift_hysteresis": shift_hysteresis,
 	}
-	if cfg == _last_config:
-		return
-	var file = FileAccess.open(config_path, FileAccess.WRITE)
+	if touch_layout != "":
+		var layout = touch_layout
+		if layout.begins_with("user://") or layout.begins_with("res://"):
+			layout = ProjectSettings.globalize_path(layout)
+		cfg["layout"] = layout
+	_config_dirty = false
+	# Write then rename so the bridge's watcher never parses a half-written file.
+	var tmp_path = config_path + ".tmp"
+	var file = FileAccess.open(tmp_path, FileAccess.WRITE)
 	if file:
 		file.store_string(JSON.stringify(cfg))
 		file.close()
-	_last_config = cfg
+		DirAccess.rename_absolute(tmp_path, config_path)
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import streams
+from touchpad_emit import INPUT_EVENT, FrameEmitter
+from touchpad_joy_engine import OUTPUT_CODES, JoyBridgeEngine
+from touchpad_touch_engine import TouchscreenEngine
+from touchpad_trace import NullSink, ReplayDevice
+
+# Per-SYN_REPORT latency and allocation for the joy and touchscreen bridge pipelines.
+# Each pipeline is the bridge's own processing code with a sink in place of UInput: a NullSink,
+# or with --devnull an fd sink that pays for one write(2) per UInput.write()/syn() call.
+
+EV_SYN = streams.EV_SYN
+SYN_REPORT = streams.SYN_REPORT
+
+
+class FdSink:
+	# Behaves like UInput: one write(2) per event, and exposes .fd for batched writers.
+
+	def __init__(self, fd):
+		self.fd = fd
+		self.writes = 0
+		self._pack = INPUT_EVENT.pack
+
+	def write(self, etype, code, value):
+		os.write(self.fd, self._pack(0, 0, etype, code, value))
+		self.writes += 1
+
+	def syn(self):
+		os.write(self.fd, self._pack(0, 0, EV_SYN, SYN_REPORT, 0))
+		self.writes += 1
+
+	def close(self):
+		pass
+
+
+def _sink_writes(ui):
+	if isinstance(ui, NullSink):
+		return ui.writes + ui.frames
+	return ui.writes
+
+
+def joy_pipeline(abs_x, abs_y, ui):
+	# What the bridge runs: changed values only, one write per frame.
+	engine = JoyBridgeEngine.from_absinfo(abs_x, abs_y)
+	feed = engine.feed_values
+	on_syn = engine.on_syn
+	emitter = FrameEmitter(ui, OUTPUT_CODES)
+	emit = emitter.emit
+
+	def process(frame):
+		for sec, usec, etype, code, value in frame:
+			if etype != EV_SYN or code != SYN_REPORT:
+				feed(etype, code, value)
+				continue
+			emit(on_syn(sec + usec * 1e-6).values())
+
+	def writes():
+		return emitter.writes if emitter.fd is not None else _sink_writes(ui)
+
+	return process, writes
+
+
+def joy_unbatched_pipeline(abs_x, abs_y, ui):
+	# The previous output stage: every value written every frame, then a separate SYN.
+	engine = JoyBridgeEngine.from_absinfo(abs_x, abs_y)
+	feed = engine.feed_values
+	on_syn = engine.on_syn
+
+	def process(frame):
+		for sec, usec, etype, code, value in frame:
+			if etype != EV_SYN or code != SYN_REPORT:
+				feed(etype, code, value)
+				continue
+			out = on_syn(sec + usec * 1e-6)
+			for (otype, ocode), ovalue in zip(OUTPUT_CODES, out.values()):
+				ui.write(otype, ocode, ovalue)
+			ui.syn()
+
+	return process, lambda: _sink_writes(ui)
+
+
+def touch_pipeline(abs_x, abs_y, ui):
+	engine = TouchscreenEngine.from_absinfo(abs_x, abs_y, 1920, 1080, ui)
+	feed = engine.feed_values
+
+	def process(frame):
+		for _, _, etype, code, value in frame:
+			feed(etype, code, value)
+
+	return process, lambda: _sink_writes(ui)
+
+
+PIPELINES = {
+	"joy": joy_pipeline,
+	"joy_unbatched": joy_unbatched_pipeline,
+	"touch": touch_pipeline,
+}
+
+
+def percentile(sorted_values, q):
+	if not sorted_values:
+		return 0.0
+	idx = min(len(sorted_values) - 1, int(round(q / 100.0 * (len(sorted_values) - 1))))
+	return sorted_values[idx]
+
+
+def measure(make_pipeline, frames, abs_x, abs_y, make_sink, alloc_frames=2000):
+	process, writes = make_pipeline(abs_x, abs_y, make_sink())
+	clock = time.perf_counter_ns
+	lat = [0] * len(frames)
+	start = clock()
+	for i, frame in enumerate(frames):
+		t0 = clock()
+		process(frame)
+		lat[i] = clock() - t0
+	total_ns = clock() - start
+	lat.sort()
+	events = sum(len(f) for f in frames)
+	writes_per_frame = writes() / len(frames) if frames else 0.0
+
+	# Separate pass: tracemalloc slows everything down, so it must not skew the timings.
+	process, _ = make_pipeline(abs_x, abs_y, make_sink())
+	sample = frames[:alloc_frames]
+	allocated = 0
+	tracemalloc.start()
+	try:
+		for frame in sample:
+			tracemalloc.reset_peak()
+			base = tracemalloc.get_traced_memory()[0]
+			process(frame)
+			allocated += tracemalloc.get_traced_memory()[1] - base
+	finally:
+		tracemalloc.stop()
+
+	return {
+		"frames": len(frames),
+		"events": events,
+		"p50_us": percentile(lat, 50) / 1000.0,
+		"p99_us": percentile(lat, 99) / 1000.0,
+		"p999_us": percentile(lat, 99.9) / 1000.0,
+		"max_us": lat[-1] / 1000.0 if lat else 0.0,
+		"events_per_s": events / (total_ns / 1e9) if total_ns else 0.0,
+		"alloc_bytes_per_frame": allocated / len(sample) if sample else 0.0,
+		"writes_per_frame": writes_per_frame,
+	}
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Benchmark bridge per-frame latency and allocation")
+	parser.add_argument("--frames", type=int, default=10000, help="frames per synthetic scenario")
+	parser.add_argument("--rate", type=int, default=240, help="synthetic report rate in Hz")
+	parser.add_argument("--trace", action="append", default=[], help="also run a recorded trace file")
+	parser.add_argument("--scenario", action="append", help="only run these scenarios")
+	parser.add_argument("--pipeline", choices=sorted(PIPELINES), action="append", help="only run these pipelines")
+	parser.add_argument("--devnull", action="store_true", help="write output to /dev/null instead of a NullSink")
+	parser.add_argument("--json", action="store_true", help="print results as JSON")
+	args = parser.parse_args()
+
+	if args.devnull:
+		devnull = os.open(os.devnull, os.O_WRONLY)
+
+		def make_sink():
+			return FdSink(devnull)
+
+	else:
+		make_sink = NullSink
+
+	runs = []
+	for name, frames in streams.scenarios(args.frames, args.rate).items():
+		if args.scenario and name not in args.scenario:
+			continue
+		runs.append((name, frames, streams.PAD_X, streams.PAD_Y))
+	for path in args.trace:
+		dev = ReplayDevice(path)
+		runs.append(
+			(
+				os.path.basename(path),
+				streams.load_trace(path),
+				dev.absinfo(streams.ABS_MT_POSITION_X),
+				dev.absinfo(streams.ABS_MT_POSITION_Y),
+			)
+		)
+
+	results = []
+	for pipeline in args.pipeline or sorted(PIPELINES):
+		for name, frames, abs_x, abs_y in runs:
+			r = measure(PIPELINES[pipeline], frames, abs_x, abs_y, make_sink)
+			r["pipeline"] = pipeline
+			r["scenario"] = name
+			results.append(r)
+			if not args.json:
+				print(
+					f"{pipeline:13s} {name:16s} p50 {r['p50_us']:7.2f} us  p99 {r['p99_us']:7.2f} us  "
+					f"p99.9 {r['p999_us']:7.2f} us  {r['events_per_s'] / 1e6:6.2f} Mev/s  "
+					f"alloc {r['alloc_bytes_per_frame']:7.1f} B/frame  writes {r['writes_per_frame']:5.2f}/frame",
+					flush=True,
+				)
+	if args.json:
+		print(json.dumps(results, indent=2))
+	return check_batched_alloc(results)
+
+
+def check_batched_alloc(results):
+	# The batched output stage must not allocate more per frame than the unbatched one it replaced.
+	unbatched = {r["scenario"]: r["alloc_bytes_per_frame"] for r in results if r["pipeline"] == "joy_unbatched"}
+	failed = 0
+	for r in results:
+		base = unbatched.get(r["scenario"])
+		if r["pipeline"] != "joy" or base is None:
+			continue
+		if r["alloc_bytes_per_frame"] > base:
+			print(
+				f"FAIL joy {r['scenario']}: {r['alloc_bytes_per_frame']:.1f} B/frame batched, "
+				f"{base:.1f} B/frame unbatched",
+				file=sys.stderr,
+			)
+			failed += 1
+	return 1 if failed else 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
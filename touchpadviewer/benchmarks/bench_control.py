@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import streams
+from bench_bridges import percentile
+from touchpad_control import ControlClient
+
+# Config round trip over the control socket against the config file.
+# A bridge runtime replays a synthetic trace in real time with both --config and --control. The
+# socket time is from sending CONFIG to receiving its ack (applied). The file time is from the
+# write-then-rename Godot does to the runtime logging the reload on stderr, which is the earliest
+# anyone can tell the file was applied; the file path has no acknowledgement of its own.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RUNTIME = os.path.join(os.path.dirname(HERE), "touchpad_runtime.py")
+
+
+def write_config(path, config):
+	tmp = path + ".tmp"
+	with open(tmp, "w", encoding="ascii") as f:
+		json.dump(config, f)
+	os.replace(tmp, path)
+
+
+def summary(name, samples):
+	samples = sorted(samples)
+	if not samples:
+		return f"{name:14s} no samples"
+	return (
+		f"{name:14s} n={len(samples):<5d} p50 {percentile(samples, 50) / 1000:9.1f} us  "
+		f"p99 {percentile(samples, 99) / 1000:9.1f} us  max {samples[-1] / 1000:9.1f} us"
+	)
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Control socket vs config file round-trip latency")
+	parser.add_argument("--pings", type=int, default=2000, help="socket pings")
+	parser.add_argument("--pushes", type=int, default=100, help="config pushes per channel")
+	parser.add_argument("--gap", type=float, default=0.05, help="seconds between config pushes")
+	parser.add_argument("--json", action="store_true", help="print results as JSON")
+	args = parser.parse_args()
+
+	tmp = tempfile.mkdtemp(prefix="bench-control-")
+	trace = os.path.join(tmp, "pad.trace")
+	config_path = os.path.join(tmp, "config.json")
+	sock_path = os.path.join(tmp, "control.sock")
+	duration = 10 + args.pushes * args.gap * 3
+	streams.write_trace(trace, streams.fingers(2, int(duration * 240)))
+	write_config(config_path, {})
+
+	proc = subprocess.Popen(
+		[
+			sys.executable,
+			RUNTIME,
+			"--joy",
+			trace,
+			"--sink",
+			"null",
+			"--flight-recorder",
+			"0",
+			"--config",
+			config_path,
+			"--control",
+			sock_path,
+		],
+		stderr=subprocess.PIPE,
+		text=True,
+	)
+	reloads = []
+	reloaded = threading.Condition()
+
+	def watch_stderr():
+		for line in proc.stderr:
+			if "config: reloaded" in line:
+				with reloaded:
+					reloads.append(time.perf_counter_ns())
+					reloaded.notify()
+
+	threading.Thread(target=watch_stderr, daemon=True).start()
+
+	results = {}
+	try:
+		deadline = time.monotonic() + 5.0
+		while not os.path.exists(sock_path):
+			if time.monotonic() > deadline or proc.poll() is not None:
+				raise SystemExit("runtime did not open its control socket")
+			time.sleep(0.01)
+		with ControlClient(sock_path) as client:
+			pings = []
+			for _ in range(args.pings):
+				start = time.perf_counter_ns()
+				client.ping()
+				pings.append(time.perf_counter_ns() - start)
+			results["socket ping"] = pings
+
+			pushes = []
+			for i in range(args.pushes):
+				start = time.perf_counter_ns()
+				applied, _ = client.push_config({"steer_deadzone": float(10 + i % 2)})
+				pushes.append(time.perf_counter_ns() - start)
+				if not applied:
+					raise SystemExit("config push rejected")
+				time.sleep(args.gap)
+			results["socket config"] = pushes
+
+		files = []
+		missed = 0
+		for i in range(args.pushes):
+			with reloaded:
+				seen = len(reloads)
+				start = time.perf_counter_ns()
+				write_config(config_path, {"steer_deadzone": float(20 + i % 2)})
+				if reloaded.wait_for(lambda: len(reloads) > seen, timeout=2.0):
+					files.append(reloads[seen] - start)
+				else:
+					missed += 1
+			time.sleep(args.gap)
+		results["file config"] = files
+	finally:
+		proc.terminate()
+		proc.wait()
+		shutil.rmtree(tmp, ignore_errors=True)
+
+	if args.json:
+		out = {}
+		for name, samples in results.items():
+			samples = sorted(samples)
+			if samples:
+				out[name] = {
+					"n": len(samples),
+					"p50_us": percentile(samples, 50) / 1000,
+					"p99_us": percentile(samples, 99) / 1000,
+					"max_us": samples[-1] / 1000,
+				}
+		out["file_missed"] = missed
+		print(json.dumps(out, indent=2))
+		return 0
+	for name, samples in results.items():
+		print(summary(name, samples))
+	if missed:
+		print(f"file config: {missed} reloads not seen within 2 s")
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
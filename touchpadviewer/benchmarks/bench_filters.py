@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import streams
+from bench_bridges import measure
+from touchpad_config import validate_config
+from touchpad_emit import FrameEmitter
+from touchpad_filters import (
+	PREDICT_KALMAN,
+	PREDICT_LINEAR,
+	Channel,
+	Hysteresis,
+	KalmanPredictor,
+	LinearPredictor,
+	OneEuroFilter,
+)
+from touchpad_joy_engine import OUTPUT_CODES, JoyBridgeEngine
+from touchpad_trace import NullSink
+
+# What the input filter stage costs.
+#   stages   one call of each filter on a noisy 240 Hz signal, best of --repeat runs
+#   engine   the joy pipeline per SYN_REPORT with the filters switched on one after another, on
+#            streams where the steering finger and the throttle fingers move every frame; the
+#            "added" column is the p50 difference to the unfiltered engine
+
+ENGINE_CONFIGS = {
+	"off": {},
+	"one_euro": {"steer_min_cutoff": 1.0, "steer_beta": 0.05, "throttle_min_cutoff": 1.0, "throttle_beta": 0.5},
+	"one_euro+linear": {
+		"steer_min_cutoff": 1.0,
+		"steer_beta": 0.05,
+		"throttle_min_cutoff": 1.0,
+		"throttle_beta": 0.5,
+		"steer_predict_ms": 8.0,
+		"steer_predictor": float(PREDICT_LINEAR),
+	},
+	"one_euro+kalman": {
+		"steer_min_cutoff": 1.0,
+		"steer_beta": 0.05,
+		"throttle_min_cutoff": 1.0,
+		"throttle_beta": 0.5,
+		"steer_predict_ms": 8.0,
+		"steer_predictor": float(PREDICT_KALMAN),
+	},
+	"all+hysteresis": {
+		"steer_min_cutoff": 1.0,
+		"steer_beta": 0.05,
+		"throttle_min_cutoff": 1.0,
+		"throttle_beta": 0.5,
+		"steer_predict_ms": 8.0,
+		"steer_predictor": float(PREDICT_KALMAN),
+		"steer_deadzone_hysteresis": 5.0,
+		"shift_hysteresis": 0.05,
+	},
+}
+ENGINE_SCENARIOS = ("throttle_sweeps", "palm_bursts", "fingers_2")
+
+
+def signal(samples, rate_hz=240, seed=1):
+	rng = random.Random(seed)
+	dt = 1.0 / rate_hz
+	return [(1000.0 + 400.0 * math.sin(i * 0.02) + rng.gauss(0.0, 3.0), i * dt) for i in range(samples)]
+
+
+def _stage_calls():
+	# name -> (state factory, per-sample call); the state is rebuilt before every timed run.
+	def channel(min_cutoff, horizon, mode):
+		def make():
+			c = Channel()
+			c.configure(min_cutoff, 0.05, 1.0, horizon, mode)
+			return c.update
+
+		return make
+
+	return {
+		"one_euro": (lambda: OneEuroFilter(1.0, 0.05, 1.0).filter, None),
+		"linear": (lambda: LinearPredictor(0.008).predict, None),
+		"kalman": (lambda: KalmanPredictor(0.008).predict, None),
+		"channel one_euro+kalman": (channel(1.0, 0.008, PREDICT_KALMAN), None),
+		"hysteresis": (lambda: Hysteresis(1000.0, 20.0).update, "value"),
+	}
+
+
+def time_stage(make, kind, samples, repeat):
+	clock = time.perf_counter_ns
+	values = [x for x, _ in samples]
+	best = None
+	for _ in range(repeat):
+		call = make()
+		if kind == "value":
+			start = clock()
+			for x in values:
+				call(x)
+		else:
+			start = clock()
+			for x, t in samples:
+				call(x, t)
+		elapsed = clock() - start
+		best = elapsed if best is None else min(best, elapsed)
+	# Subtract the bare loop so the figure is the call alone.
+	empty = None
+	for _ in range(repeat):
+		start = clock()
+		if kind == "value":
+			for x in values:
+				pass
+		else:
+			for x, t in samples:
+				pass
+		elapsed = clock() - start
+		empty = elapsed if empty is None else min(empty, elapsed)
+	return max(0, best - empty) / len(samples) / 1000.0
+
+
+def filtered_pipeline(config):
+	config, errors = validate_config(config)
+	if errors:
+		raise SystemExit("; ".join(errors))
+
+	def make(abs_x, abs_y, ui):
+		engine = JoyBridgeEngine.from_absinfo(abs_x, abs_y, config)
+		feed = engine.feed_values
+		on_syn = engine.on_syn
+		emitter = FrameEmitter(ui, OUTPUT_CODES)
+		emit = emitter.emit
+
+		def process(frame):
+			for sec, usec, etype, code, value in frame:
+				if etype != streams.EV_SYN or code != streams.SYN_REPORT:
+					feed(etype, code, value)
+					continue
+				emit(on_syn(sec + usec * 1e-6).values())
+
+		return process, lambda: ui.writes + ui.frames
+
+	return make
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Per-stage cost of the input filters")
+	parser.add_argument("--samples", type=int, default=100000, help="samples per stage timing")
+	parser.add_argument("--repeat", type=int, default=5, help="stage timings to take the best of")
+	parser.add_argument("--frames", type=int, default=10000, help="frames per engine scenario")
+	parser.add_argument("--json", action="store_true", help="print results as JSON")
+	args = parser.parse_args()
+
+	samples = signal(args.samples)
+	stages = {}
+	for name, (make, kind) in _stage_calls().items():
+		stages[name] = time_stage(make, kind, samples, args.repeat)
+		if not args.json:
+			print(f"stage  {name:24s} {stages[name]:6.3f} us/call", flush=True)
+
+	scenarios = streams.scenarios(args.frames)
+	engine = []
+	for scenario in ENGINE_SCENARIOS:
+		base = None
+		for name, config in ENGINE_CONFIGS.items():
+			r = measure(filtered_pipeline(config), scenarios[scenario], streams.PAD_X, streams.PAD_Y, NullSink)
+			if base is None:
+				base = r["p50_us"]
+			r["filters"] = name
+			r["scenario"] = scenario
+			r["added_p50_us"] = r["p50_us"] - base
+			engine.append(r)
+			if not args.json:
+				print(
+					f"engine {scenario:16s} {name:16s} p50 {r['p50_us']:6.2f} us  p99 {r['p99_us']:6.2f} us  "
+					f"added {r['added_p50_us']:+5.2f} us  alloc {r['alloc_bytes_per_frame']:5.1f} B/frame",
+					flush=True,
+				)
+	if args.json:
+		print(json.dumps({"stages_us": stages, "engine": engine}, indent=2))
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
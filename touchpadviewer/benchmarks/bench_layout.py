@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import streams
+from bench_bridges import measure
+from bench_filters import filtered_pipeline
+from touchpad_joy_engine import DEFAULT_CONFIG
+from touchpad_layout import BUILTIN_LAYOUTS, compile_layout, resolve_layout
+from touchpad_trace import NullSink
+
+# What the touch-zone layouts cost.
+#   compile  building the lookup grid for each built-in layout, best of --repeat runs
+#   lookup   zone and gate of one finger: the compiled grid against the comparison chain the
+#            engine used before layouts (left/right split, then the neutral band on u and v)
+#   engine   the joy pipeline per SYN_REPORT with each built-in layout
+
+ENGINE_SCENARIOS = ("throttle_sweeps", "palm_bursts", "fingers_2")
+
+
+def points(count, seed=1):
+	rng = random.Random(seed)
+	return [(rng.randint(0, streams.PAD_X.max), rng.randint(0, streams.PAD_Y.max)) for _ in range(count)]
+
+
+def chain_lookup(config, x_min, x_max, y_min, y_max):
+	# The pre-layout geometry, inlined the way the engine had it.
+	center_x = (x_min + x_max) / 2.0
+	right_span = max(1.0, x_max - center_x)
+	y_span = max(1.0, y_max - y_min)
+	lo = config["neutral_min"]
+	hi = config["neutral_max"]
+
+	def lookup(x, y):
+		if x < center_x:
+			return 1, 0
+		u = (x - center_x) / right_span
+		v = (y - y_min) / y_span
+		if lo <= u <= hi or lo <= v <= hi:
+			return 2, 0
+		col = 1 if u > hi else 0
+		row = 1 if v > hi else 0
+		if col == 1:
+			row = 1 - row
+		return 2, col * 2 + row + 1
+
+	return lookup
+
+
+def grid_lookup(compiled):
+	cols = compiled.cols
+	rows = compiled.rows
+	cell_zone = compiled.cell_zone
+	cell_gate = compiled.cell_gate
+	x_origin = compiled.x_origin
+	y_origin = compiled.y_origin
+	x_last = compiled.x_last
+	y_last = compiled.y_last
+
+	def lookup(x, y):
+		xi = x - x_origin
+		if xi < 0:
+			xi = 0
+		elif xi > x_last:
+			xi = x_last
+		yi = y - y_origin
+		if yi < 0:
+			yi = 0
+		elif yi > y_last:
+			yi = y_last
+		c = cols[xi] + rows[yi]
+		return cell_zone[c], cell_gate[c]
+
+	return lookup
+
+
+def time_lookup(lookup, pts, repeat):
+	clock = time.perf_counter_ns
+	best = None
+	for _ in range(repeat):
+		start = clock()
+		for x, y in pts:
+			lookup(x, y)
+		elapsed = clock() - start
+		best = elapsed if best is None else min(best, elapsed)
+	empty = None
+	for _ in range(repeat):
+		start = clock()
+		for x, y in pts:
+			pass
+		elapsed = clock() - start
+		empty = elapsed if empty is None else min(empty, elapsed)
+	return max(0, best - empty) / len(pts) / 1000.0
+
+
+def time_compile(layout, repeat):
+	clock = time.perf_counter_ns
+	best = None
+	for _ in range(repeat):
+		start = clock()
+		compile_layout(layout, streams.PAD_X.min, streams.PAD_X.max, streams.PAD_Y.min, streams.PAD_Y.max)
+		elapsed = clock() - start
+		best = elapsed if best is None else min(best, elapsed)
+	return best / 1e6
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Compile and lookup cost of the touch-zone layouts")
+	parser.add_argument("--points", type=int, default=100000, help="finger positions per lookup timing")
+	parser.add_argument("--repeat", type=int, default=5, help="timings to take the best of")
+	parser.add_argument("--frames", type=int, default=10000, help="frames per engine scenario")
+	parser.add_argument("--json", action="store_true", help="print results as JSON")
+	args = parser.parse_args()
+
+	bounds = (streams.PAD_X.min, streams.PAD_X.max, streams.PAD_Y.min, streams.PAD_Y.max)
+	pts = points(args.points)
+	compile_ms = {}
+	lookup_us = {"chain h4": time_lookup(chain_lookup(DEFAULT_CONFIG, *bounds), pts, args.repeat)}
+	if not args.json:
+		print(f"lookup  {'chain h4':16s} {lookup_us['chain h4']:6.3f} us/finger", flush=True)
+	for name in BUILTIN_LAYOUTS:
+		layout = resolve_layout(dict(DEFAULT_CONFIG, layout=name))
+		compile_ms[name] = time_compile(layout, args.repeat)
+		key = f"grid {name}"
+		lookup_us[key] = time_lookup(grid_lookup(compile_layout(layout, *bounds)), pts, args.repeat)
+		if not args.json:
+			print(f"compile {name:16s} {compile_ms[name]:6.3f} ms", flush=True)
+			print(f"lookup  {key:16s} {lookup_us[key]:6.3f} us/finger", flush=True)
+
+	scenarios = streams.scenarios(args.frames)
+	engine = []
+	for scenario in ENGINE_SCENARIOS:
+		for name in BUILTIN_LAYOUTS:
+			r = measure(filtered_pipeline({"layout": name}), scenarios[scenario], streams.PAD_X, streams.PAD_Y, NullSink)
+			r["layout"] = name
+			r["scenario"] = scenario
+			engine.append(r)
+			if not args.json:
+				print(
+					f"engine  {scenario:16s} {name:12s} p50 {r['p50_us']:6.2f} us  p99 {r['p99_us']:6.2f} us  "
+					f"alloc {r['alloc_bytes_per_frame']:5.1f} B/frame",
+					flush=True,
+				)
+	if args.json:
+		print(json.dumps({"compile_ms": compile_ms, "lookup_us": lookup_us, "engine": engine}, indent=2))
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import streams
+from touchpad_reader import INPUT_EVENT, FrameReader
+
+# Reader throughput: bulk readv + iter_unpack framing vs one Python object per event
+# (what evdev's read_loop() hands out). A pipe stands in for the evdev fd.
+
+
+class _Event:
+	__slots__ = ("sec", "usec", "type", "code", "value")
+
+	def __init__(self, sec, usec, etype, code, value):
+		self.sec = sec
+		self.usec = usec
+		self.type = etype
+		self.code = code
+		self.value = value
+
+
+def _writer(fd, payload, chunk):
+	for i in range(0, len(payload), chunk):
+		os.write(fd, payload[i : i + chunk])
+	os.close(fd)
+
+
+def _payload(frames):
+	return b"".join(INPUT_EVENT.pack(*rec) for frame in frames for rec in frame)
+
+
+def bench_frame_reader(payload, chunk):
+	r, w = os.pipe()
+	t = threading.Thread(target=_writer, args=(w, payload, chunk))
+	reader = FrameReader(r)
+	start = time.perf_counter()
+	t.start()
+	frames = 0
+	try:
+		for frame in reader.frames():
+			if frame is not None:
+				frames += 1
+	except OSError:
+		pass
+	elapsed = time.perf_counter() - start
+	t.join()
+	reader.close()
+	os.close(r)
+	return frames, elapsed, reader.reads
+
+
+def bench_per_event(payload, chunk):
+	r, w = os.pipe()
+	t = threading.Thread(target=_writer, args=(w, payload, chunk))
+	size = INPUT_EVENT.size
+	unpack_from = INPUT_EVENT.unpack_from
+	start = time.perf_counter()
+	t.start()
+	frames = 0
+	reads = 0
+	while True:
+		data = os.read(r, size * 64)
+		if not data:
+			break
+		reads += 1
+		for off in range(0, len(data), size):
+			ev = _Event(*unpack_from(data, off))
+			if ev.type == 0 and ev.code == 0:
+				frames += 1
+	elapsed = time.perf_counter() - start
+	t.join()
+	os.close(r)
+	return frames, elapsed, reads
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Benchmark evdev frame reading")
+	parser.add_argument("--frames", type=int, default=20000)
+	parser.add_argument("--chunk-frames", type=int, default=4, help="frames per producer write")
+	args = parser.parse_args()
+
+	frames = streams.fingers(5, args.frames)
+	payload = _payload(frames)
+	chunk = len(payload) // len(frames) * args.chunk_frames
+	chunk -= chunk % INPUT_EVENT.size
+	events = len(payload) // INPUT_EVENT.size
+	for name, fn in (("frame_reader", bench_frame_reader), ("per_event", bench_per_event)):
+		n, elapsed, reads = fn(payload, chunk)
+		print(
+			f"{name:12s} {n} frames  {elapsed * 1e6 / n:6.2f} us/frame  "
+			f"{events / elapsed / 1e6:5.2f} Mev/s  {reads} reads"
+		)
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
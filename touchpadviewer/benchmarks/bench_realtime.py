@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import streams
+from bench_bridges import joy_pipeline, percentile
+from touchpad_realtime import enter_realtime, parse_cpus
+from touchpad_trace import NullSink
+
+# Frame latency with and without --realtime under CPU contention.
+# Frames are released on a fixed report-rate schedule like a touchpad would deliver them; the
+# latency of a frame is from its scheduled arrival to the end of the joy pipeline, so it
+# includes late wakeups (scheduler), GC pauses and processing. Each mode runs in its own child
+# process while --load busy-loop processes compete for the same CPUs.
+
+
+def run_child(args):
+	frames = streams.scenarios(args.frames, args.rate)[args.scenario]
+	process, _ = joy_pipeline(streams.PAD_X, streams.PAD_Y, NullSink())
+	if args.realtime:
+		enter_realtime(args.rt_priority, args.rt_cpus, "off")
+	elif args.rt_cpus:
+		os.sched_setaffinity(0, args.rt_cpus)
+
+	clock = time.perf_counter_ns
+	period = 1e9 / args.rate
+	lat = [0] * len(frames)
+	late = [0] * len(frames)
+	start = clock() + 50_000_000
+	for i, frame in enumerate(frames):
+		due = start + int(i * period)
+		delay = due - clock()
+		if delay > 0:
+			time.sleep(delay / 1e9)
+		woke = clock()
+		process(frame)
+		lat[i] = clock() - due
+		late[i] = max(0, woke - due)
+	lat.sort()
+	late.sort()
+	return {
+		"realtime": args.realtime,
+		"frames": len(frames),
+		"p50_us": percentile(lat, 50) / 1000.0,
+		"p99_us": percentile(lat, 99) / 1000.0,
+		"p999_us": percentile(lat, 99.9) / 1000.0,
+		"max_us": lat[-1] / 1000.0,
+		"wake_p99_us": percentile(late, 99) / 1000.0,
+		"over_5ms": sum(1 for v in lat if v > 5_000_000),
+	}
+
+
+def start_load(count, cpus):
+	hogs = []
+	for _ in range(count):
+		hogs.append(subprocess.Popen([sys.executable, "-c", "while True: pass"]))
+		if cpus:
+			try:
+				os.sched_setaffinity(hogs[-1].pid, cpus)
+			except OSError:
+				pass
+	return hogs
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Joy pipeline latency with and without --realtime")
+	parser.add_argument("--frames", type=int, default=5000, help="frames per run")
+	parser.add_argument("--rate", type=int, default=240, help="report rate in Hz")
+	parser.add_argument("--scenario", default="fingers_3", help="synthetic scenario from streams.py")
+	parser.add_argument("--load", type=int, default=os.cpu_count() or 1, help="busy-loop processes competing for CPU")
+	parser.add_argument("--rt-cpus", type=parse_cpus, help="pin the bridge (and the load) to these CPUs")
+	parser.add_argument("--rt-priority", type=int, default=50)
+	parser.add_argument("--json", action="store_true", help="print results as JSON")
+	parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+	parser.add_argument("--realtime", action="store_true", help=argparse.SUPPRESS)
+	args = parser.parse_args()
+
+	if args.child:
+		print(json.dumps(run_child(args)))
+		return 0
+
+	base = [
+		sys.executable,
+		os.path.abspath(__file__),
+		"--child",
+		"--frames",
+		str(args.frames),
+		"--rate",
+		str(args.rate),
+		"--scenario",
+		args.scenario,
+		"--rt-priority",
+		str(args.rt_priority),
+	]
+	if args.rt_cpus:
+		base += ["--rt-cpus", ",".join(str(c) for c in sorted(args.rt_cpus))]
+
+	hogs = start_load(args.load, args.rt_cpus)
+	results = []
+	try:
+		for realtime in (False, True):
+			cmd = base + (["--realtime"] if realtime else [])
+			out = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, text=True).stdout
+			results.append(json.loads(out))
+	finally:
+		for hog in hogs:
+			hog.kill()
+			hog.wait()
+
+	if args.json:
+		print(json.dumps(results, indent=2))
+		return 0
+	print(f"{args.scenario} @ {args.rate} Hz, {args.frames} frames, {args.load} busy-loop processes")
+	for r in results:
+		mode = "realtime" if r["realtime"] else "default"
+		print(
+			f"{mode:9s} p50 {r['p50_us']:8.1f} us  p99 {r['p99_us']:8.1f} us  p99.9 {r['p999_us']:8.1f} us  "
+			f"max {r['max_us']:9.1f} us  wake p99 {r['wake_p99_us']:8.1f} us  >5ms {r['over_5ms']}"
+		)
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+import argparse
+import glob
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import streams
+from bench_bridges import percentile
+from touchpad_state_shm import ShmStateReader, ShmStateWriter
+
+# Time to first frame: from spawning the bridge to its first joystick frame.
+# The bridge replays a synthetic trace whose first frame is due immediately, and the time is taken
+# when that frame's HUD record shows up in shared memory, right after the joystick write. Device
+# discovery and uinput creation are not part of a trace replay; on a real station they add the
+# kernel's uinput setup on top.
+#   script  python3 touchpad_runtime.py, compiled from source on every start
+#   bundle  what Godot starts: python3 <bundle dir> (supervisor + runtime) from a bundle installed
+#           and precompiled like VehicleController._install_bridge() does
+# Exits 1 when the bundle's median exceeds --budget-ms.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+POLL_INTERVAL = 0.0005
+# Same as VehicleController.BRIDGE_COMPILE_ARGS.
+COMPILE = [sys.executable, "-m", "compileall", "-q", "--invalidation-mode", "unchecked-hash"]
+
+
+def install_bundle(directory):
+	os.makedirs(directory)
+	for path in glob.glob(os.path.join(ROOT, "touchpad_*.py")):
+		name = os.path.basename(path)
+		if name != "touchpad_bundle_main.py":
+			shutil.copy(path, os.path.join(directory, name))
+	shutil.copy(os.path.join(ROOT, "touchpad_bundle_main.py"), os.path.join(directory, "__main__.py"))
+	subprocess.run(COMPILE + [directory], check=True)
+
+
+def first_frame(command, shm_path, timeout=10.0):
+	# Seconds from spawn to the first published frame; the process is then stopped with SIGTERM.
+	ShmStateWriter(shm_path).close()
+	reader = ShmStateReader(shm_path)
+	start = time.perf_counter()
+	proc = subprocess.Popen(command, stderr=subprocess.DEVNULL)
+	try:
+		while not reader.changed():
+			if proc.poll() is not None:
+				raise SystemExit(f"bridge exited ({proc.returncode}) before its first frame: {command}")
+			if time.perf_counter() - start > timeout:
+				raise SystemExit(f"no frame within {timeout:g} s: {command}")
+			time.sleep(POLL_INTERVAL)
+		return time.perf_counter() - start
+	finally:
+		reader.close()
+		proc.send_signal(signal.SIGTERM)
+		try:
+			proc.wait(timeout=10)
+		except subprocess.TimeoutExpired:
+			proc.kill()
+			proc.wait()
+		os.unlink(shm_path)
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Bridge time to first frame")
+	parser.add_argument("--runs", type=int, default=20, help="timed starts per mode")
+	parser.add_argument("--budget-ms", type=float, default=100.0, help="bundle median budget")
+	parser.add_argument("--json", action="store_true", help="print results as JSON")
+	args = parser.parse_args()
+
+	tmp = tempfile.mkdtemp(prefix="bench-startup-")
+	trace = os.path.join(tmp, "pad.trace")
+	shm = os.path.join(tmp, "state")
+	bundle = os.path.join(tmp, "bundle")
+	streams.write_trace(trace, streams.fingers(2, 2400))
+	install_bundle(bundle)
+	runtime_args = ["--joy", trace, "--sink", "null", "--state-shm", shm]
+	modes = {
+		"script": [sys.executable, os.path.join(ROOT, "touchpad_runtime.py")] + runtime_args,
+		"bundle": [sys.executable, bundle, "--"] + runtime_args,
+	}
+
+	results = {}
+	try:
+		for name, command in modes.items():
+			# Warm-up: page cache, and __pycache__ for the script's imports where bytecode is written.
+			first_frame(command, shm)
+			results[name] = sorted(first_frame(command, shm) * 1000 for _ in range(args.runs))
+	finally:
+		shutil.rmtree(tmp, ignore_errors=True)
+
+	bundle_p50 = percentile(results["bundle"], 50)
+	over = bundle_p50 > args.budget_ms
+	if args.json:
+		out = {
+			name: {"n": len(v), "p50_ms": percentile(v, 50), "p90_ms": percentile(v, 90), "max_ms": v[-1]}
+			for name, v in results.items()
+		}
+		out["budget_ms"] = args.budget_ms
+		out["over_budget"] = over
+		print(json.dumps(out, indent=2))
+	else:
+		for name, v in results.items():
+			print(
+				f"{name:7s} n={len(v):<4d} p50 {percentile(v, 50):6.1f} ms  "
+				f"p90 {percentile(v, 90):6.1f} ms  max {v[-1]:6.1f} ms"
+			)
+		verdict = "OVER BUDGET" if over else "ok"
+		print(f"bundle median {bundle_p50:.1f} ms, budget {args.budget_ms:g} ms: {verdict}")
+	return 1 if over else 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from touchpad_state_shm import FLAG_LEFT, ShmStateReader, ShmStateWriter
+
+# Bridge -> HUD state: JSON file rewrite/re-parse vs the seqlocked shared-memory record.
+
+
+def bench_json(path, frames):
+	def write(i):
+		with open(path, "w", encoding="ascii") as f:
+			f.write(json.dumps({"left": {"active": True, "x": (i % 100) / 100.0, "y": 0.5}}))
+
+	def read():
+		with open(path, "r", encoding="ascii") as f:
+			return json.loads(f.read())
+
+	return _run(write, read, frames)
+
+
+def bench_shm(path, frames):
+	writer = ShmStateWriter(path)
+	reader = ShmStateReader(path)
+
+	def write(i):
+		writer.publish(i * 0.004, 1, FLAG_LEFT, 0.25, 0.0, (i % 100) / 100.0, 0.5)
+
+	try:
+		return _run(write, reader.read, frames)
+	finally:
+		reader.close()
+		writer.close()
+
+
+def _run(write, read, frames):
+	write(0)
+	read()
+	t0 = time.perf_counter()
+	for i in range(frames):
+		write(i)
+	t1 = time.perf_counter()
+	for _ in range(frames):
+		read()
+	t2 = time.perf_counter()
+
+	tracemalloc.start()
+	for i in range(1000):
+		write(i)
+		read()
+	_, peak = tracemalloc.get_traced_memory()
+	snap = tracemalloc.take_snapshot()
+	tracemalloc.stop()
+	allocated = sum(s.size for s in snap.statistics("filename"))
+	return {
+		"write_us": (t1 - t0) / frames * 1e6,
+		"read_us": (t2 - t1) / frames * 1e6,
+		"retained_bytes_per_frame": allocated / 1000.0,
+		"peak_bytes": peak,
+	}
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Benchmark HUD state publishing paths")
+	parser.add_argument("--frames", type=int, default=20000)
+	parser.add_argument("--dir", default="/dev/shm" if os.path.isdir("/dev/shm") else None)
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+		results = {
+			"json": bench_json(os.path.join(tmp, "state.json"), args.frames),
+			"shm": bench_shm(os.path.join(tmp, "state.shm"), args.frames),
+		}
+	for name, r in results.items():
+		print(
+			f"{name:5s} write {r['write_us']:7.2f} us  read {r['read_us']:7.2f} us  "
+			f"peak {r['peak_bytes']:6d} B  retained/frame {r['retained_bytes_per_frame']:.1f} B"
+		)
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import streams
+from bench_bridges import percentile
+
+# Crash recovery and shutdown under the supervisor.
+# A supervised bridge runtime replays a synthetic trace in real time. The benchmark SIGKILLs it
+# repeatedly (a crash), SIGSTOPs it once (a hang the heartbeat has to catch), then SIGTERMs the
+# supervisor. A recovery lasts from the kill until the supervisor reports the new bridge answering
+# on its control socket, i.e. until input flows again. Shutdown lasts from SIGTERM until the
+# supervisor exits; the bridge must have exited 0 (devices released) and be gone.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SUPERVISOR = os.path.join(os.path.dirname(HERE), "touchpad_supervisor.py")
+READY = re.compile(r"supervisor: bridge (\d+) (?:ready|recovered)")
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Supervisor crash-to-recovery and shutdown times")
+	parser.add_argument("--crashes", type=int, default=20, help="SIGKILLs to deliver")
+	parser.add_argument("--gap", type=float, default=0.5, help="seconds the bridge runs between crashes")
+	parser.add_argument("--heartbeat-timeout", type=float, default=1.0, help="passed to the supervisor")
+	parser.add_argument("--json", action="store_true", help="print results as JSON")
+	args = parser.parse_args()
+
+	tmp = tempfile.mkdtemp(prefix="bench-supervisor-")
+	trace = os.path.join(tmp, "pad.trace")
+	status = os.path.join(tmp, "status.json")
+	duration = 30 + args.crashes * (args.gap + 1.0)
+	streams.write_trace(trace, streams.fingers(2, int(duration * 240)))
+
+	proc = subprocess.Popen(
+		[
+			sys.executable,
+			SUPERVISOR,
+			"--heartbeat-timeout",
+			str(args.heartbeat_timeout),
+			"--grace",
+			"0.5",
+			# Every kill here follows a short run; keep restarts immediate regardless.
+			"--stable",
+			"0",
+			"--status",
+			status,
+			"--",
+			"--joy",
+			trace,
+			"--sink",
+			"null",
+			"--flight-recorder",
+			"0",
+		],
+		stderr=subprocess.PIPE,
+		text=True,
+	)
+	ready = []
+	lines = []
+	changed = threading.Condition()
+
+	def watch_stderr():
+		for line in proc.stderr:
+			with changed:
+				lines.append(line.rstrip())
+				match = READY.search(line)
+				if match:
+					ready.append((time.perf_counter_ns(), int(match.group(1))))
+				changed.notify()
+
+	reader = threading.Thread(target=watch_stderr, daemon=True)
+	reader.start()
+
+	def wait_ready(seen, timeout=10.0):
+		with changed:
+			if not changed.wait_for(lambda: len(ready) > seen, timeout=timeout):
+				raise SystemExit("bridge did not come back:\n" + "\n".join(lines[-20:]))
+			return ready[seen]
+
+	crashes = []
+	hang = None
+	shutdown = None
+	try:
+		_, pid = wait_ready(0)
+		for i in range(args.crashes):
+			time.sleep(args.gap)
+			start = time.perf_counter_ns()
+			os.kill(pid, signal.SIGKILL)
+			at, pid = wait_ready(i + 1)
+			crashes.append(at - start)
+
+		time.sleep(args.gap)
+		start = time.perf_counter_ns()
+		os.kill(pid, signal.SIGSTOP)
+		at, new_pid = wait_ready(args.crashes + 1)
+		hang = at - start
+		old_pid, pid = pid, new_pid
+
+		time.sleep(args.gap)
+		start = time.perf_counter_ns()
+		proc.send_signal(signal.SIGTERM)
+		code = proc.wait(timeout=10)
+		shutdown = time.perf_counter_ns() - start
+		reader.join(timeout=2)
+	finally:
+		if proc.poll() is None:
+			proc.kill()
+			proc.wait()
+		with open(status, encoding="ascii") as f:
+			final = json.load(f)
+		shutil.rmtree(tmp, ignore_errors=True)
+
+	alive = True
+	try:
+		os.kill(pid, 0)
+	except ProcessLookupError:
+		alive = False
+	clean = any(f"bridge {pid} stopped (exit code 0)" in line for line in lines)
+	hung_killed = not os.path.exists(f"/proc/{old_pid}")
+
+	crashes.sort()
+	out = {
+		"crash_recovery_ms": {
+			"n": len(crashes),
+			"p50": percentile(crashes, 50) / 1e6,
+			"p99": percentile(crashes, 99) / 1e6,
+			"max": crashes[-1] / 1e6,
+		},
+		"hang_recovery_ms": hang / 1e6,
+		"shutdown_ms": shutdown / 1e6,
+		"supervisor_exit": code,
+		"bridge_clean_exit": clean,
+		"bridge_left_running": alive,
+		"hung_bridge_reaped": hung_killed,
+		"status": final,
+	}
+	if args.json:
+		print(json.dumps(out, indent=2))
+	else:
+		r = out["crash_recovery_ms"]
+		print(f"crash -> recovered  n={r['n']:<4d} p50 {r['p50']:7.1f} ms  p99 {r['p99']:7.1f} ms  max {r['max']:7.1f} ms")
+		print(f"hang  -> recovered  {out['hang_recovery_ms']:7.1f} ms (heartbeat timeout {args.heartbeat_timeout:g} s)")
+		print(
+			f"SIGTERM -> exited   {out['shutdown_ms']:7.1f} ms  supervisor exit {code}  "
+			f"bridge exit 0: {clean}  bridge left running: {alive}"
+		)
+		print(f"supervisor status: restarts {final['restarts']}, recovery p50 {final['recovery_ms_p50']:.1f} ms")
+	return 0 if code == 0 and clean and not alive and hung_killed else 1
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
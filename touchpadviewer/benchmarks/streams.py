@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from touchpad_trace import AbsInfo, TraceWriter, iter_records
+
+# Synthetic multitouch streams for the bridge benchmarks.
+# A stream is a list of frames; a frame is a tuple of raw (sec, usec, type, code, value)
+# events ending with SYN_REPORT, the same shape as records in a trace file.
+
+EV_SYN = 0x00
+EV_KEY = 0x01
+EV_ABS = 0x03
+SYN_REPORT = 0
+ABS_MT_SLOT = 0x2F
+ABS_MT_TOUCH_MAJOR = 0x30
+ABS_MT_POSITION_X = 0x35
+ABS_MT_POSITION_Y = 0x36
+ABS_MT_TRACKING_ID = 0x39
+ABS_MT_PRESSURE = 0x3A
+
+# A typical 5-slot precision touchpad.
+PAD_X = AbsInfo(0, 0, 3000, 0, 0, 30)
+PAD_Y = AbsInfo(0, 0, 2000, 0, 0, 30)
+PAD_SLOT = AbsInfo(0, 0, 4, 0, 0, 0)
+PAD_TRACKING = AbsInfo(0, 0, 65535, 0, 0, 0)
+
+
+def pad_metadata():
+	return {
+		"name": "Synthetic Touchpad",
+		"path": "synthetic",
+		"phys": "",
+		"uniq": "",
+		"info": [0x18, 0, 0, 0],
+		"absinfo": {
+			str(ABS_MT_SLOT): list(PAD_SLOT),
+			str(ABS_MT_TOUCH_MAJOR): [0, 0, 255, 0, 0, 0],
+			str(ABS_MT_POSITION_X): list(PAD_X),
+			str(ABS_MT_POSITION_Y): list(PAD_Y),
+			str(ABS_MT_TRACKING_ID): list(PAD_TRACKING),
+			str(ABS_MT_PRESSURE): [0, 0, 255, 0, 0, 0],
+		},
+		"capabilities": {
+			str(EV_SYN): [0, 1, 3],
+			str(EV_KEY): [0x110],
+			str(EV_ABS): [
+				ABS_MT_SLOT,
+				ABS_MT_TOUCH_MAJOR,
+				ABS_MT_POSITION_X,
+				ABS_MT_POSITION_Y,
+				ABS_MT_TRACKING_ID,
+				ABS_MT_PRESSURE,
+			],
+		},
+	}
+
+
+class _Builder:
+	def __init__(self, rate_hz, start=1000.0):
+		self.t = start
+		self.dt = 1.0 / rate_hz
+		self.frames = []
+		self.events = []
+		self.next_id = 1
+
+	def ev(self, etype, code, value):
+		t = self.t
+		sec = int(t)
+		self.events.append((sec, int((t - sec) * 1e6), etype, code, value))
+
+	def down(self, slot, x, y):
+		self.ev(EV_ABS, ABS_MT_SLOT, slot)
+		self.ev(EV_ABS, ABS_MT_TRACKING_ID, self.next_id)
+		self.next_id = (self.next_id + 1) & 0xFFFF
+		self.ev(EV_ABS, ABS_MT_POSITION_X, int(x))
+		self.ev(EV_ABS, ABS_MT_POSITION_Y, int(y))
+
+	def move(self, slot, x, y):
+		self.ev(EV_ABS, ABS_MT_SLOT, slot)
+		self.ev(EV_ABS, ABS_MT_POSITION_X, int(x))
+		self.ev(EV_ABS, ABS_MT_POSITION_Y, int(y))
+
+	def up(self, slot):
+		self.ev(EV_ABS, ABS_MT_SLOT, slot)
+		self.ev(EV_ABS, ABS_MT_TRACKING_ID, -1)
+
+	def syn(self):
+		self.ev(EV_SYN, SYN_REPORT, 0)
+		self.frames.append(tuple(self.events))
+		self.events = []
+		self.t += self.dt
+
+
+def fingers(count, frames=10000, rate_hz=240, seed=1):
+	# `count` fingers orbiting steadily; every slot reports X and Y every frame.
+	rng = random.Random(seed)
+	b = _Builder(rate_hz)
+	phases = [rng.uniform(0.0, math.tau) for _ in range(count)]
+	centers = [(rng.uniform(500, 2500), rng.uniform(500, 1500)) for _ in range(count)]
+	for i in range(frames):
+		for s in range(count):
+			a = phases[s] + i * 0.02
+			x = centers[s][0] + 400 * math.cos(a)
+			y = centers[s][1] + 300 * math.sin(a)
+			if i == 0:
+				b.down(s, x, y)
+			else:
+				b.move(s, x, y)
+		b.syn()
+	return b.frames
+
+
+def slot_churn(frames=10000, rate_hz=240, seed=2):
+	# Fingers land and lift constantly, so slots and tracking ids turn over every few frames.
+	rng = random.Random(seed)
+	b = _Builder(rate_hz)
+	active = {}
+	for _ in range(frames):
+		for s in range(PAD_SLOT.max + 1):
+			if s in active:
+				if rng.random() < 0.15:
+					b.up(s)
+					del active[s]
+				else:
+					x, y = active[s]
+					x = min(PAD_X.max, max(0, x + rng.randint(-40, 40)))
+					y = min(PAD_Y.max, max(0, y + rng.randint(-40, 40)))
+					active[s] = (x, y)
+					b.move(s, x, y)
+			elif rng.random() < 0.2:
+				active[s] = (rng.randint(0, PAD_X.max), rng.randint(0, PAD_Y.max))
+				b.down(s, *active[s])
+		b.syn()
+	return b.frames
+
+
+def palm_bursts(frames=10000, rate_hz=240, seed=3):
+	# One steering finger plus periodic palm contacts: every slot lands at once with a large
+	# contact area, jitters for a few frames, then lifts.
+	rng = random.Random(seed)
+	b = _Builder(rate_hz)
+	burst_left = 0
+	for i in range(frames):
+		a = i * 0.03
+		x = 750 + 350 * math.cos(a)
+		y = 1000 + 350 * math.sin(a)
+		if i == 0:
+			b.down(0, x, y)
+		else:
+			b.move(0, x, y)
+		if burst_left == 0 and rng.random() < 0.02:
+			burst_left = rng.randint(3, 12)
+			for s in range(1, PAD_SLOT.max + 1):
+				b.down(s, rng.randint(1500, 3000), rng.randint(1200, 2000))
+				b.ev(EV_ABS, ABS_MT_TOUCH_MAJOR, rng.randint(120, 255))
+		elif burst_left > 0:
+			burst_left -= 1
+			for s in range(1, PAD_SLOT.max + 1):
+				if burst_left == 0:
+					b.up(s)
+				else:
+					b.move(s, rng.randint(1500, 3000), rng.randint(1200, 2000))
+					b.ev(EV_ABS, ABS_MT_PRESSURE, rng.randint(100, 255))
+		b.syn()
+	return b.frames
+
+
+def throttle_sweeps(frames=10000, rate_hz=240):
+	# Left steering finger plus two right fingers sweeping up and down together.
+	b = _Builder(rate_hz)
+	for i in range(frames):
+		a = i * 0.02
+		lx = 750 + 350 * math.cos(a)
+		ly = 1000 + 350 * math.sin(a)
+		sweep = 1000 + 800 * math.sin(i * 0.01)
+		if i == 0:
+			b.down(0, lx, ly)
+			b.down(1, 2000, sweep)
+			b.down(2, 2500, sweep + 40)
+		else:
+			b.move(0, lx, ly)
+			b.move(1, 2000, sweep)
+			b.move(2, 2500, sweep + 40)
+		b.syn()
+	return b.frames
+
+
+def scenarios(frames=10000, rate_hz=240):
+	out = {}
+	for n in range(1, 6):
+		out[f"fingers_{n}"] = fingers(n, frames, rate_hz)
+	out["slot_churn"] = slot_churn(frames, rate_hz)
+	out["palm_bursts"] = palm_bursts(frames, rate_hz)
+	out["throttle_sweeps"] = throttle_sweeps(frames, rate_hz)
+	return out
+
+
+def load_trace(path):
+	# Split a recorded trace into SYN-delimited frames.
+	frames = []
+	events = []
+	for rec in iter_records(path):
+		events.append(rec)
+		if rec[2] == EV_SYN and rec[3] == SYN_REPORT:
+			frames.append(tuple(events))
+			events = []
+	return frames
+
+
+def write_trace(path, frames, meta=None):
+	writer = TraceWriter(path, meta or pad_metadata())
+	try:
+		for frame in frames:
+			for rec in frame:
+				writer.write(*rec)
+	finally:
+		writer.close()
+
+
+def main():
+	import argparse
+
+	parser = argparse.ArgumentParser(description="Write a synthetic benchmark stream as a trace file")
+	parser.add_argument("scenario", help="fingers_1..fingers_5, slot_churn, palm_bursts or throttle_sweeps")
+	parser.add_argument("output")
+	parser.add_argument("--frames", type=int, default=10000)
+	parser.add_argument("--rate", type=int, default=240, help="report rate in Hz")
+	args = parser.parse_args()
+
+	streams = scenarios(args.frames, args.rate)
+	if args.scenario not in streams:
+		parser.error(f"unknown scenario {args.scenario}")
+	write_trace(args.output, streams[args.scenario])
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from touchpad_config import load_config
+from touchpad_joy_engine import ABS_MT_POSITION_X, ABS_MT_POSITION_Y, ABS_MT_SLOT, ABS_MT_TRACKING_ID, EV_ABS
+from touchpad_layout import ZONE_HANDBRAKE, ZONE_SHIFTER, ZONE_STEER, compile_layout, gate_label, resolve_layout
+from touchpad_reader import SYN_DROPPED
+from touchpad_trace import EV_SYN, RECORD_SIZE, SYN_REPORT, read_header
+
+# Touchpad statistics from recorded traces, computed with whole-array NumPy operations.
+# The record section of a trace is memory-mapped as a structured array, so hour-long recordings
+# are never parsed record by record: report rate and jitter come from SYN_REPORT times, slot
+# churn and dwell from TRACKING_ID events sorted by slot, and per-frame finger positions from
+# forward-filling each slot's last X/Y event index across frames. Positions are classified
+# through the configured layout's compiled grid (steering, each kind of shifter gate, handbrake)
+# and binned into one occupancy heatmap per zone.
+
+TRACE_DTYPE = np.dtype([("sec", "<u4"), ("usec", "<u4"), ("type", "<u2"), ("code", "<u2"), ("value", "<i4")])
+
+# Report order of the zone names; a layout reports the ones it can produce.
+ZONES = (
+	"steer",
+	"neutral",
+	"reverse",
+	"gear1",
+	"gear2",
+	"gear3",
+	"gear4",
+	"shift_up",
+	"shift_down",
+	"shifter",
+	"handbrake",
+	"none",
+)
+
+# Frame gaps longer than this many median intervals are idle time, not jitter.
+IDLE_FACTOR = 5.0
+# Contacts shorter than this are counted as possible ghost touches.
+SHORT_CONTACT = 0.05
+
+assert TRACE_DTYPE.itemsize == RECORD_SIZE
+
+
+def load_trace(path):
+	# (metadata, structured record array backed by the file).
+	with open(path, "rb") as f:
+		meta, offset = read_header(f)
+	count = (os.path.getsize(path) - offset) // RECORD_SIZE
+	if count == 0:
+		return meta, np.zeros(0, TRACE_DTYPE)
+	return meta, np.memmap(path, TRACE_DTYPE, "r", offset, shape=(count,))
+
+
+def _percentiles(values, qs=(50, 95, 99)):
+	if len(values) == 0:
+		return {f"p{q}": 0.0 for q in qs}
+	return {f"p{q}": float(v) for q, v in zip(qs, np.percentile(values, qs))}
+
+
+def _forward_fill(mask, frame_id, frames):
+	# Per frame, the index of the last record matching `mask` up to the end of that frame (-1
+	# before the first one).
+	idx = np.flatnonzero(mask)
+	out = np.full(frames, -1, np.int64)
+	if len(idx):
+		fid = frame_id[idx]
+		last = np.r_[fid[1:] != fid[:-1], True]
+		out[fid[last]] = idx[last]
+		np.maximum.accumulate(out, out=out)
+	return out
+
+
+def report_rate(times):
+	# times: SYN_REPORT timestamps in seconds.
+	out = {"frames": int(len(times))}
+	if len(times) < 2:
+		return out
+	dt = np.diff(times)
+	median = float(np.median(dt))
+	active = dt[dt <= max(median * IDLE_FACTOR, 1e-3)]
+	out.update(
+		duration_s=float(times[-1] - times[0]),
+		active_s=float(active.sum()),
+		idle_gaps=int(len(dt) - len(active)),
+		rate_hz=1.0 / median if median > 0 else 0.0,
+		mean_rate_hz=float(len(active) / active.sum()) if active.sum() > 0 else 0.0,
+		jitter_us=float(active.std() * 1e6),
+		interval_us={k: v * 1e6 for k, v in _percentiles(active, (50, 95, 99, 99.9)).items()},
+		max_interval_us=float(active.max() * 1e6) if len(active) else 0.0,
+	)
+	return out
+
+
+def slot_dwell(slot, value, times, tracking, end_time):
+	# Contact lifetimes from TRACKING_ID events, grouped by slot.
+	idx = np.flatnonzero(tracking)
+	if not len(idx):
+		return {"contacts": 0}
+	order = np.lexsort((idx, slot[idx]))
+	idx = idx[order]
+	s = slot[idx]
+	starts = value[idx] != -1
+	same_next = np.r_[s[1:] == s[:-1], False]
+	t = times[idx]
+	t_end = np.where(same_next, np.r_[t[1:], 0.0], end_time)
+	dwell = (t_end - t)[starts]
+	dwell_slot = s[starts]
+	out = {
+		"contacts": int(starts.sum()),
+		"open_at_end": int((starts & ~same_next).sum()),
+		"contacts_per_min": 0.0,
+		"dwell_s": _percentiles(dwell),
+		"short_contacts": int((dwell < SHORT_CONTACT).sum()),
+		"per_slot": {},
+	}
+	for sl in np.unique(dwell_slot):
+		d = dwell[dwell_slot == sl]
+		out["per_slot"][int(sl)] = {"contacts": int(len(d)), "dwell_s": _percentiles(d, (50, 95))}
+	return out
+
+
+class Classifier:
+	# The joy bridge's compiled layout as NumPy tables: names lists the zones this layout can
+	# produce, and every grid cell maps to an index into it.
+
+	def __init__(self, config, x_min, x_max, y_min, y_max):
+		layout = compile_layout(resolve_layout(config), x_min, x_max, y_min, y_max)
+		labels = []
+		for zone, gate in zip(layout.cell_zone, layout.cell_gate):
+			if zone == ZONE_STEER:
+				labels.append("steer")
+			elif zone == ZONE_SHIFTER:
+				labels.append(gate_label(layout, gate) if gate >= 0 else "shifter")
+			elif zone == ZONE_HANDBRAKE:
+				labels.append("handbrake")
+			else:
+				labels.append("none")
+		self.names = tuple(name for name in ZONES if name in labels)
+		self.cell_index = np.array([self.names.index(name) for name in labels], np.int8)
+		self.cols = np.array(layout.cols, np.int64)
+		self.rows = np.array(layout.rows, np.int64)
+		self.x_origin = layout.x_origin
+		self.y_origin = layout.y_origin
+
+	def classify(self, x, y):
+		# Zone index (into names) for each position; out-of-range positions clamp as in the engine.
+		xi = np.clip(x - self.x_origin, 0, len(self.cols) - 1)
+		yi = np.clip(y - self.y_origin, 0, len(self.rows) - 1)
+		return self.cell_index[self.cols[xi] + self.rows[yi]]
+
+
+def analyze(path, config, bins=64):
+	start = time.monotonic()
+	meta, rec = load_trace(path)
+	absinfo = meta.get("absinfo", {})
+	x_min, x_max = absinfo.get(str(ABS_MT_POSITION_X), [0, 0, 1])[1:3]
+	y_min, y_max = absinfo.get(str(ABS_MT_POSITION_Y), [0, 0, 1])[1:3]
+	num_slots = absinfo.get(str(ABS_MT_SLOT), [0, 0, 15])[2] + 1
+
+	etype = rec["type"]
+	code = rec["code"]
+	value = rec["value"].astype(np.int64)
+	times = rec["sec"].astype(np.float64) + rec["usec"] * 1e-6
+	syn = (etype == EV_SYN) & (code == SYN_REPORT)
+	dropped = (etype == EV_SYN) & (code == SYN_DROPPED)
+	keep = np.ones(len(rec), bool)
+	if dropped.any():
+		# As in the readers, everything from SYN_DROPPED through the next SYN_REPORT is discarded.
+		syn_idx = np.flatnonzero(syn)
+		first = np.flatnonzero(dropped)
+		pos = np.searchsorted(syn_idx, first)
+		last = np.where(pos < len(syn_idx), syn_idx[np.minimum(pos, len(syn_idx) - 1)], len(rec) - 1)
+		edges = np.zeros(len(rec) + 1, np.int64)
+		np.add.at(edges, first, 1)
+		np.add.at(edges, last + 1, -1)
+		keep = np.cumsum(edges[:-1]) == 0
+		syn &= keep
+	frames = int(syn.sum())
+	# Records belong to the frame their next SYN_REPORT closes; a trailing partial frame is dropped.
+	frame_id = np.cumsum(syn) - syn
+	in_frame = keep & (frame_id < frames)
+
+	is_abs = etype == EV_ABS
+	slot_idx = np.flatnonzero(is_abs & (code == ABS_MT_SLOT) & keep)
+	last_slot = np.full(len(rec), -1, np.int64)
+	last_slot[slot_idx] = slot_idx
+	np.maximum.accumulate(last_slot, out=last_slot)
+	slot = np.where(last_slot >= 0, value[np.maximum(last_slot, 0)], 0)
+
+	out = {
+		"trace": path,
+		"device": meta.get("name"),
+		"events": int(len(rec)),
+		"dropped": int(dropped.sum()),
+		"rate": report_rate(times[syn]),
+	}
+	out["events_per_frame"] = float(in_frame.sum() / frames) if frames else 0.0
+
+	tracking = is_abs & (code == ABS_MT_TRACKING_ID) & in_frame
+	end_time = float(times[syn][-1]) if frames else 0.0
+	out["slots"] = slot_dwell(slot, value, times, tracking, end_time)
+	active_s = out["rate"].get("duration_s", 0.0)
+	if active_s > 0:
+		out["slots"]["contacts_per_min"] = out["slots"]["contacts"] * 60.0 / active_s
+
+	# Per slot: the frame-by-frame position and whether a contact is down.
+	nby = max(1, int(round(bins * (y_max - y_min) / max(1, x_max - x_min))))
+	classifier = Classifier(config, x_min, x_max, y_min, y_max)
+	names = classifier.names
+	heat = np.zeros(len(names) * nby * bins, np.int64)
+	zone_counts = np.zeros(len(names), np.int64)
+	concurrent = np.zeros(frames, np.int16)
+	sx = bins / max(1, x_max - x_min + 1)
+	sy = nby / max(1, y_max - y_min + 1)
+	for s in range(num_slots):
+		mine = in_frame & is_abs & (slot == s)
+		lx = _forward_fill(mine & (code == ABS_MT_POSITION_X), frame_id, frames)
+		ly = _forward_fill(mine & (code == ABS_MT_POSITION_Y), frame_id, frames)
+		lt = _forward_fill(mine & (code == ABS_MT_TRACKING_ID), frame_id, frames)
+		placed = (lx >= 0) & (ly >= 0)
+		down = np.where(lt >= 0, value[np.maximum(lt, 0)] != -1, placed) & placed
+		if not down.any():
+			continue
+		concurrent += down
+		x = value[lx[down]]
+		y = value[ly[down]]
+		zone = classifier.classify(x, y)
+		zone_counts += np.bincount(zone, minlength=len(names))
+		bx = np.clip(((x - x_min) * sx).astype(np.int64), 0, bins - 1)
+		by = np.clip(((y - y_min) * sy).astype(np.int64), 0, nby - 1)
+		heat += np.bincount((zone.astype(np.int64) * nby + by) * bins + bx, minlength=len(heat))
+
+	samples = int(zone_counts.sum())
+	out["touch_samples"] = samples
+	out["zones"] = {
+		name: float(zone_counts[i] / samples) if samples else 0.0 for i, name in enumerate(names)
+	}
+	out["fingers"] = {
+		"max": int(concurrent.max()) if frames else 0,
+		"frames_by_count": {int(n): int(c) for n, c in enumerate(np.bincount(concurrent)) if c} if frames else {},
+	}
+	out["analysis_s"] = time.monotonic() - start
+	return out, heat.reshape(len(names), nby, bins)
+
+
+def write_heatmaps(directory, stem, names, heat):
+	# heatmaps as .npz plus one log-scaled PGM per zone (viewable without any extra tooling).
+	os.makedirs(directory, exist_ok=True)
+	np.savez_compressed(os.path.join(directory, f"{stem}.heatmaps.npz"), **dict(zip(names, heat)))
+	for name, counts in zip(names, heat):
+		scaled = np.log1p(counts.astype(np.float64))
+		peak = scaled.max()
+		img = (scaled * (255.0 / peak) if peak > 0 else scaled).astype(np.uint8)
+		with open(os.path.join(directory, f"{stem}.{name}.pgm"), "wb") as f:
+			f.write(f"P5 {img.shape[1]} {img.shape[0]} 255\n".encode("ascii"))
+			f.write(img.tobytes())
+
+
+def print_report(r):
+	rate = r["rate"]
+	slots = r["slots"]
+	print(f"{r['trace']}: {r['device']}, {r['events']} events in {r['analysis_s']:.2f} s")
+	if "rate_hz" in rate:
+		iv = rate["interval_us"]
+		print(
+			f"  report rate  {rate['rate_hz']:.1f} Hz (mean {rate['mean_rate_hz']:.1f} Hz), {rate['frames']} frames, "
+			f"{rate['active_s']:.1f} s active of {rate['duration_s']:.1f} s, {rate['idle_gaps']} idle gaps"
+		)
+		print(
+			f"  interval     p50 {iv['p50']:.0f} us  p95 {iv['p95']:.0f} us  p99 {iv['p99']:.0f} us  "
+			f"p99.9 {iv['p99.9']:.0f} us  max {rate['max_interval_us']:.0f} us  jitter {rate['jitter_us']:.0f} us"
+		)
+	print(f"  events/frame {r['events_per_frame']:.1f}  SYN_DROPPED {r['dropped']}")
+	if slots["contacts"]:
+		d = slots["dwell_s"]
+		print(
+			f"  contacts     {slots['contacts']} ({slots['contacts_per_min']:.1f}/min), dwell p50 {d['p50']:.2f} s "
+			f"p95 {d['p95']:.2f} s, {slots['short_contacts']} under {SHORT_CONTACT * 1000:.0f} ms"
+		)
+		for s, info in sorted(slots["per_slot"].items()):
+			print(f"    slot {s}: {info['contacts']} contacts, dwell p50 {info['dwell_s']['p50']:.2f} s")
+	zones = "  ".join(f"{name} {frac * 100:.1f}%" for name, frac in r["zones"].items())
+	print(f"  zones        {zones}")
+	counts = ", ".join(f"{n}: {c}" for n, c in r["fingers"]["frames_by_count"].items())
+	print(f"  fingers      max {r['fingers']['max']}; frames by count {counts}")
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Report rate, jitter, slot churn and touch heatmaps for traces")
+	parser.add_argument("traces", nargs="+", help="recorded trace files")
+	parser.add_argument("--config", help="joy bridge config for the layout and neutral band (default: built-in)")
+	parser.add_argument("--bins", type=int, default=64, help="heatmap columns; rows follow the pad aspect")
+	parser.add_argument("--heatmaps", metavar="DIR", help="write per-zone heatmaps (.npz and .pgm) here")
+	parser.add_argument("--json", metavar="FILE", help="write all statistics as JSON ('-' for stdout)")
+	args = parser.parse_args()
+
+	config = load_config(args.config)
+	results = []
+	for path in args.traces:
+		result, heat = analyze(path, config, args.bins)
+		results.append(result)
+		if args.json != "-":
+			print_report(result)
+		if args.heatmaps:
+			stem = os.path.splitext(os.path.basename(path))[0]
+			write_heatmaps(args.heatmaps, stem, list(result["zones"]), heat)
+	if args.json == "-":
+		json.dump(results, sys.stdout, indent=2)
+		print()
+	elif args.json:
+		with open(args.json, "w", encoding="ascii") as f:
+			json.dump(results, f, indent=2)
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from touchpad_config import CONFIG_LIMITS, validate_config
+from touchpad_joy_engine import (
+	ABS_MT_POSITION_X,
+	ABS_MT_POSITION_Y,
+	ABS_MT_SLOT,
+	DEFAULT_CONFIG,
+	JoyBridgeEngine,
+)
+from touchpad_layout import layout_source
+from touchpad_mt_sync import MTState, replay_mt_state
+from touchpad_reader import DROPPED, frame_records
+from touchpad_trace import ReplayDevice, iter_records
+
+# Offline tuning of the joy bridge over recorded, labelled sessions.
+# Each session is a trace plus a sidecar <name>.labels.json saying what the driver meant:
+#
+#   {
+#     "gears": [[1.20, 1], [4.85, 2], [9.10, 0]],   intended gear from t seconds on
+#     "steer": [[0.0, 0.0], [2.5, -0.4]],           intended steer axis (-1..1), held until the next
+#     "throttle": [[0.0, 0.0], [6.0, 0.8]],         intended throttle (-1..1), held likewise
+#     "tolerance": 0.25                              seconds a shift may lead its label
+#   }
+#
+# Times are relative to the trace's first frame; every key is optional. Traces are decoded once
+# per worker process; each configuration is then a plain replay through JoyBridgeEngine on event
+# time, so results are deterministic and independent of the machine's load.
+
+# Searched by default, with the ranges sampled for --random and split for --grid.
+DEFAULT_SPACE = {
+	"steer_delta_scale": (0.03, 0.3),
+	"steer_deadzone": (0.0, 60.0),
+	"neutral_min": (0.35, 0.5),
+	"neutral_max": (0.5, 0.65),
+	"gear_hold_time": (0.02, 0.3),
+	"throttle_sensitivity": (0.5, 3.0),
+}
+
+Session = namedtuple("Session", "name x_min x_max y_min y_max num_slots frames gears steer throttle tolerance")
+Result = namedtuple(
+	"Result", "config score false_shifts missed_shifts shifts latency_mean latency_p95 steer_rmse throttle_rmse"
+)
+
+
+def _absolute(points, t0):
+	return [(t0 + float(t), float(v)) for t, v in points]
+
+
+def load_session(trace_path, labels_path):
+	# Frames become (time, [(type, code, value), ...]) or (time, MTState) for a SYN_DROPPED.
+	dev = ReplayDevice(trace_path, 0)
+	abs_x = dev.absinfo(ABS_MT_POSITION_X)
+	abs_y = dev.absinfo(ABS_MT_POSITION_Y)
+	abs_slot = dev.absinfo(ABS_MT_SLOT)
+	num_slots = abs_slot.max + 1
+	records = list(iter_records(trace_path))
+	frames = []
+	consumed = [0]
+
+	def counted():
+		for rec in records:
+			consumed[0] += 1
+			yield rec
+
+	t = 0.0
+	for frame in frame_records(counted()):
+		if frame is DROPPED:
+			frames.append((t, replay_mt_state(records[: consumed[0]], num_slots)))
+			continue
+		t = max(t, frame[-1][0] + frame[-1][1] * 1e-6)
+		frames.append((t, [(r[2], r[3], r[4]) for r in frame[:-1]]))
+	with open(labels_path, "r", encoding="utf-8") as f:
+		labels = json.load(f)
+	t0 = frames[0][0] if frames else 0.0
+	return Session(
+		os.path.basename(trace_path),
+		abs_x.min,
+		abs_x.max,
+		abs_y.min,
+		abs_y.max,
+		num_slots,
+		frames,
+		[(t, int(g)) for t, g in _absolute(labels.get("gears", []), t0)],
+		_absolute(labels.get("steer", []), t0),
+		_absolute(labels.get("throttle", []), t0),
+		float(labels.get("tolerance", 0.25)),
+	)
+
+
+def load_sessions(directory):
+	sessions = []
+	for name in sorted(os.listdir(directory)):
+		if not name.endswith(".trace"):
+			continue
+		trace_path = os.path.join(directory, name)
+		labels_path = os.path.join(directory, name[: -len(".trace")] + ".labels.json")
+		if not os.path.exists(labels_path):
+			print(f"{name}: no labels, skipped", file=sys.stderr)
+			continue
+		sessions.append(load_session(trace_path, labels_path))
+	return sessions
+
+
+def replay(session, config):
+	# Output gear changes [(t, gear)] plus squared steer/throttle error sums against the labels.
+	engine = JoyBridgeEngine(
+		session.x_min, session.x_max, session.y_min, session.y_max, config, session.num_slots
+	)
+	feed = engine.feed_values
+	on_syn = engine.on_syn
+	resync = engine.resync
+	steer_targets = session.steer
+	throttle_targets = session.throttle
+	si = ti = -1
+	steer_target = throttle_target = 0.0
+	steer_sq = throttle_sq = 0.0
+	steer_n = throttle_n = 0
+	gear = 0
+	changes = []
+	for t, events in session.frames:
+		if events.__class__ is MTState:
+			resync(events)
+		else:
+			for etype, code, value in events:
+				feed(etype, code, value)
+		frame = on_syn(t)
+		if frame.gear != gear:
+			gear = frame.gear
+			changes.append((t, gear))
+		if steer_targets:
+			while si + 1 < len(steer_targets) and steer_targets[si + 1][0] <= t:
+				si += 1
+				steer_target = steer_targets[si][1]
+			if si >= 0:
+				err = frame.steer / 32767.0 - steer_target
+				steer_sq += err * err
+				steer_n += 1
+		if throttle_targets:
+			while ti + 1 < len(throttle_targets) and throttle_targets[ti + 1][0] <= t:
+				ti += 1
+				throttle_target = throttle_targets[ti][1]
+			if ti >= 0:
+				err = frame.throttle - throttle_target
+				throttle_sq += err * err
+				throttle_n += 1
+	return changes, steer_sq, steer_n, throttle_sq, throttle_n
+
+
+def match_shifts(labels, changes, tolerance, end):
+	# Each label claims the first change to its gear between (label - tolerance) and the next
+	# label. Returns (latencies of matched labels, missed labels, unmatched changes).
+	used = [False] * len(changes)
+	latencies = []
+	missed = 0
+	for i, (t, g) in enumerate(labels):
+		until = labels[i + 1][0] if i + 1 < len(labels) else end
+		for j, (ct, cg) in enumerate(changes):
+			if used[j] or ct < t - tolerance:
+				continue
+			if ct > until:
+				break
+			if cg == g:
+				used[j] = True
+				latencies.append(max(0.0, ct - t))
+				break
+		else:
+			missed += 1
+	return latencies, missed, used.count(False)
+
+
+def evaluate(config, sessions, weights):
+	latencies = []
+	missed = false = shifts = 0
+	steer_sq = throttle_sq = 0.0
+	steer_n = throttle_n = 0
+	for session in sessions:
+		changes, s_sq, s_n, t_sq, t_n = replay(session, config)
+		end = session.frames[-1][0] if session.frames else 0.0
+		lat, miss, unmatched = match_shifts(session.gears, changes, session.tolerance, end)
+		latencies.extend(lat)
+		missed += miss
+		false += unmatched
+		shifts += len(session.gears)
+		steer_sq += s_sq
+		steer_n += s_n
+		throttle_sq += t_sq
+		throttle_n += t_n
+	latencies.sort()
+	latency_mean = sum(latencies) / len(latencies) if latencies else 0.0
+	latency_p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else 0.0
+	steer_rmse = math.sqrt(steer_sq / steer_n) if steer_n else 0.0
+	throttle_rmse = math.sqrt(throttle_sq / throttle_n) if throttle_n else 0.0
+	score = (
+		weights["false"] * false
+		+ weights["missed"] * missed
+		+ weights["latency"] * latency_mean
+		+ weights["steer"] * steer_rmse
+		+ weights["throttle"] * throttle_rmse
+	)
+	return Result(
+		config, score, false, missed, shifts, latency_mean, latency_p95, steer_rmse, throttle_rmse
+	)
+
+
+# Worker state: sessions are shipped once per process, not once per configuration.
+_sessions = None
+_weights = None
+
+
+def _init_worker(sessions, weights):
+	global _sessions, _weights
+	_sessions = sessions
+	_weights = weights
+
+
+def _evaluate(config):
+	return evaluate(config, _sessions, _weights)
+
+
+def parse_param(text):
+	# name=lo:hi (range) or name=a,b,c (explicit values)
+	name, _, spec = text.partition("=")
+	if name not in CONFIG_LIMITS:
+		raise argparse.ArgumentTypeError(f"unknown parameter {name!r}")
+	try:
+		if ":" in spec:
+			lo, hi = (float(v) for v in spec.split(":", 1))
+			return name, (lo, hi)
+		return name, [float(v) for v in spec.split(",")]
+	except ValueError:
+		raise argparse.ArgumentTypeError(f"expected {name}=lo:hi or {name}=a,b,c")
+
+
+def grid_configs(space, steps):
+	axes = []
+	for name, spec in space.items():
+		if isinstance(spec, list):
+			values = spec
+		elif steps == 1:
+			values = [(spec[0] + spec[1]) / 2.0]
+		else:
+			values = [spec[0] + (spec[1] - spec[0]) * i / (steps - 1) for i in range(steps)]
+		axes.append((name, values))
+	configs = [{}]
+	for name, values in axes:
+		configs = [dict(c, **{name: v}) for c in configs for v in values]
+	return configs
+
+
+def random_configs(space, count, rng):
+	configs = []
+	for _ in range(count):
+		config = {}
+		for name, spec in space.items():
+			config[name] = rng.choice(spec) if isinstance(spec, list) else rng.uniform(*spec)
+		configs.append(config)
+	return configs
+
+
+def refine_configs(space, best, count, scale, rng):
+	# New samples in a box of `scale` times each range around the best configurations so far.
+	configs = []
+	for i in range(count):
+		center = best[i % len(best)].config
+		config = {}
+		for name, spec in space.items():
+			if isinstance(spec, list):
+				config[name] = rng.choice(spec)
+				continue
+			lo, hi = spec
+			half = (hi - lo) * scale / 2.0
+			config[name] = min(hi, max(lo, rng.uniform(center[name] - half, center[name] + half)))
+		configs.append(config)
+	return configs
+
+
+def complete(configs, base):
+	# Full, validated engine configs; combinations the bridge would reject are dropped.
+	out = []
+	for partial in configs:
+		config, errors = validate_config(partial, base)
+		if not errors:
+			out.append(config)
+	return out
+
+
+def run_batch(pool, configs, jobs):
+	chunksize = max(1, len(configs) // (jobs * 8))
+	return list(pool.map(_evaluate, configs, chunksize=chunksize))
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Tune joy bridge parameters over labelled recorded sessions")
+	parser.add_argument("sessions", help="directory of *.trace files with *.labels.json sidecars")
+	parser.add_argument(
+		"--param",
+		action="append",
+		type=parse_param,
+		default=[],
+		metavar="NAME=LO:HI|A,B,C",
+		help="parameter to search (repeatable; default: the steering and shifter parameters)",
+	)
+	parser.add_argument("--grid", type=int, metavar="STEPS", help="full grid with STEPS values per range")
+	parser.add_argument("--random", type=int, default=500, metavar="N", help="random samples (default: %(default)s)")
+	parser.add_argument(
+		"--refine",
+		type=int,
+		default=2,
+		metavar="ROUNDS",
+		help="rounds of resampling around the best configurations, halving the box each round",
+	)
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="worker processes")
+	parser.add_argument("--base", help="config JSON the searched parameters are applied on top of")
+	parser.add_argument("--w-false", type=float, default=1.0, help="score weight per false shift")
+	parser.add_argument("--w-missed", type=float, default=2.0, help="score weight per missed shift")
+	parser.add_argument("--w-latency", type=float, default=10.0, help="score weight per second of mean shift latency")
+	parser.add_argument("--w-steer", type=float, default=5.0, help="score weight for steer RMS error")
+	parser.add_argument("--w-throttle", type=float, default=2.0, help="score weight for throttle RMS error")
+	parser.add_argument("--top", type=int, default=10, help="configurations to list")
+	parser.add_argument("--out", help="write the best config here, in the bridge's --config format")
+	parser.add_argument("--report", help="write every evaluated configuration and its metrics as JSON")
+	args = parser.parse_args()
+
+	start = time.monotonic()
+	sessions = load_sessions(args.sessions)
+	if not sessions:
+		print(f"No labelled sessions in {args.sessions}.", file=sys.stderr)
+		return 1
+	frames = sum(len(s.frames) for s in sessions)
+	print(f"{len(sessions)} sessions, {frames} frames, loaded in {time.monotonic() - start:.1f} s", file=sys.stderr)
+
+	base = dict(DEFAULT_CONFIG)
+	if args.base:
+		from touchpad_config import load_config
+
+		base = load_config(args.base)
+	space = dict(args.param) if args.param else dict(DEFAULT_SPACE)
+	weights = {
+		"false": args.w_false,
+		"missed": args.w_missed,
+		"latency": args.w_latency,
+		"steer": args.w_steer,
+		"throttle": args.w_throttle,
+	}
+	rng = random.Random(args.seed)
+
+	results = []
+	start = time.monotonic()
+	with ProcessPoolExecutor(args.jobs, initializer=_init_worker, initargs=(sessions, weights)) as pool:
+		if args.grid:
+			configs = complete(grid_configs(space, args.grid), base)
+		else:
+			configs = complete(random_configs(space, args.random, rng), base)
+		results.extend(run_batch(pool, configs, args.jobs))
+		scale = 0.5
+		for _ in range(args.refine if not args.grid else 0):
+			if not results:
+				break
+			results.sort(key=lambda r: r.score)
+			best = results[: max(1, len(results) // 10)]
+			configs = complete(refine_configs(space, best, args.random, scale, rng), base)
+			results.extend(run_batch(pool, configs, args.jobs))
+			scale /= 2.0
+	elapsed = time.monotonic() - start
+	if not results:
+		print("no valid configuration: the config limits rejected every candidate", file=sys.stderr)
+		return 1
+	results.sort(key=lambda r: r.score)
+	print(
+		f"{len(results)} configurations in {elapsed:.1f} s on {args.jobs} workers "
+		f"({len(results) * frames / elapsed / 1e6:.2f} M frames/s)",
+		file=sys.stderr,
+	)
+
+	names = list(space)
+	print("score    false missed  lat ms  p95 ms  steer  thr    " + "  ".join(names))
+	for r in results[: args.top]:
+		print(
+			f"{r.score:7.3f} {r.false_shifts:6d} {r.missed_shifts:6d} {r.latency_mean * 1000:7.1f} "
+			f"{r.latency_p95 * 1000:7.1f}  {r.steer_rmse:.3f}  {r.throttle_rmse:.3f}  "
+			+ "  ".join(f"{r.config[n]:.4g}" for n in names)
+		)
+
+	best = results[0]
+	if args.out:
+		# The whole validated config; a layout read from a file is written as its path again.
+		out = dict(best.config)
+		source = layout_source(out)
+		if source is not None:
+			out["layout"] = source
+		with open(args.out, "w", encoding="ascii") as f:
+			json.dump(out, f, indent=2)
+			f.write("\n")
+		print(f"best config written to {args.out}", file=sys.stderr)
+	if args.report:
+		with open(args.report, "w", encoding="ascii") as f:
+			json.dump([r._asdict() for r in results], f)
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
@@ -0,0 +1,10 @@
+#!/usr/bin/env python3
+from touchpad_supervisor import main
+
+# __main__.py of an installed bridge bundle. Godot copies the bridge modules into
+# user://bridge/<content hash>/, adds this file as __main__.py and starts "python3 <that dir>".
+# Python compiles __main__ from source on every start and never caches it, so this stays a stub;
+# the modules it imports are compiled once per bundle version into the directory's __pycache__,
+# and a changed module means a new directory rather than a stale copy.
+
+raise SystemExit(main())
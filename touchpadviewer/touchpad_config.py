@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+import json
+import os
+import select
+import sys
+import threading
+import time
+
+from touchpad_inotify import (
+	IN_CLOSE_WRITE,
+	IN_CREATE,
+	IN_DELETE,
+	IN_MOVED_TO,
+	inotify_names,
+	inotify_open,
+	inotify_watch,
+)
+from touchpad_joy_engine import DEFAULT_CONFIG
+from touchpad_layout import layout_source, load_layout
+
+# Joy bridge config: validation and change-driven reload.
+# A watcher thread waits for inotify events on the config file's directory (so editors and
+# Godot's write-then-rename both register), or stats the file periodically where inotify is
+# unavailable. It parses and validates off the input path and leaves the result for the bridge
+# to swap in between frames with take(). A "layout" key naming a layout file is read here too,
+# and that file is watched alongside the config, so editing a layout swaps it in the same way.
+
+# key: (min, max, min_exclusive). Every value is a finite number; anything else is rejected.
+# "layout" is the one non-numeric key: a built-in layout name, a layout file or an inline layout.
+CONFIG_LIMITS = {
+	"steer_delta_scale": (0.0, 10.0, True),
+	"steer_deadzone": (0.0, 10000.0, False),
+	"shift_margin": (0.0, 0.5, False),
+	"shift_gap": (0.0, 1.0, False),
+	"neutral_min": (0.0, 1.0, False),
+	"neutral_max": (0.0, 1.0, False),
+	"gear_hold_time": (0.0, 5.0, False),
+	"neutral_reset_hold": (0.0, 5.0, False),
+	"throttle_neutral_band": (0.0, 0.6, False),
+	"throttle_sensitivity": (0.0, 100.0, False),
+	"steer_min_cutoff": (0.0, 100.0, False),
+	"steer_beta": (0.0, 10.0, False),
+	"steer_d_cutoff": (0.0, 100.0, True),
+	"steer_predict_ms": (0.0, 100.0, False),
+	"steer_predictor": (1.0, 2.0, False),
+	"steer_kalman_q": (0.0, 1e9, True),
+	"steer_kalman_r": (0.0, 1e6, True),
+	"steer_delta_cutoff": (0.0, 0.5, False),
+	"steer_deadzone_hysteresis": (0.0, 10000.0, False),
+	"throttle_min_cutoff": (0.0, 100.0, False),
+	"throttle_beta": (0.0, 100.0, False),
+	"throttle_d_cutoff": (0.0, 100.0, True),
+	"shift_hysteresis": (0.0, 0.5, False),
+}
+
+
+def validate_config(data, base=None, directory=None, warnings=None):
+	# Returns (config, errors). Rejected or missing keys keep their value from `base`.
+	# Relative layout paths are taken from `directory` (the config file's) when given.
+	# Unknown keys (a newer or older build's, Godot-only ones) are ignored, not errors; they are
+	# reported in `warnings` when a list is passed.
+	config = dict(base if base is not None else DEFAULT_CONFIG)
+	errors = []
+	if not isinstance(data, dict):
+		return config, ["config must be a JSON object"]
+	for key, value in data.items():
+		if key == "layout":
+			layout, layout_errors = load_layout(value, directory)
+			if layout_errors:
+				errors.extend(f"layout: {err}" for err in layout_errors)
+				continue
+			config[key] = layout
+			continue
+		limits = CONFIG_LIMITS.get(key)
+		if limits is None:
+			if warnings is not None:
+				warnings.append(f"{key}: unknown key, ignored")
+			continue
+		if isinstance(value, bool) or not isinstance(value, (int, float)):
+			errors.append(f"{key}: expected a number, got {type(value).__name__}")
+			continue
+		value = float(value)
+		lo, hi, lo_exclusive = limits
+		if value != value or value < lo or value > hi or (lo_exclusive and value == lo):
+			bound = "(" if lo_exclusive else "["
+			errors.append(f"{key}: {value:g} outside {bound}{lo:g}, {hi:g}]")
+			continue
+		config[key] = value
+	if config["neutral_min"] > config["neutral_max"]:
+		errors.append("neutral_min > neutral_max; keeping the previous neutral band")
+		config["neutral_min"] = (base or DEFAULT_CONFIG)["neutral_min"]
+		config["neutral_max"] = (base or DEFAULT_CONFIG)["neutral_max"]
+	return config, errors
+
+
+def read_config(path, base=None, warnings=None):
+	# Returns (config, errors), or (None, errors) when the file can't be read or parsed.
+	try:
+		with open(path, "r", encoding="ascii") as f:
+			data = json.load(f)
+	except OSError as exc:
+		return None, [str(exc)]
+	except (ValueError, UnicodeDecodeError) as exc:
+		return None, [f"invalid JSON: {exc}"]
+	return validate_config(data, base, os.path.dirname(os.path.abspath(path)), warnings)
+
+
+def load_config(path):
+	# Startup load: defaults for anything missing or invalid.
+	if not path:
+		return dict(DEFAULT_CONFIG)
+	warnings = []
+	config, errors = read_config(path, warnings=warnings)
+	for err in warnings + errors:
+		print(f"config: {err}", file=sys.stderr)
+	return config if config is not None else dict(DEFAULT_CONFIG)
+
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+
+def changed_keys(old, new):
+	return sorted(k for k in new if old.get(k) != new[k])
+
+
+def file_signature(path):
+	try:
+		st = os.stat(path)
+	except OSError:
+		return None
+	return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class ConfigReloader:
+	# Watches `path` from a daemon thread. take() is the only call on the input path: one
+	# attribute swap, None when nothing new arrived.
+
+	def __init__(self, path, config, poll_interval=0.25, notify=None, log=True):
+		self.path = os.path.abspath(path)
+		self.config = config
+		self.poll_interval = poll_interval
+		self.notify = notify
+		self.log = log
+		self.pending = None
+		self.reloads = 0
+		self.rejected = 0
+		self.last_latency = 0.0
+		self.inotify_fd = None
+		self._name = os.fsencode(os.path.basename(self.path))
+		self._layout = None
+		self._layout_name = None
+		self._signature = self._signatures()
+		self._stop_r, self._stop_w = os.pipe()
+		self._thread = None
+
+	def start(self):
+		self.inotify_fd = inotify_open(os.path.dirname(self.path), WATCH_MASK)
+		self._watch_layout(self.config)
+		self._thread = threading.Thread(target=self._run, name="config-reload", daemon=True)
+		self._thread.start()
+		return self
+
+	def stop(self):
+		if self._thread is not None:
+			os.write(self._stop_w, b"x")
+			self._thread.join(1.0)
+			self._thread = None
+		for fd in (self.inotify_fd, self._stop_r, self._stop_w):
+			if fd is not None:
+				os.close(fd)
+		self.inotify_fd = None
+
+	def take(self):
+		pending = self.pending
+		if pending is None:
+			return None
+		self.pending = None
+		config, detected = pending
+		old = self.config
+		self.config = config
+		self.reloads += 1
+		self.last_latency = time.monotonic() - detected
+		if self.log:
+			keys = changed_keys(old, config)
+			print(
+				f"\nconfig: reloaded in {self.last_latency * 1000:.1f} ms, changed: {', '.join(keys)}",
+				file=sys.stderr,
+			)
+		return config
+
+	def _run(self):
+		watch = [self._stop_r]
+		timeout = self.poll_interval
+		if self.inotify_fd is not None:
+			watch.append(self.inotify_fd)
+			# Directory watch catches renames; a slow stat still covers bind mounts and NFS.
+			timeout = max(1.0, self.poll_interval)
+		while True:
+			ready, _, _ = select.select(watch, [], [], timeout)
+			if self._stop_r in ready:
+				return
+			detected = time.monotonic()
+			signature = self._signatures()
+			if self.inotify_fd in ready:
+				names = inotify_names(self.inotify_fd)
+				if self._name not in names and self._layout_name not in names:
+					continue
+			elif signature == self._signature:
+				continue
+			self._signature = signature
+			if signature[0] is not None:
+				self._reload(detected)
+
+	def _signatures(self):
+		return (file_signature(self.path), file_signature(self._layout) if self._layout else None)
+
+	def _watch_layout(self, config):
+		# Follow the layout file the newest config reads; a built-in or inline layout has none.
+		path = layout_source(config)
+		if path == self._layout:
+			return
+		self._layout = path
+		self._layout_name = os.fsencode(os.path.basename(path)) if path else None
+		if path and self.inotify_fd is not None:
+			inotify_watch(self.inotify_fd, os.path.dirname(path), WATCH_MASK)
+
+	def _reload(self, detected):
+		base = self.pending[0] if self.pending is not None else self.config
+		warnings = []
+		config, errors = read_config(self.path, base, warnings)
+		self.rejected += len(errors)
+		if self.log:
+			for err in warnings + errors:
+				print(f"\nconfig: {err}", file=sys.stderr)
+		if config is None or config == base:
+			return
+		self._watch_layout(config)
+		self.pending = (config, detected)
+		if self.notify is not None:
+			self.notify()
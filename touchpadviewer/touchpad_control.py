@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import socket
+import struct
+import sys
+import time
+
+from touchpad_state_shm import frame_flags
+
+# Control and state channel: one SOCK_SEQPACKET Unix socket, one message per packet.
+# Every message is an 8-byte header <BBHI (type, status, request id, payload length) followed by
+# the payload; a packet whose length disagrees with its header is a protocol error. Requests are
+# answered with the same request id. The bridge serves everything from its event loop, so a config
+# push is applied between two frames and acknowledged right after: the next frame uses it.
+#
+#   CONFIG      -> CONFIG_ACK     JSON object of config keys; all-or-nothing, status 1 if rejected
+#   SUBSCRIBE   -> SUBSCRIBE_ACK  <f state rate in Hz (0 stops); STATE is pushed at that rate
+#                                 whenever a new frame was processed since the previous push
+#   PING        -> PONG           payload echoed
+#   STATS       -> STATS_REPLY    JSON counters
+#   DUMP        -> DUMP_REPLY     flight recorder dump; JSON list of written traces
+#   HEARTBEAT   (pushed)          <dQ bridge monotonic time, frames processed; every interval
+#   STATE       (pushed)          STATE record below, same fields as the shared-memory HUD record
+# Unknown requests get ERROR with the request's id. The config file path stays as a fallback for
+# clients that cannot open Unix sockets (Godot has no API for them).
+
+MSG_CONFIG = 1
+MSG_CONFIG_ACK = 2
+MSG_SUBSCRIBE = 3
+MSG_SUBSCRIBE_ACK = 4
+MSG_STATE = 5
+MSG_HEARTBEAT = 6
+MSG_PING = 7
+MSG_PONG = 8
+MSG_STATS = 9
+MSG_STATS_REPLY = 10
+MSG_DUMP = 11
+MSG_DUMP_REPLY = 12
+MSG_ERROR = 13
+
+STATUS_OK = 0
+STATUS_REJECTED = 1
+
+HEADER = struct.Struct("<BBHI")
+RATE = struct.Struct("<f")
+HEARTBEAT = struct.Struct("<dQ")
+# frame number, time, gear, flags (touchpad_state_shm FLAG_*), throttle, steer, left x/y, right1 x/y, right2 x/y
+STATE = struct.Struct("<Qdii8f")
+
+MAX_MESSAGE = 65536
+MAX_RATE = 1000.0
+HEARTBEAT_INTERVAL = 0.5
+
+
+def pack(msg_type, payload=b"", status=STATUS_OK, request=0):
+	return HEADER.pack(msg_type, status, request, len(payload)) + payload
+
+
+def unpack(packet):
+	# (type, status, request id, payload); ValueError for a malformed packet.
+	if len(packet) < HEADER.size:
+		raise ValueError("short packet")
+	msg_type, status, request, length = HEADER.unpack_from(packet)
+	if len(packet) != HEADER.size + length:
+		raise ValueError(f"length {length} does not match a {len(packet)}-byte packet")
+	return msg_type, status, request, packet[HEADER.size :]
+
+
+def pack_state(seq, frame):
+	right_uv = frame.right_uv
+	return STATE.pack(
+		seq,
+		frame.now,
+		frame.gear,
+		frame_flags(frame),
+		frame.throttle,
+		frame.steer / 32767.0,
+		frame.left_u,
+		frame.left_v,
+		right_uv[0],
+		right_uv[1],
+		right_uv[2],
+		right_uv[3],
+	)
+
+
+class ControlClientState:
+	__slots__ = ("sock", "fd", "interval", "timer", "pushed_seq", "sent", "dropped")
+
+	def __init__(self, sock):
+		self.sock = sock
+		self.fd = sock.fileno()
+		self.interval = 0.0
+		self.timer = None
+		self.pushed_seq = -1
+		self.sent = 0
+		self.dropped = 0
+
+
+class ControlServer:
+	# Runs entirely on the bridge's asyncio loop: readers for the listening and client sockets,
+	# call_at timers for heartbeats and state pushes. Sends never block; a client that stops
+	# reading loses pushes (counted) rather than stalling the bridge.
+
+	def __init__(self, path, apply_config, stats, dump=None, heartbeat_interval=HEARTBEAT_INTERVAL):
+		# apply_config(dict) -> list of errors (empty when applied); stats() -> dict;
+		# dump() -> list of written paths, or None when there is no flight recorder.
+		self.path = path
+		self.apply_config = apply_config
+		self.stats = stats
+		self.dump = dump
+		self.heartbeat_interval = heartbeat_interval
+		self.loop = None
+		self.sock = None
+		self.clients = {}
+		self.source = None
+		self.frames = 0
+		self.heartbeat_timer = None
+		self.config_pushes = 0
+		self.config_rejected = 0
+		self.started = time.monotonic()
+
+	def start(self, loop):
+		self.loop = loop
+		try:
+			os.unlink(self.path)
+		except FileNotFoundError:
+			pass
+		sock = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+		sock.bind(self.path)
+		sock.listen(8)
+		sock.setblocking(False)
+		self.sock = sock
+		loop.add_reader(sock.fileno(), self._accept)
+		self.heartbeat_timer = loop.call_later(self.heartbeat_interval, self._heartbeat)
+
+	def close(self):
+		if self.sock is None:
+			return
+		if self.heartbeat_timer is not None:
+			self.heartbeat_timer.cancel()
+		for fd in list(self.clients):
+			self._drop(fd)
+		self.loop.remove_reader(self.sock.fileno())
+		self.sock.close()
+		self.sock = None
+		try:
+			os.unlink(self.path)
+		except OSError:
+			pass
+
+	def notify(self, source):
+		# Input path: remember the source, count the frame. State is packed only when pushed.
+		self.source = source
+		self.frames += 1
+
+	def _accept(self):
+		while True:
+			try:
+				conn, _ = self.sock.accept()
+			except (BlockingIOError, InterruptedError):
+				return
+			conn.setblocking(False)
+			self.clients[conn.fileno()] = ControlClientState(conn)
+			self.loop.add_reader(conn.fileno(), self._on_readable, conn.fileno())
+
+	def _drop(self, fd):
+		client = self.clients.pop(fd, None)
+		if client is None:
+			return
+		if client.timer is not None:
+			client.timer.cancel()
+		self.loop.remove_reader(fd)
+		client.sock.close()
+
+	def _send(self, client, packet):
+		try:
+			client.sock.send(packet)
+		except (BlockingIOError, InterruptedError):
+			client.dropped += 1
+			return False
+		except OSError:
+			self._drop(client.fd)
+			return False
+		return True
+
+	def _on_readable(self, fd):
+		client = self.clients.get(fd)
+		if client is None:
+			return
+		while True:
+			try:
+				packet = client.sock.recv(MAX_MESSAGE)
+			except (BlockingIOError, InterruptedError):
+				return
+			except OSError:
+				self._drop(fd)
+				return
+			if not packet:
+				self._drop(fd)
+				return
+			try:
+				msg_type, _, request, payload = unpack(packet)
+			except ValueError as exc:
+				self._send(client, pack(MSG_ERROR, json.dumps({"error": str(exc)}).encode(), STATUS_REJECTED))
+				continue
+			self._handle(client, msg_type, request, payload)
+			if fd not in self.clients:
+				return
+
+	def _handle(self, client, msg_type, request, payload):
+		if msg_type == MSG_PING:
+			self._send(client, pack(MSG_PONG, payload, request=request))
+		elif msg_type == MSG_CONFIG:
+			self.config_pushes += 1
+			try:
+				data = json.loads(payload)
+			except ValueError as exc:
+				errors = [f"invalid JSON: {exc}"]
+			else:
+				errors = self.apply_config(data)
+			if errors:
+				self.config_rejected += 1
+			reply = {"errors": errors, "frame": self.frames + 1}
+			status = STATUS_REJECTED if errors else STATUS_OK
+			self._send(client, pack(MSG_CONFIG_ACK, json.dumps(reply).encode(), status, request))
+		elif msg_type == MSG_SUBSCRIBE and len(payload) == RATE.size:
+			rate = RATE.unpack(payload)[0]
+			rate = min(MAX_RATE, rate) if rate == rate and rate > 0 else 0.0
+			if client.timer is not None:
+				client.timer.cancel()
+				client.timer = None
+			client.interval = 1.0 / rate if rate else 0.0
+			self._send(client, pack(MSG_SUBSCRIBE_ACK, RATE.pack(rate), request=request))
+			if rate:
+				client.pushed_seq = -1
+				self._push_state(client)
+		elif msg_type == MSG_STATS:
+			snapshot = self.snapshot()
+			self._send(client, pack(MSG_STATS_REPLY, json.dumps(snapshot).encode(), request=request))
+		elif msg_type == MSG_DUMP and self.dump is not None:
+			paths = self.dump()
+			status = STATUS_OK if paths else STATUS_REJECTED
+			self._send(client, pack(MSG_DUMP_REPLY, json.dumps(paths or []).encode(), status, request))
+		else:
+			error = json.dumps({"error": f"unsupported message type {msg_type}"}).encode()
+			self._send(client, pack(MSG_ERROR, error, STATUS_REJECTED, request))
+
+	def _push_state(self, client):
+		client.timer = None
+		if client.fd not in self.clients or not client.interval:
+			return
+		source = self.source
+		if source is not None and source.frame is not None and client.pushed_seq != self.frames:
+			if self._send(client, pack(MSG_STATE, pack_state(self.frames, source.frame))):
+				client.pushed_seq = self.frames
+				client.sent += 1
+			if client.fd not in self.clients:
+				return
+		client.timer = self.loop.call_later(client.interval, self._push_state, client)
+
+	def _heartbeat(self):
+		packet = pack(MSG_HEARTBEAT, HEARTBEAT.pack(time.monotonic(), self.frames))
+		for client in list(self.clients.values()):
+			self._send(client, packet)
+		self.heartbeat_timer = self.loop.call_later(self.heartbeat_interval, self._heartbeat)
+
+	def snapshot(self):
+		clients = self.clients.values()
+		out = dict(self.stats())
+		out["control"] = {
+			"clients": len(self.clients),
+			"subscribers": sum(1 for c in clients if c.interval),
+			"config_pushes": self.config_pushes,
+			"config_rejected": self.config_rejected,
+			"state_sent": sum(c.sent for c in clients),
+			"dropped": sum(c.dropped for c in clients),
+			"frames": self.frames,
+			"uptime_s": time.monotonic() - self.started,
+		}
+		return out
+
+
+class ControlClient:
+	# Blocking client. Pushed STATE/HEARTBEAT messages that arrive while waiting for a reply are
+	# queued in `pushes` as (type, payload).
+
+	def __init__(self, path, timeout=2.0):
+		self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+		self.sock.settimeout(timeout)
+		self.sock.connect(path)
+		self.request_id = 0
+		self.pushes = []
+
+	def close(self):
+		self.sock.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def recv(self):
+		packet = self.sock.recv(MAX_MESSAGE)
+		if not packet:
+			raise ConnectionError("bridge closed the control socket")
+		return unpack(packet)
+
+	def request(self, msg_type, payload=b""):
+		# (reply type, status, payload)
+		self.request_id = (self.request_id + 1) & 0xFFFF
+		request = self.request_id
+		self.sock.send(pack(msg_type, payload, request=request))
+		while True:
+			reply_type, status, reply_request, reply = self.recv()
+			if reply_type in (MSG_STATE, MSG_HEARTBEAT):
+				self.pushes.append((reply_type, reply))
+				continue
+			if reply_request == request:
+				return reply_type, status, reply
+
+	def ping(self, payload=b""):
+		self.request(MSG_PING, payload)
+
+	def push_config(self, config):
+		# (applied, reply dict)
+		_, status, reply = self.request(MSG_CONFIG, json.dumps(config).encode())
+		return status == STATUS_OK, json.loads(reply)
+
+	def subscribe(self, rate):
+		return RATE.unpack(self.request(MSG_SUBSCRIBE, RATE.pack(rate))[2])[0]
+
+	def stats(self):
+		return json.loads(self.request(MSG_STATS)[2])
+
+	def dump(self):
+		msg_type, status, reply = self.request(MSG_DUMP)
+		if msg_type != MSG_DUMP_REPLY:
+			raise RuntimeError(json.loads(reply).get("error", "dump failed"))
+		return json.loads(reply)
+
+	def next_push(self):
+		if self.pushes:
+			return self.pushes.pop(0)
+		while True:
+			msg_type, _, _, payload = self.recv()
+			if msg_type in (MSG_STATE, MSG_HEARTBEAT):
+				return msg_type, payload
+
+
+def _parse_value(text):
+	key, sep, value = text.partition("=")
+	if not sep:
+		raise argparse.ArgumentTypeError(f"expected KEY=VALUE, got {text!r}")
+	try:
+		return key, float(value)
+	except ValueError:
+		raise argparse.ArgumentTypeError(f"{key}: expected a number, got {value!r}")
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Talk to a running bridge over its --control socket")
+	parser.add_argument("socket", help="control socket path")
+	sub = parser.add_subparsers(dest="command", required=True)
+	ping = sub.add_parser("ping", help="round-trip latency")
+	ping.add_argument("-n", type=int, default=1000)
+	sub.add_parser("stats", help="print bridge counters as JSON")
+	sub.add_parser("dump", help="dump the flight recorder")
+	config = sub.add_parser("config", help="push config values and wait for the ack")
+	config.add_argument("values", nargs="+", type=_parse_value, metavar="KEY=VALUE")
+	watch = sub.add_parser("watch", help="print pushed state and heartbeats")
+	watch.add_argument("--rate", type=float, default=10.0, help="state updates per second")
+	args = parser.parse_args()
+
+	with ControlClient(args.socket) as client:
+		if args.command == "ping":
+			times = []
+			for _ in range(args.n):
+				start = time.perf_counter_ns()
+				client.ping()
+				times.append(time.perf_counter_ns() - start)
+			times.sort()
+			print(
+				f"ping n={len(times)}  p50 {times[len(times) // 2] / 1000:.1f} us  "
+				f"p99 {times[int(len(times) * 0.99)] / 1000:.1f} us  max {times[-1] / 1000:.1f} us"
+			)
+		elif args.command == "stats":
+			print(json.dumps(client.stats(), indent=2))
+		elif args.command == "dump":
+			for path in client.dump():
+				print(path)
+		elif args.command == "config":
+			applied, reply = client.push_config(dict(args.values))
+			if not applied:
+				for err in reply["errors"]:
+					print(f"rejected: {err}", file=sys.stderr)
+				return 1
+			print(f"applied from frame {reply['frame']}")
+		else:
+			print(f"subscribed at {client.subscribe(args.rate):g} Hz", file=sys.stderr)
+			try:
+				while True:
+					msg_type, payload = client.next_push()
+					if msg_type == MSG_HEARTBEAT:
+						t, frames = HEARTBEAT.unpack(payload)
+						print(f"heartbeat t={t:.3f} frames={frames}")
+						continue
+					seq, t, gear, flags, throttle, steer, lx, ly, r1x, r1y, r2x, r2y = STATE.unpack(payload)
+					print(
+						f"frame {seq} t={t:.3f} gear {gear} flags {flags:#x} throttle {throttle:+.2f} "
+						f"steer {steer:+.3f} left ({lx:.2f}, {ly:.2f})"
+					)
+			except KeyboardInterrupt:
+				pass
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
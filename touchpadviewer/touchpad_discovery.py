@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+import array
+import fcntl
+import os
+import select
+import struct
+import sys
+import time
+from collections import namedtuple
+
+from touchpad_inotify import IN_ATTRIB, IN_CREATE, IN_DELETE, inotify_names, inotify_open
+from touchpad_mt_sync import _IOC_READ, _ioc
+
+# Touchpad discovery and hotplug.
+# Candidates are probed from sysfs without opening the device node; where sysfs is missing the
+# node is opened just long enough for one EVIOCGBIT/EVIOCGID/EVIOCGNAME pass and closed again.
+# Only the chosen device is opened as an evdev InputDevice. Its identity (vendor, product, phys,
+# name) is kept so a DeviceWatcher can find the same touchpad again after a replug or resume.
+
+INPUT_DIR = "/dev/input"
+SYSFS_INPUT = "/sys/class/input"
+
+EV_ABS = 0x03
+ABS_MT_SLOT = 0x2F
+ABS_MT_POSITION_X = 0x35
+ABS_MT_POSITION_Y = 0x36
+ABS_CNT = 0x40
+
+_MT_BITS = (1 << ABS_MT_SLOT) | (1 << ABS_MT_POSITION_X) | (1 << ABS_MT_POSITION_Y)
+_LONG_BITS = struct.calcsize("l") * 8
+_INPUT_ID = struct.Struct("4H")
+
+# What we remember about the chosen touchpad between (re)connections.
+DeviceIdentity = namedtuple("DeviceIdentity", "path name phys uniq bustype vendor product version")
+
+
+def EVIOCGID():
+	return _ioc(_IOC_READ, 0x02, _INPUT_ID.size)
+
+
+def EVIOCGNAME(length):
+	return _ioc(_IOC_READ, 0x06, length)
+
+
+def EVIOCGPHYS(length):
+	return _ioc(_IOC_READ, 0x07, length)
+
+
+def EVIOCGUNIQ(length):
+	return _ioc(_IOC_READ, 0x08, length)
+
+
+def EVIOCGBIT(ev, length):
+	return _ioc(_IOC_READ, 0x20 + ev, length)
+
+
+def _read_sysfs(path):
+	try:
+		with open(path, "r", encoding="utf-8", errors="replace") as f:
+			return f.read().strip()
+	except OSError:
+		return None
+
+
+def _sysfs_bitmask(text):
+	# Capability masks are space-separated hex longs, most significant first.
+	value = 0
+	for word in text.split():
+		value = (value << _LONG_BITS) | int(word, 16)
+	return value
+
+
+def probe_sysfs(path):
+	# (abs bitmask, DeviceIdentity) from /sys/class/input/eventN/device, or None.
+	base = os.path.join(SYSFS_INPUT, os.path.basename(path), "device")
+	abs_bits = _read_sysfs(os.path.join(base, "capabilities", "abs"))
+	if abs_bits is None:
+		return None
+	ids = []
+	for field in ("bustype", "vendor", "product", "version"):
+		text = _read_sysfs(os.path.join(base, "id", field))
+		ids.append(int(text, 16) if text else 0)
+	identity = DeviceIdentity(
+		path,
+		_read_sysfs(os.path.join(base, "name")) or "",
+		_read_sysfs(os.path.join(base, "phys")) or "",
+		_read_sysfs(os.path.join(base, "uniq")) or "",
+		*ids,
+	)
+	return _sysfs_bitmask(abs_bits), identity
+
+
+def _ioctl_string(fd, request):
+	buf = bytearray(256)
+	try:
+		n = fcntl.ioctl(fd, request(len(buf)), buf, True)
+	except OSError:
+		return ""
+	return bytes(buf[: max(0, n - 1)]).split(b"\0", 1)[0].decode("utf-8", "replace")
+
+
+def probe_ioctl(path):
+	# Same as probe_sysfs() from the device node itself; the fd is closed before returning.
+	try:
+		fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK | os.O_CLOEXEC)
+	except OSError:
+		return None
+	try:
+		bits = array.array("B", bytes(ABS_CNT // 8))
+		fcntl.ioctl(fd, EVIOCGBIT(EV_ABS, len(bits)), bits, True)
+		ids = bytearray(_INPUT_ID.size)
+		fcntl.ioctl(fd, EVIOCGID(), ids, True)
+		identity = DeviceIdentity(
+			path,
+			_ioctl_string(fd, EVIOCGNAME),
+			_ioctl_string(fd, EVIOCGPHYS),
+			_ioctl_string(fd, EVIOCGUNIQ),
+			*_INPUT_ID.unpack(ids),
+		)
+	except OSError:
+		return None
+	finally:
+		os.close(fd)
+	return int.from_bytes(bits.tobytes(), "little"), identity
+
+
+def probe(path):
+	result = probe_sysfs(path)
+	if result is None:
+		result = probe_ioctl(path)
+	return result
+
+
+def _event_nodes(input_dir=INPUT_DIR):
+	try:
+		names = os.listdir(input_dir)
+	except OSError:
+		return []
+	nodes = [os.path.join(input_dir, n) for n in names if n.startswith("event")]
+	nodes.sort(key=lambda p: int(p.rsplit("event", 1)[1] or 0))
+	return nodes
+
+
+def scan_touchpads(input_dir=INPUT_DIR):
+	# Identities of every readable multitouch (protocol B) device.
+	found = []
+	for path in _event_nodes(input_dir):
+		if not os.access(path, os.R_OK):
+			continue
+		result = probe(path)
+		if result is None:
+			continue
+		abs_bits, identity = result
+		if abs_bits & _MT_BITS == _MT_BITS:
+			found.append(identity)
+	return found
+
+
+def same_device(a, b):
+	# A replugged touchpad keeps vendor/product/name; phys only if it went back in the same port.
+	return a.vendor == b.vendor and a.product == b.product and a.name == b.name
+
+
+def choose_touchpad(candidates, name_hint=None, identity=None):
+	if not candidates:
+		return None
+	if identity is not None:
+		matches = [c for c in candidates if same_device(c, identity)]
+		for c in matches:
+			if c.phys == identity.phys:
+				return c
+		if matches:
+			return matches[0]
+		return None
+
+	if name_hint:
+		hint = name_hint.lower()
+		for c in candidates:
+			if hint in c.name.lower():
+				return c
+
+	# Prefer devices whose names look like touchpads.
+	for c in candidates:
+		n = c.name.lower()
+		if "touchpad" in n or "trackpad" in n:
+			return c
+
+	return candidates[0]
+
+
+def open_device(identity):
+	from evdev import InputDevice
+
+	return InputDevice(identity.path)
+
+
+def find_touchpad(name_hint=None, identity=None):
+	# Returns (InputDevice, DeviceIdentity) or (None, None).
+	chosen = choose_touchpad(scan_touchpads(), name_hint, identity)
+	if chosen is None:
+		return None, None
+	try:
+		return open_device(chosen), chosen
+	except OSError:
+		return None, None
+
+
+def find_touchpad_device(name_hint=None):
+	return find_touchpad(name_hint)[0]
+
+
+def identity_of(dev):
+	# Identity of an already open InputDevice.
+	info = dev.info
+	return DeviceIdentity(
+		dev.path, dev.name, dev.phys or "", dev.uniq or "", info.bustype, info.vendor, info.product, info.version
+	)
+
+
+class DeviceWatcher:
+	# Watches /dev/input for the touchpad with `identity` to come back. The inotify fd is
+	# exposed for event loops; wait() blocks for the synchronous bridges.
+
+	def __init__(self, identity, input_dir=INPUT_DIR, rescan_interval=1.0):
+		self.identity = identity
+		self.input_dir = input_dir
+		self.rescan_interval = rescan_interval
+		# IN_ATTRIB: udev fixes up node permissions after the node is created.
+		self.fd = inotify_open(input_dir, IN_CREATE | IN_ATTRIB | IN_DELETE)
+		self.rebinds = 0
+		self._next_scan = 0.0
+
+	def close(self):
+		if self.fd is not None:
+			os.close(self.fd)
+			self.fd = None
+
+	def check(self):
+		# Non-blocking: the reopened InputDevice if the touchpad is back, else None. Rescans on
+		# an inotify event for an event node, and every rescan_interval as a safety net.
+		now = time.monotonic()
+		changed = self.fd is not None and any(n.startswith(b"event") for n in inotify_names(self.fd))
+		if not changed and now < self._next_scan:
+			return None
+		self._next_scan = now + self.rescan_interval
+		chosen = choose_touchpad(scan_touchpads(self.input_dir), identity=self.identity)
+		if chosen is None:
+			return None
+		try:
+			dev = open_device(chosen)
+		except OSError:
+			return None
+		self.identity = chosen
+		self.rebinds += 1
+		return dev
+
+	def wait(self, timeout=None):
+		# Blocks until the device is back (returns it) or `timeout` passes (returns None).
+		deadline = None if timeout is None else time.monotonic() + timeout
+		while True:
+			dev = self.check()
+			if dev is not None:
+				return dev
+			wait = self.rescan_interval
+			if deadline is not None:
+				wait = min(wait, deadline - time.monotonic())
+				if wait <= 0:
+					return None
+			if self.fd is not None:
+				select.select([self.fd], [], [], wait)
+			else:
+				time.sleep(wait)
+
+
+def main():
+	candidates = scan_touchpads()
+	for identity in candidates:
+		print(
+			f"{identity.path}: {identity.name!r} phys={identity.phys!r} "
+			f"vendor={identity.vendor:04x} product={identity.product:04x} bus={identity.bustype:#x}"
+		)
+	chosen = choose_touchpad(candidates)
+	if chosen is None:
+		print("No multitouch touchpad device found.", file=sys.stderr)
+		return 1
+	print(f"auto: {chosen.path}")
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
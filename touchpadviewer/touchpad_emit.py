@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+import os
+import struct
+from array import array
+
+# Batched output stage for virtual devices.
+# Each frame is diffed against the last one emitted; only changed values are packed as
+# struct input_event records into a preallocated buffer and written to the uinput fd together
+# with the SYN_REPORT in a single write(). Unchanged frames produce no write at all.
+
+EV_SYN = 0x00
+SYN_REPORT = 0
+
+# struct input_event { struct timeval time; __u16 type; __u16 code; __s32 value; }
+# The kernel stamps uinput events itself, so the time fields are left zero.
+INPUT_EVENT = struct.Struct("@llHHi")
+
+
+class FrameEmitter:
+	# Nothing is allocated per frame: the bound methods, event offsets and the memoryview for
+	# every possible write length are made up front, and the diff walks the values by index.
+
+	__slots__ = (
+		"codes",
+		"count",
+		"last",
+		"full",
+		"buf",
+		"offsets",
+		"views",
+		"pack_into",
+		"fd",
+		"sink",
+		"sink_write",
+		"sink_syn",
+		"frames",
+		"writes",
+		"events",
+	)
+
+	def __init__(self, ui, codes):
+		# ui is a UInput (anything with a writable .fd) or a sink with write()/syn().
+		self.codes = tuple(codes)
+		self.count = len(self.codes)
+		self.last = array("i", bytes(4 * self.count))
+		self.full = True
+		size = INPUT_EVENT.size
+		self.buf = bytearray(size * (self.count + 1))
+		self.offsets = tuple(n * size for n in range(self.count + 1))
+		view = memoryview(self.buf)
+		self.views = tuple(view[: n * size] for n in range(self.count + 2))
+		self.pack_into = INPUT_EVENT.pack_into
+		fd = getattr(ui, "fd", None)
+		self.fd = fd if isinstance(fd, int) and fd >= 0 else None
+		self.sink = ui
+		self.sink_write = getattr(ui, "write", None)
+		self.sink_syn = getattr(ui, "syn", None)
+		self.frames = 0
+		self.writes = 0
+		self.events = 0
+
+	def force_full(self):
+		# Send every value on the next frame (startup, resync, device rebind).
+		self.full = True
+
+	def emit(self, values):
+		# Returns the number of value events written (0 when nothing changed).
+		codes = self.codes
+		last = self.last
+		full = self.full
+		self.full = False
+		self.frames += 1
+		count = self.count
+
+		if self.fd is None:
+			write = self.sink_write
+			n = 0
+			i = 0
+			while i < count:
+				value = values[i]
+				if full or value != last[i]:
+					last[i] = value
+					etype, code = codes[i]
+					write(etype, code, value)
+					n += 1
+				i += 1
+			if n:
+				self.sink_syn()
+				self.writes += 1
+				self.events += n
+			return n
+
+		buf = self.buf
+		pack_into = self.pack_into
+		offsets = self.offsets
+		n = 0
+		i = 0
+		while i < count:
+			value = values[i]
+			if full or value != last[i]:
+				last[i] = value
+				etype, code = codes[i]
+				pack_into(buf, offsets[n], 0, 0, etype, code, value)
+				n += 1
+			i += 1
+		if not n:
+			return 0
+		pack_into(buf, offsets[n], 0, 0, EV_SYN, SYN_REPORT, 0)
+		try:
+			os.write(self.fd, self.views[n + 1])
+		except OSError:
+			# The device never saw this frame; resend everything next time.
+			self.full = True
+			raise
+		self.writes += 1
+		self.events += n
+		return n
+
+	def stats(self):
+		return {"frames": self.frames, "writes": self.writes, "events": self.events}
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+import math
+
+# Per-channel input filters for the joy bridge engine, applied between slot decode and output
+# mapping. Every filter keeps its state in __slots__ and is retuned in place when the config
+# changes, so a frame allocates nothing. Times are the engine's "now" in seconds; a sample that
+# does not advance time returns the previous output.
+#
+#   OneEuroFilter     speed-adaptive low-pass (Casiez et al., CHI 2012): heavy smoothing while the
+#                     finger is slow, little lag once it moves
+#   LinearPredictor   extrapolates the last velocity `horizon` seconds ahead
+#   KalmanPredictor   constant-velocity Kalman filter, extrapolated `horizon` seconds ahead
+#   Hysteresis        two-state switch for thresholded buttons
+
+PREDICT_LINEAR = 1
+PREDICT_KALMAN = 2
+
+# Initial velocity variance of the Kalman predictor (pad units / s)^2: the first moves dominate.
+KALMAN_VELOCITY_VAR = 1e6
+
+
+def _alpha(cutoff, dt):
+	# Smoothing factor of a first-order low-pass at `cutoff` Hz for a `dt` second step.
+	tau = 1.0 / (2.0 * math.pi * cutoff)
+	return 1.0 / (1.0 + tau / dt)
+
+
+class OneEuroFilter:
+	__slots__ = ("min_cutoff", "beta", "d_cutoff", "value", "velocity", "last_time")
+
+	def __init__(self, min_cutoff=1.0, beta=0.0, d_cutoff=1.0):
+		self.min_cutoff = min_cutoff
+		self.beta = beta
+		self.d_cutoff = d_cutoff
+		self.reset()
+
+	def reset(self):
+		self.value = 0.0
+		self.velocity = 0.0
+		self.last_time = None
+
+	def filter(self, x, now):
+		last_time = self.last_time
+		if last_time is None:
+			self.value = x
+			self.velocity = 0.0
+			self.last_time = now
+			return x
+		dt = now - last_time
+		if dt <= 0.0:
+			return self.value
+		value = self.value
+		a_d = _alpha(self.d_cutoff, dt)
+		velocity = a_d * (x - value) / dt + (1.0 - a_d) * self.velocity
+		speed = velocity if velocity >= 0.0 else -velocity
+		a = _alpha(self.min_cutoff + self.beta * speed, dt)
+		value = a * x + (1.0 - a) * value
+		self.value = value
+		self.velocity = velocity
+		self.last_time = now
+		return value
+
+
+class LinearPredictor:
+	__slots__ = ("horizon", "last", "velocity", "last_time")
+
+	def __init__(self, horizon=0.0):
+		self.horizon = horizon
+		self.reset()
+
+	def reset(self):
+		self.last = 0.0
+		self.velocity = 0.0
+		self.last_time = None
+
+	def predict(self, x, now):
+		last_time = self.last_time
+		if last_time is not None:
+			dt = now - last_time
+			if dt <= 0.0:
+				return x + self.velocity * self.horizon
+			self.velocity = (x - self.last) / dt
+		self.last = x
+		self.last_time = now
+		return x + self.velocity * self.horizon
+
+
+class KalmanPredictor:
+	# State (position, velocity); q is the white-noise acceleration density, r the measurement
+	# variance, both in pad units. The 2x2 covariance is kept as its three distinct terms.
+
+	__slots__ = ("horizon", "q", "r", "x", "v", "p00", "p01", "p11", "last_time")
+
+	def __init__(self, horizon=0.0, q=1e6, r=4.0):
+		self.horizon = horizon
+		self.q = q
+		self.r = r
+		self.reset()
+
+	def reset(self):
+		self.x = 0.0
+		self.v = 0.0
+		self.p00 = 0.0
+		self.p01 = 0.0
+		self.p11 = 0.0
+		self.last_time = None
+
+	def predict(self, z, now):
+		last_time = self.last_time
+		if last_time is None:
+			self.x = z
+			self.v = 0.0
+			self.p00 = self.r
+			self.p01 = 0.0
+			self.p11 = KALMAN_VELOCITY_VAR
+			self.last_time = now
+			return z
+		dt = now - last_time
+		if dt <= 0.0:
+			return self.x + self.v * self.horizon
+		self.last_time = now
+		# Predict.
+		q = self.q
+		p11 = self.p11
+		p01 = self.p01 + dt * p11 + q * dt * dt * 0.5
+		p00 = self.p00 + dt * (2.0 * self.p01 + dt * p11) + q * dt * dt * dt / 3.0
+		p11 += q * dt
+		x = self.x + self.v * dt
+		# Update with the measurement.
+		s = p00 + self.r
+		k0 = p00 / s
+		k1 = p01 / s
+		residual = z - x
+		x += k0 * residual
+		self.v += k1 * residual
+		self.x = x
+		self.p00 = (1.0 - k0) * p00
+		self.p11 = p11 - k1 * p01
+		self.p01 = (1.0 - k0) * p01
+		return x + self.v * self.horizon
+
+
+class Channel:
+	# One scalar input: optional One-Euro smoothing, then optional prediction. Stages are created
+	# when they are switched on and dropped when switched off; retuning keeps their state.
+
+	__slots__ = ("smooth", "predictor", "active")
+
+	def __init__(self):
+		self.smooth = None
+		self.predictor = None
+		self.active = False
+
+	def configure(self, min_cutoff, beta, d_cutoff, horizon=0.0, mode=PREDICT_LINEAR, q=1e6, r=4.0):
+		if min_cutoff > 0.0:
+			if self.smooth is None:
+				self.smooth = OneEuroFilter()
+			self.smooth.min_cutoff = min_cutoff
+			self.smooth.beta = beta
+			self.smooth.d_cutoff = d_cutoff
+		else:
+			self.smooth = None
+		if horizon > 0.0:
+			kind = KalmanPredictor if mode == PREDICT_KALMAN else LinearPredictor
+			if type(self.predictor) is not kind:
+				self.predictor = kind()
+			self.predictor.horizon = horizon
+			if kind is KalmanPredictor:
+				self.predictor.q = q
+				self.predictor.r = r
+		else:
+			self.predictor = None
+		self.active = self.smooth is not None or self.predictor is not None
+
+	def reset(self):
+		if self.smooth is not None:
+			self.smooth.reset()
+		if self.predictor is not None:
+			self.predictor.reset()
+
+	def update(self, x, now):
+		if self.smooth is not None:
+			x = self.smooth.filter(x, now)
+		if self.predictor is not None:
+			x = self.predictor.predict(x, now)
+		return x
+
+
+class Hysteresis:
+	# On above `threshold`; once on, stays on until the value drops to `threshold - margin`.
+	# With no margin this is exactly `value > threshold`.
+
+	__slots__ = ("threshold", "margin", "state")
+
+	def __init__(self, threshold=0.0, margin=0.0):
+		self.threshold = threshold
+		self.margin = margin
+		self.state = False
+
+	def update(self, value):
+		if self.state:
+			self.state = value > self.threshold - self.margin
+		else:
+			self.state = value > self.threshold
+		return self.state
+
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+import os
+import struct
+import sys
+import time
+from array import array
+
+from touchpad_reader import SYN_DROPPED
+from touchpad_trace import EV_SYN, RECORD, RECORD_SIZE, SYN_REPORT, device_metadata, encode_header
+
+# Always-on flight recorder for postmortems ("stuck in 3rd", "steering wandered").
+# The last stretch of raw input records and computed output frames is kept in two preallocated
+# bytearray rings, packed in place with struct.pack_into, so recording allocates nothing. A dump
+# writes the input ring as a regular trace (replayable with --replay) and the outputs as a second
+# trace of the virtual joystick's changed values, each via a temp file and rename.
+
+# Share of the memory budget for input records, the rest holds output frames: at ~10 records
+# (160 bytes) per input frame against one 76-byte output frame both rings cover about as long.
+INPUT_SHARE = 0.67
+
+
+class FlightRecorder:
+	__slots__ = (
+		"meta",
+		"codes",
+		"window",
+		"directory",
+		"buf",
+		"size",
+		"pos",
+		"total",
+		"out",
+		"out_struct",
+		"out_stamp",
+		"out_mv",
+		"out_values",
+		"out_values_mv",
+		"out_size",
+		"out_pos",
+		"out_total",
+		"last_sec",
+		"last_usec",
+		"pending",
+		"dumps",
+	)
+
+	def __init__(self, meta, codes, max_bytes, window=30.0, directory=None):
+		# meta: device_metadata() of the input device; codes: output (type, code) order.
+		self.meta = meta
+		self.codes = tuple(codes)
+		self.window = window
+		self.directory = directory or "/tmp"
+		records = max(64, int(max_bytes * INPUT_SHARE) // RECORD_SIZE)
+		self.size = records * RECORD_SIZE
+		self.buf = bytearray(self.size)
+		self.pos = 0
+		self.total = 0
+		self.out_struct = struct.Struct(f"<II{len(self.codes)}i")
+		frames = max(16, int(max_bytes * (1.0 - INPUT_SHARE)) // self.out_struct.size)
+		self.out_size = frames * self.out_struct.size
+		self.out = bytearray(self.out_size)
+		# Frames are the timestamp packed in place plus the output array's bytes copied straight
+		# into the ring (array('i') is native order, matching "<i" on a little-endian host).
+		self.out_stamp = struct.Struct("<II")
+		self.out_mv = memoryview(self.out)
+		self.out_values = None
+		self.out_values_mv = None
+		self.out_pos = 0
+		self.out_total = 0
+		self.last_sec = 0
+		self.last_usec = 0
+		self.pending = None
+		self.dumps = 0
+
+	def record_input(self, records):
+		# One SYN-delimited frame of (sec, usec, type, code, value) records.
+		buf = self.buf
+		pack_into = RECORD.pack_into
+		pos = self.pos
+		n = len(records)
+		if pos + n * RECORD_SIZE <= self.size:
+			for rec in records:
+				pack_into(buf, pos, *rec)
+				pos += RECORD_SIZE
+			if pos == self.size:
+				pos = 0
+		else:
+			size = self.size
+			for rec in records:
+				pack_into(buf, pos, *rec)
+				pos += RECORD_SIZE
+				if pos == size:
+					pos = 0
+		self.pos = pos
+		self.total += n
+		last = records[-1]
+		self.last_sec = last[0]
+		self.last_usec = last[1]
+
+	def record_dropped(self):
+		# Same marker RecordingDevice writes, so a replayed dump resyncs at the same point.
+		sec = self.last_sec
+		usec = self.last_usec
+		self.record_input(((sec, usec, EV_SYN, SYN_DROPPED, 0), (sec, usec, EV_SYN, SYN_REPORT, 0)))
+
+	def record_output(self, values):
+		# The output frame computed from the last input frame, stamped with its time.
+		pos = self.out_pos
+		if values is not self.out_values:
+			self._bind_values(values)
+		values_mv = self.out_values_mv
+		if values_mv is None:
+			self.out_struct.pack_into(self.out, pos, self.last_sec, self.last_usec, *values)
+		else:
+			self.out_stamp.pack_into(self.out, pos, self.last_sec, self.last_usec)
+			start = pos + 8
+			self.out_mv[start : start + len(values_mv)] = values_mv
+		pos += self.out_struct.size
+		self.out_pos = pos if pos < self.out_size else 0
+		self.out_total += 1
+
+	def _bind_values(self, values):
+		# The engine hands over the same array every frame, so its byte view is built once.
+		# Anything else (a list, a big-endian host) takes the pack_into path.
+		self.out_values = values
+		self.out_values_mv = None
+		if isinstance(values, array) and values.typecode == "i" and values.itemsize == 4 and sys.byteorder == "little":
+			if len(values) == len(self.codes):
+				self.out_values_mv = memoryview(values).cast("B")
+
+	def request_dump(self, reason):
+		# Safe from a signal handler; the loop calls poll() between frames.
+		self.pending = reason
+
+	def poll(self):
+		reason = self.pending
+		if reason is not None:
+			self.pending = None
+			self.dump(reason)
+
+	def _ring(self, buf, pos, total, item):
+		# Ring contents oldest first.
+		if total * item < len(buf):
+			return bytes(buf[:pos])
+		return bytes(buf[pos:]) + bytes(buf[:pos])
+
+	def _input_records(self):
+		data = self._ring(self.buf, self.pos, self.total, RECORD_SIZE)
+		records = list(RECORD.iter_unpack(data))
+		# Start on a frame boundary, no earlier than `window` seconds before the last frame.
+		start = 0
+		syns = [i for i, r in enumerate(records) if r[2] == EV_SYN and r[3] == SYN_REPORT]
+		if not syns:
+			return [], 0.0
+		if len(records) < self.total:
+			start = syns[0] + 1
+		last = records[syns[-1]]
+		cutoff = last[0] + last[1] * 1e-6 - self.window if self.window else None
+		if cutoff is not None:
+			for i in syns:
+				r = records[i]
+				if r[0] + r[1] * 1e-6 >= cutoff:
+					break
+				start = i + 1
+		records = records[start : syns[-1] + 1]
+		t0 = records[0][0] + records[0][1] * 1e-6 if records else 0.0
+		return records, t0
+
+	def _output_records(self, t0):
+		data = self._ring(self.out, self.out_pos, self.out_total, self.out_struct.size)
+		codes = self.codes
+		last = None
+		out = []
+		for frame in self.out_struct.iter_unpack(data):
+			sec, usec = frame[0], frame[1]
+			if sec + usec * 1e-6 < t0:
+				continue
+			values = frame[2:]
+			for i, value in enumerate(values):
+				if last is None or value != last[i]:
+					out.append((sec, usec, codes[i][0], codes[i][1], value))
+			out.append((sec, usec, EV_SYN, SYN_REPORT, 0))
+			last = values
+		return out
+
+	def dump(self, reason="manual"):
+		# Returns (input path, output path), or None when nothing could be written.
+		start = time.monotonic()
+		records, t0 = self._input_records()
+		outputs = self._output_records(t0)
+		self.dumps += 1
+		stamp = time.strftime("%Y%m%d-%H%M%S")
+		base = os.path.join(self.directory, f"touchpad-flight-{stamp}-{os.getpid()}-{self.dumps}-{reason}")
+		info = {
+			"reason": reason,
+			"dumped_at": time.time(),
+			"events": len(records),
+			"events_seen": self.total,
+			"frames_seen": self.out_total,
+			"window_s": self.window,
+		}
+		meta = dict(self.meta)
+		meta["flight_recorder"] = info
+		out_meta = {
+			"name": "touchpad-virtual-joystick (flight recorder output)",
+			"path": "",
+			"capabilities": {},
+			"flight_recorder": info,
+		}
+		for etype, code in self.codes:
+			out_meta["capabilities"].setdefault(str(etype), []).append(code)
+		paths = (base + ".trace", base + "-output.trace")
+		try:
+			for path, m, recs in ((paths[0], meta, records), (paths[1], out_meta, outputs)):
+				_write_atomic(path, m, recs)
+		except OSError as exc:
+			print(f"\nflight recorder: dump failed ({exc})", file=sys.stderr)
+			return None
+		print(
+			f"\nflight recorder: {reason}: {len(records)} events, {len(outputs)} output records -> "
+			f"{paths[0]} ({(time.monotonic() - start) * 1000:.0f} ms)",
+			file=sys.stderr,
+		)
+		return paths
+
+
+def _write_atomic(path, meta, records):
+	tmp = f"{path}.{os.getpid()}.tmp"
+	data = bytearray(encode_header(meta))
+	offset = len(data)
+	data.extend(bytes(len(records) * RECORD_SIZE))
+	pack_into = RECORD.pack_into
+	for rec in records:
+		pack_into(data, offset, *rec)
+		offset += RECORD_SIZE
+	try:
+		with open(tmp, "wb") as f:
+			f.write(data)
+			f.flush()
+			os.fsync(f.fileno())
+		os.replace(tmp, path)
+	except OSError:
+		try:
+			os.unlink(tmp)
+		except OSError:
+			pass
+		raise
+
+
+def add_arguments(parser):
+	parser.add_argument(
+		"--flight-recorder",
+		type=float,
+		default=4.0,
+		metavar="MB",
+		help="memory per touchpad for the always-on flight recorder (0 disables; default: %(default)s)",
+	)
+	parser.add_argument(
+		"--flight-window",
+		type=float,
+		default=30.0,
+		metavar="SECONDS",
+		help="seconds of history a flight recorder dump covers at most (default: %(default)s)",
+	)
+	parser.add_argument(
+		"--flight-dir",
+		default="/tmp",
+		help="directory for flight recorder dumps (SIGUSR1 or an unhandled exception; default: %(default)s)",
+	)
+
+
+def from_args(args, dev, codes):
+	# FlightRecorder for the parsed --flight-* arguments, or None when disabled.
+	if args.flight_recorder <= 0:
+		return None
+	return FlightRecorder(
+		device_metadata(dev), codes, int(args.flight_recorder * 1024 * 1024), args.flight_window, args.flight_dir
+	)
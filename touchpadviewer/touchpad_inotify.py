@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+import ctypes
+import os
+import struct
+
+# Minimal inotify binding (ctypes, no extra dependency) for watching a directory with a
+# non-blocking fd that can go into select/epoll or an asyncio reader.
+
+# linux/inotify.h
+IN_MODIFY = 0x002
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+
+def _libc():
+	try:
+		libc = ctypes.CDLL(None, use_errno=True)
+		libc.inotify_init1
+		libc.inotify_add_watch
+	except (OSError, AttributeError):
+		return None
+	return libc
+
+
+def inotify_open(directory, mask):
+	# Returns a non-blocking inotify fd watching `directory`, or None if inotify is unavailable.
+	libc = _libc()
+	if libc is None:
+		return None
+	fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+	if fd < 0:
+		return None
+	if not inotify_watch(fd, directory, mask):
+		os.close(fd)
+		return None
+	return fd
+
+
+def inotify_watch(fd, directory, mask):
+	# Adds `directory` to an inotify fd; events from every watched directory arrive on it.
+	libc = _libc()
+	return libc is not None and libc.inotify_add_watch(fd, os.fsencode(directory), mask) >= 0
+
+
+def inotify_names(fd):
+	# Drains pending events; returns the set of file names they refer to.
+	names = set()
+	while True:
+		try:
+			data = os.read(fd, 4096)
+		except BlockingIOError:
+			return names
+		offset = 0
+		while offset + _INOTIFY_EVENT.size <= len(data):
+			_, _, _, length = _INOTIFY_EVENT.unpack_from(data, offset)
+			offset += _INOTIFY_EVENT.size
+			names.add(data[offset : offset + length].rstrip(b"\0"))
+			offset += length
@@ -1,51 +1,22 @@
 #!/usr/bin/env python3
 import argparse
 import json
-import math
 import os
-import platform
-import stat
+import signal
 import sys
 import time
-import subprocess
-from evdev import AbsInfo, InputDevice, UInput, ecodes, list_devices
+from evdev import AbsInfo, InputDevice, UInput, ecodes
 
-# Touchpad MT -> virtual joystick bridge (single-finger steering on X axis).
-
-
-def is_mt_device(dev):
-	caps = dev.capabilities().get(ecodes.EV_ABS, [])
-	abs_codes = {c if isinstance(c, int) else c[0] for c in caps}
-	return (
-		ecodes.ABS_MT_SLOT in abs_codes
-		and ecodes.ABS_MT_POSITION_X in abs_codes
-		and ecodes.ABS_MT_POSITION_Y in abs_codes
-	)
-
-
-def find_touchpad_device(name_hint=None):
-	candidates = []
-	for path in list_devices():
-		dev = InputDevice(path)
-		if not is_mt_device(dev):
-			continue
-		candidates.append(dev)
-
-	if not candidates:
-		return None
+from touchpad_config import ConfigReloader, load_config
+from touchpad_discovery import DeviceWatcher, find_touchpad_device, identity_of
+from touchpad_emit import FrameEmitter
+from touchpad_flight import add_arguments as add_flight_arguments, from_args as flight_recorder_from_args
+from touchpad_joy_engine import OUTPUT_CODES, JoyBridgeEngine
+from touchpad_mt_sync import SyncStats, resync
+from touchpad_reader import DROPPED, FrameClock, open_frames, use_monotonic_clock
+from touchpad_realtime import add_arguments as add_realtime_arguments
 
-	if name_hint:
-		hint = name_hint.lower()
-		for dev in candidates:
-			if hint in dev.name.lower():
-				return dev
-
-	for dev in candidates:
-		n = dev.name.lower()
-		if "touchpad" in n or "trackpad" in n:
-			return dev
-
-	return candidates[0]
+# Touchpad MT -> virtual joystick bridge (single-finger steering on X axis).
 
 
 def scale_to_axis(value, in_min, in_max, out_min=-32768, out_max=32767):
@@ -55,31 +26,107 @@ def scale_to_axis(value, in_min, in_max, out_min=-32768, out_max=32767):
 	return int((v - in_min) * (out_max - out_min) / (in_max - in_min) + out_min)
 
 
-def main():
-	print(
-		"touchpad_joy_bridge: starting (debug banner)\n"
-		"  platform: {}\n"
-		"  note: Linux evdev/uinput backend only; Windows support is pending.\n".format(
-			platform.system()
-		),
-		file=sys.stderr,
+def virtual_joystick_capabilities():
+	# Virtual joystick with X/Y axes, four gear buttons plus reverse (BTN_TL), and touch flags.
+	return {
+		ecodes.EV_ABS: [
+			(ecodes.ABS_X, AbsInfo(0, -32768, 32767, 0, 0, 0)),
+			(ecodes.ABS_Y, AbsInfo(0, -32768, 32767, 0, 0, 0)),
+			(ecodes.ABS_RX, AbsInfo(0, -32768, 32767, 0, 0, 0)),
+			(ecodes.ABS_RY, AbsInfo(0, -32768, 32767, 0, 0, 0)),
+			(ecodes.ABS_Z, AbsInfo(0, -32768, 32767, 0, 0, 0)),
+			(ecodes.ABS_RZ, AbsInfo(0, -32768, 32767, 0, 0, 0)),
+			(ecodes.ABS_HAT0X, AbsInfo(0, -32768, 32767, 0, 0, 0)),
+			(ecodes.ABS_HAT0Y, AbsInfo(0, -32768, 32767, 0, 0, 0)),
+		],
+		ecodes.EV_KEY: [
+			ecodes.BTN_JOYSTICK,
+			ecodes.BTN_SOUTH,
+			ecodes.BTN_EAST,
+			ecodes.BTN_WEST,
+			ecodes.BTN_NORTH,
+			ecodes.BTN_SELECT,
+			ecodes.BTN_START,
+			ecodes.BTN_THUMBL,
+			ecodes.BTN_TR,
+			ecodes.BTN_TL,
+		],
+	}
+
+
+def open_virtual_joystick():
+	return UInput(
+		virtual_joystick_capabilities(),
+		name="touchpad-virtual-joystick",
+		bustype=ecodes.BUS_USB,
+		vendor=0x1234,
+		product=0x5678,
+		version=1,
 	)
 
+
+def main():
 	parser = argparse.ArgumentParser(description="Touchpad MT -> virtual joystick (steering)")
 	parser.add_argument("device", nargs="?", help="/dev/input/eventX for the touchpad")
 	parser.add_argument("--auto", action="store_true", help="auto-detect a touchpad device")
 	parser.add_argument("--name", help="name substring to match for auto-detect")
 	parser.add_argument("--config", help="path to JSON config file")
 	parser.add_argument("--state", help="path to write JSON state for HUD")
+	parser.add_argument(
+		"--state-shm",
+		nargs="?",
+		const="/dev/shm/touchpad_joy_state",
+		help="publish HUD state as a seqlocked binary record in this mmap'd file (default: %(const)s)",
+	)
+	parser.add_argument("--record", metavar="FILE", help="record the raw event stream to a trace file")
+	parser.add_argument("--replay", metavar="FILE", help="read events from a recorded trace instead of a device")
+	parser.add_argument(
+		"--speed",
+		type=float,
+		default=1.0,
+		help="replay speed multiplier; 0 replays as fast as possible (default: 1.0)",
+	)
+	parser.add_argument(
+		"--sink",
+		choices=("uinput", "null", "memory"),
+		default="uinput",
+		help="output sink; null/memory stand in for the virtual joystick",
+	)
+	parser.add_argument(
+		"--stats",
+		metavar="SPEC",
+		help="latency stats as JSON: unix:PATH serves a snapshot per connection, a file path is rewritten periodically",
+	)
+	parser.add_argument("--stats-interval", type=float, default=1.0, help="stats file dump interval in seconds")
+	parser.add_argument(
+		"--clock",
+		choices=("event", "monotonic"),
+		default="event",
+		help="engine time: kernel event timestamps (deterministic) or time.monotonic() at processing",
+	)
+	parser.add_argument("--debug", action="store_true", help="print a startup banner with platform details")
+	add_flight_arguments(parser)
+	add_realtime_arguments(parser)
 	args = parser.parse_args()
 
+	if args.debug:
+		import platform
+
+		print(
+			"touchpad_joy_bridge: starting (debug banner)\n"
+			"  platform: {}\n"
+			"  note: Linux evdev/uinput backend only; Windows support is pending.\n".format(platform.system()),
+			file=sys.stderr,
+		)
+
 	def _check_permissions(dev_path):
 		problems = []
-		if os.path.exists("/dev/uinput"):
-			if not os.access("/dev/uinput", os.W_OK):
-				problems.append("no write access to /dev/uinput")
-		else:
-			problems.append("/dev/uinput missing (load with: sudo modprobe uinput)")
+		if args.sink == "uinput":
+			if os.path.exists("/dev/uinput"):
+				if not os.access("/dev/uinput", os.W_OK):
+					problems.append("no write access to /dev/uinput")
+			else:
+				problems.append("/dev/uinput missing (load with: sudo modprobe uinput)")
 
 		if dev_path and os.path.exists(dev_path):
 			if not os.access(dev_path, os.R_OK):
@@ -87,6 +134,9 @@ def main():
 		return problems
 
 	def _attempt_fix_permissions(dev_path):
+		# Interactive error path only; keep subprocess out of normal startup.
+		import subprocess
+
 		commands = []
 		if not os.path.exists("/dev/uinput"):
 			commands.append(["sudo", "modprobe", "uinput"])
@@ -120,7 +170,11 @@ def main():
 		print("     sudo udevadm control --reload-rules && sudo udevadm trigger", file=sys.stderr)
 
 	dev = None
-	if args.device:
+	if args.replay:
+		from touchpad_trace import ReplayDevice
+
+		dev = ReplayDevice(args.replay, args.speed)
+	elif args.device:
 		dev = InputDevice(args.device)
 	else:
 		if not args.auto and not args.name:
@@ -131,18 +185,19 @@ def main():
 			return 1
 		print(f"Using device: {dev.path} ({dev.name})")
 
-	problems = _check_permissions(dev.path if dev else None)
+	dev_path = dev.path if dev and not args.replay else None
+	problems = _check_permissions(dev_path)
 	if problems:
-		_print_permission_help(dev.path if dev else None, problems)
+		_print_permission_help(dev_path, problems)
 		if sys.stdin.isatty() and sys.stdout.isatty():
 			answer = input("Attempt a temporary fix with sudo now? [y/N] ").strip().lower()
 			if answer in ("y", "yes"):
-				if _attempt_fix_permissions(dev.path if dev else None):
-					problems = _check_permissions(dev.path if dev else None)
+				if _attempt_fix_permissions(dev_path):
+					problems = _check_permissions(dev_path)
 					if not problems:
 						print("Permissions fixed for this session.", file=sys.stderr)
 					else:
-						_print_permission_help(dev.path if dev else None, problems)
+						_print_permission_help(dev_path, problems)
 						return 2
 				else:
 					print("Failed to apply permissions via sudo.", file=sys.stderr)
@@ -152,6 +207,11 @@ def main():
 		else:
 			return 2
 
+	if args.record:
+		from touchpad_trace import RecordingDevice
+
+		dev = RecordingDevice(dev, args.record)
+
 	# Grab the device so the desktop cursor does not move.
 	try:
 		dev.grab()
@@ -161,320 +221,222 @@ def main():
 	abs_x = dev.absinfo(ecodes.ABS_MT_POSITION_X)
 	abs_y = dev.absinfo(ecodes.ABS_MT_POSITION_Y)
 
-	# Virtual joystick with X/Y axes, four gear buttons, and touch flags.
-	capabilities = {
-		ecodes.EV_ABS: [
-			(ecodes.ABS_X, AbsInfo(0, -32768, 32767, 0, 0, 0)),
-			(ecodes.ABS_Y, AbsInfo(0, -32768, 32767, 0, 0, 0)),
-			(ecodes.ABS_RX, AbsInfo(0, -32768, 32767, 0, 0, 0)),
-			(ecodes.ABS_RY, AbsInfo(0, -32768, 32767, 0, 0, 0)),
-			(ecodes.ABS_Z, AbsInfo(0, -32768, 32767, 0, 0, 0)),
-			(ecodes.ABS_RZ, AbsInfo(0, -32768, 32767, 0, 0, 0)),
-			(ecodes.ABS_HAT0X, AbsInfo(0, -32768, 32767, 0, 0, 0)),
-			(ecodes.ABS_HAT0Y, AbsInfo(0, -32768, 32767, 0, 0, 0)),
-		],
-		ecodes.EV_KEY: [
-			ecodes.BTN_JOYSTICK,
-			ecodes.BTN_SOUTH,
-			ecodes.BTN_EAST,
-			ecodes.BTN_WEST,
-			ecodes.BTN_NORTH,
-			ecodes.BTN_SELECT,
-			ecodes.BTN_START,
-			ecodes.BTN_THUMBL,
-			ecodes.BTN_TR,
-		],
-	}
+	def _make_uinput():
+		return open_virtual_joystick()
 
-	ui = UInput(
-		capabilities,
-		name="touchpad-virtual-joystick",
-		bustype=ecodes.BUS_USB,
-		vendor=0x1234,
-		product=0x5678,
-		version=1,
-	)
+	if args.sink == "uinput":
+		ui = _make_uinput()
+	else:
+		from touchpad_trace import open_sink
 
-	def load_config(path):
-		defaults = {
-			"steer_delta_scale": 0.1,
-			"steer_deadzone": 10.0,
-			"shift_margin": 0.12,
-			"shift_gap": 0.18,
-			"neutral_min": 0.45,
-			"neutral_max": 0.55,
-			"gear_hold_time": 0.12,
-			"neutral_reset_hold": 0.15,
-			"throttle_neutral_band": 0.2,
-			"throttle_sensitivity": 1.0,
-		}
-		if not path:
-			return defaults
-		try:
-			with open(path, "r", encoding="ascii") as f:
-				data = json.load(f)
-			defaults.update({k: data.get(k, v) for k, v in defaults.items()})
-		except OSError:
-			pass
-		except json.JSONDecodeError:
-			pass
-		return defaults
+		ui = open_sink(args.sink, _make_uinput)
 
 	config_path = args.config
 	config = load_config(config_path)
-	last_config_check = 0.0
+	# Parsed and validated on a watcher thread; swapped in between frames.
+	reloader = ConfigReloader(config_path, config).start() if config_path else None
 	state_path = args.state
 	last_state_write = 0.0
+	shm_state = None
+	if args.state_shm:
+		from touchpad_state_shm import ShmStateWriter
 
-	current_slot = 0
-	slots = {}
-	center_x = (abs_x.min + abs_x.max) / 2.0
-	center_y = (abs_y.min + abs_y.max) / 2.0
-	steer_center_x = (abs_x.min + center_x) / 2.0
-	right_min_x = center_x
-	right_max_x = abs_x.max
-	last_angle = None
-	last_gear = 0
-	neutral_latched = True
-	pending_gear = 0
-	pending_since = 0.0
-	gear_hold_time = 0.12
-	brake_pressed = False
-	lock_active = False
-	locked_gear = 0
-	last_throttle = 0.0
-	neutral_since = 0.0
-	throttle_mode_until = 0.0
-	throttle_last_avg = None
+		try:
+			shm_state = ShmStateWriter(args.state_shm)
+		except OSError as exc:
+			print(f"Warning: could not open shared state {args.state_shm} ({exc}).", file=sys.stderr)
+
+	abs_slot = dev.absinfo(ecodes.ABS_MT_SLOT)
+	engine = JoyBridgeEngine.from_absinfo(abs_x, abs_y, config, abs_slot)
+	feed = engine.feed_values
+	# Only changed axes/buttons are sent, batched with the SYN into one write().
+	emitter = FrameEmitter(ui, OUTPUT_CODES)
+	num_slots = abs_slot.max + 1
+	sync_stats = SyncStats()
+	# Live devices are followed across unplug/replug and suspend; the virtual joystick stays.
+	watcher = None if args.replay or args.record else DeviceWatcher(identity_of(dev))
+
+	def _frames():
+		# open_frames() that outlives the touchpad: when it disappears the outputs are released
+		# (an empty frame), and once the same device is back it is resynced and fully restated.
+		nonlocal dev
+		while True:
+			try:
+				yield from open_frames(dev, 0.1)
+				return
+			except OSError as exc:
+				if watcher is None:
+					raise
+				print(f"\nLost {dev.path} ({exc}); waiting for it to come back", file=sys.stderr)
+			try:
+				dev.close()
+			except OSError:
+				pass
+			engine.reset()
+			yield []
+			lost_at = time.monotonic()
+			new_dev = None
+			while new_dev is None:
+				new_dev = watcher.wait(0.1)
+				if new_dev is None:
+					yield None
+			dev = new_dev
+			use_monotonic_clock(dev.fd)
+			try:
+				dev.grab()
+			except OSError as exc:
+				print(f"Warning: could not grab device ({exc}). Cursor may still move.")
+			resync(dev, num_slots, engine.resync, sync_stats)
+			emitter.force_full()
+			print(
+				f"\nRebound {dev.path} ({dev.name}) after {(time.monotonic() - lost_at) * 1000:.0f} ms",
+				file=sys.stderr,
+			)
+			yield []
+
+	# Kernel timestamps on CLOCK_MONOTONIC: immune to wall-clock steps and comparable with
+	# time.monotonic(). Replayed traces keep their recorded times.
+	live = isinstance(dev.fd, int)
+	monotonic = live and use_monotonic_clock(dev.fd)
+
+	# Latency accounting; None keeps it out of the loop entirely.
+	stats = None
+	stats_export = None
+	if args.stats:
+		from touchpad_stats import BridgeStats, StatsExporter, kernel_clock_offset
+
+		stats = BridgeStats(kernel_clock=live, kernel_offset_ns=kernel_clock_offset(monotonic))
+		try:
+			stats_export = StatsExporter(args.stats, stats, args.stats_interval)
+		except OSError as exc:
+			print(f"Warning: could not export stats to {args.stats} ({exc}).", file=sys.stderr)
+	clock_ns = time.monotonic_ns
+	# Shift debounce and throttle-mode timers run on frame time, not on when we got scheduled.
+	clock = FrameClock(args.clock)
+
+	# Last few seconds of input and output, dumped as traces on SIGUSR1 or a crash.
+	flight = flight_recorder_from_args(args, dev, OUTPUT_CODES)
+	if flight is not None:
+		signal.signal(signal.SIGUSR1, lambda signum, stack: flight.request_dump("sigusr1"))
 
 	last_print = 0.0
 
+	idle_gc = None
+	if args.realtime:
+		from touchpad_realtime import enter_realtime
+
+		idle_gc = enter_realtime(args.rt_priority, args.rt_cpus, args.rt_gc)
+
 	try:
-		for event in dev.read_loop():
-			if event.type == ecodes.EV_ABS:
-				if event.code == ecodes.ABS_MT_SLOT:
-					current_slot = event.value
-				elif event.code == ecodes.ABS_MT_TRACKING_ID:
-					if event.value == -1:
-						slots.pop(current_slot, None)
-					else:
-						slots[current_slot] = {"id": event.value, "x": None, "y": None, "side": None}
-				elif event.code == ecodes.ABS_MT_POSITION_X:
-					slot = slots.setdefault(current_slot, {"id": None, "x": None, "y": None})
-					slot["x"] = event.value
-					if slot.get("side") is None:
-						slot["side"] = "left" if event.value < center_x else "right"
-				elif event.code == ecodes.ABS_MT_POSITION_Y:
-					slot = slots.setdefault(current_slot, {"id": None, "x": None, "y": None})
-					slot["y"] = event.value
-			elif event.type == ecodes.EV_KEY:
-				if event.code in (ecodes.BTN_LEFT, ecodes.BTN_RIGHT, ecodes.BTN_MIDDLE):
-					brake_pressed = event.value == 1
-
-			elif event.type == ecodes.EV_SYN and event.code == ecodes.SYN_REPORT:
-				# Use the leftmost active slot on the left half for steering.
-				steer = 0
-				active_flag = 0
-				steer_slot = None
-				left_touch_active = False
-				left_finger = None
-				for s in sorted(slots.keys()):
-					info = slots[s]
-					if info.get("x") is None or info.get("y") is None:
-						continue
-					if info.get("side") == "left":
-						left_touch_active = True
-						if left_finger == None:
-							left_finger = info
-						if info["x"] < center_x and steer_slot == None:
-							steer_slot = info
-				if steer_slot:
-					dx = steer_slot["x"] - steer_center_x
-					dy = steer_slot["y"] - center_y
-					# Normalize Y so the steering motion feels circular on rectangular pads.
-					dy *= (center_x - abs_x.min) / max(1.0, (abs_y.max - abs_y.min))
-					dist = math.hypot(dx, dy)
-					if dist > config["steer_deadzone"]:
-						angle = math.atan2(dy, dx)
-						if last_angle is not None:
-							delta = math.atan2(math.sin(angle - last_angle), math.cos(angle - last_angle))
-							if abs(delta) < 0.01:
-								delta = 0.0
-							steer = int(max(-1.0, min(1.0, delta / config["steer_delta_scale"])) * 32767)
-						last_angle = angle
-						active_flag = 1
-					else:
-						last_angle = None
+		# Wake up at least every 100 ms so config reloads and the readout run without touches.
+		for events in _frames():
+			if events is not None:
+				if stats is not None:
+					recv_ns = clock_ns()
+				if events is DROPPED:
+					# Kernel buffer overrun: the partial frame is gone, re-read the device instead.
+					sync_stats.drops += 1
+					if resync(dev, num_slots, engine.resync, sync_stats):
+						emitter.force_full()
+					print(
+						f"\nSYN_DROPPED #{sync_stats.drops}: resynced in {sync_stats.last_us:.0f} us",
+						file=sys.stderr,
+					)
+					if flight is not None:
+						flight.record_dropped()
 				else:
-					last_angle = None
-
-				# Right-side fingers control the shifter and throttle.
-				gear = last_gear
-				gear_candidate = last_gear
-				throttle = last_throttle
-				right_fingers = []
-				for s in sorted(slots.keys()):
-					info = slots[s]
-					if info.get("x") is None or info.get("y") is None:
-						continue
-					if info.get("side") == "right" and info["x"] >= right_min_x:
-						right_fingers.append(info)
-
-				now = time.monotonic()
-				if len(right_fingers) >= 2:
-					if not lock_active:
-						locked_gear = last_gear
-						lock_active = True
-					gear = locked_gear
-					gear_candidate = locked_gear
-					avg_v = sum(
-						(f["y"] - abs_y.min) / max(1.0, (abs_y.max - abs_y.min))
-						for f in right_fingers
-					) / len(right_fingers)
-					if throttle_last_avg is None:
-						throttle_last_avg = avg_v
-					var_delta = (throttle_last_avg - avg_v) * config["throttle_sensitivity"]
-					throttle = max(-1.0, min(1.0, throttle + var_delta * 2.0))
-					throttle_last_avg = avg_v
-					last_throttle = throttle
-					throttle_mode_until = now + 0.2
+					for _, _, etype, code, value in events:
+						feed(etype, code, value)
+					if flight is not None and events:
+						flight.record_input(events)
+
+				if events and events is not DROPPED:
+					now = clock.frame_time(events[-1])
 				else:
-					lock_active = False
-					throttle_last_avg = None
-					if now < throttle_mode_until:
-						gear = last_gear
-					elif len(right_fingers) == 1:
-						f = right_fingers[0]
-						u = (f["x"] - right_min_x) / max(1.0, (right_max_x - right_min_x))
-						v = (f["y"] - abs_y.min) / max(1.0, (abs_y.max - abs_y.min))
-						neutral_min = config["neutral_min"]
-						neutral_max = config["neutral_max"]
-						in_neutral = (
-							neutral_min <= u <= neutral_max
-							or neutral_min <= v <= neutral_max
-						)
-
-						col = -1
-						if u < neutral_min:
-							col = 0
-						elif u > neutral_max:
-							col = 1
-
-						row = -1
-						if v < neutral_min:
-							row = 0
-						elif v > neutral_max:
-							row = 1
-
-						if in_neutral:
-							gear_candidate = 0
-						elif row != -1 and col != -1:
-							if col == 1:
-								row = 1 - row
-							gear_candidate = col * 2 + row + 1
-
-				if gear_candidate != last_gear:
-					if pending_gear != gear_candidate:
-						pending_gear = gear_candidate
-						pending_since = now
-					hold_time = config["gear_hold_time"]
-					if gear_candidate == 0:
-						hold_time = config["neutral_reset_hold"]
-					if now - pending_since >= hold_time:
-						gear = gear_candidate
-						last_gear = gear_candidate
+					now = clock.now()
+				frame = engine.on_syn(now)
+				values = frame.values()
+				if stats is None:
+					emitter.emit(values)
 				else:
-					pending_gear = gear_candidate
-					pending_since = now
-
-				right_axes = [0, 0, 0, 0]
-				for i, f in enumerate(right_fingers[:2]):
-					u = (f["x"] - right_min_x) / max(1.0, (right_max_x - right_min_x))
-					v = (f["y"] - abs_y.min) / max(1.0, (abs_y.max - abs_y.min))
-					u = max(0.0, min(1.0, u))
-					v = max(0.0, min(1.0, v))
-					right_axes[i * 2] = int((u * 2.0 - 1.0) * 32767)
-					right_axes[i * 2 + 1] = int((v * 2.0 - 1.0) * 32767)
-
-				left_axes = [0, 0]
-				if left_finger:
-					u = (left_finger["x"] - abs_x.min) / max(1.0, (center_x - abs_x.min))
-					v = (left_finger["y"] - abs_y.min) / max(1.0, (abs_y.max - abs_y.min))
-					u = max(0.0, min(1.0, u))
-					v = max(0.0, min(1.0, v))
-					left_axes[0] = int((u * 2.0 - 1.0) * 32767)
-					left_axes[1] = int((v * 2.0 - 1.0) * 32767)
-				ui.write(ecodes.EV_ABS, ecodes.ABS_X, steer)
-				band = max(0.0, min(0.6, config["throttle_neutral_band"]))
-				var_out = 0.0
-				if abs(throttle) >= band:
-					var_out = (abs(throttle) - band) / (1.0 - band)
-					if throttle < 0.0:
-						var_out = -var_out
-				ui.write(ecodes.EV_ABS, ecodes.ABS_Y, int(max(-1.0, min(1.0, var_out)) * 32767))
-				ui.write(ecodes.EV_ABS, ecodes.ABS_RX, right_axes[0])
-				ui.write(ecodes.EV_ABS, ecodes.ABS_RY, right_axes[1])
-				ui.write(ecodes.EV_ABS, ecodes.ABS_Z, right_axes[2])
-				ui.write(ecodes.EV_ABS, ecodes.ABS_RZ, right_axes[3])
-				ui.write(ecodes.EV_ABS, ecodes.ABS_HAT0X, left_axes[0])
-				ui.write(ecodes.EV_ABS, ecodes.ABS_HAT0Y, left_axes[1])
-				ui.write(ecodes.EV_KEY, ecodes.BTN_JOYSTICK, active_flag)
-				ui.write(ecodes.EV_KEY, ecodes.BTN_SOUTH, 1 if gear == 1 else 0)
-				ui.write(ecodes.EV_KEY, ecodes.BTN_EAST, 1 if gear == 2 else 0)
-				ui.write(ecodes.EV_KEY, ecodes.BTN_WEST, 1 if gear == 3 else 0)
-				ui.write(ecodes.EV_KEY, ecodes.BTN_NORTH, 1 if gear == 4 else 0)
-				ui.write(ecodes.EV_KEY, ecodes.BTN_SELECT, 1 if brake_pressed else 0)
-				ui.write(ecodes.EV_KEY, ecodes.BTN_START, 1 if len(right_fingers) > 0 else 0)
-				ui.write(ecodes.EV_KEY, ecodes.BTN_THUMBL, 1 if left_touch_active else 0)
-				ui.write(ecodes.EV_KEY, ecodes.BTN_TR, 1 if len(right_fingers) > 1 else 0)
-				ui.syn()
+					engine_ns = clock_ns()
+					emitter.emit(values)
+					if events and events is not DROPPED:
+						stats.record_frame(events[-1], recv_ns, engine_ns, clock_ns(), len(events))
+				if flight is not None:
+					flight.record_output(values)
+				if idle_gc is not None:
+					idle_gc.frame()
+
+				if shm_state is not None:
+					shm_state.publish_frame(frame)
 
 				if state_path and now - last_state_write > 0.02:
-					left_active = left_finger is not None
-					left_x = 0.0
-					left_y = 0.0
-					if left_finger:
-						left_x = (left_finger["x"] - abs_x.min) / max(1.0, (center_x - abs_x.min))
-						left_y = (left_finger["y"] - abs_y.min) / max(1.0, (abs_y.max - abs_y.min))
-						left_x = max(0.0, min(1.0, left_x))
-						left_y = max(0.0, min(1.0, left_y))
 					try:
 						with open(state_path, "w", encoding="ascii") as f:
 							f.write(
 								json.dumps(
-									{"left": {"active": left_active, "x": left_x, "y": left_y}}
+									{"left": {"active": frame.left_active, "x": frame.left_u, "y": frame.left_v}}
 								)
 							)
 					except OSError:
 						pass
 					last_state_write = now
-
-				# Reload config periodically for live tuning.
-				if config_path:
-					now = time.monotonic()
-					if now - last_config_check > 0.25:
-						config = load_config(config_path)
-						last_config_check = now
-
-				# Minimal live readout in the console (10 Hz).
-				now = time.time()
-				if now - last_print > 0.1:
-					parts = []
-					for s in sorted(slots.keys()):
-						info = slots[s]
-						parts.append(f"slot{s}: x={info.get('x')} y={info.get('y')}")
-					line = " | ".join(parts) if parts else "(no touches)"
-					print("\r" + line + " " * 10, end="", flush=True)
-					last_print = now
-
+			elif idle_gc is not None:
+				# No input for 100 ms: a safe moment for the collector.
+				idle_gc.idle()
+
+			# Live tuning: pick up a config the watcher has already validated.
+			if reloader is not None:
+				new_config = reloader.take()
+				if new_config is not None:
+					engine.set_config(new_config)
+
+			if flight is not None:
+				flight.poll()
+
+			if stats_export is not None:
+				stats.drops = sync_stats.drops
+				stats.resyncs = sync_stats.resyncs
+				stats.config_reloads = reloader.reloads if reloader is not None else 0
+				stats.writes = emitter.writes
+				stats_export.poll()
+
+			# Minimal live readout in the console (10 Hz).
+			now = time.monotonic()
+			if now - last_print > 0.1:
+				parts = [f"slot{s}: x={x} y={y}" for s, x, y in engine.active_slots()]
+				line = " | ".join(parts) if parts else "(no touches)"
+				print("\r" + line + " " * 10, end="", flush=True)
+				last_print = now
 	except KeyboardInterrupt:
 		pass
+	except Exception:
+		if flight is not None:
+			flight.dump("exception")
+		raise
 	finally:
 		try:
 			dev.ungrab()
 		except Exception:
 			pass
 		ui.close()
+		if args.sink != "uinput":
+			from touchpad_trace import describe_sink
+
+			print("\n" + describe_sink(ui), file=sys.stderr)
+		if args.record:
+			dev.close()
+		if sync_stats.drops:
+			print(f"sync: {sync_stats.as_dict()}", file=sys.stderr)
+		if shm_state is not None:
+			shm_state.close()
+		if reloader is not None:
+			reloader.stop()
+		if watcher is not None:
+			watcher.close()
+		if stats_export is not None:
+			stats_export.close()
 
 	return 0
 
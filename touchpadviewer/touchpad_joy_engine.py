@@ -0,0 +1,703 @@
+#!/usr/bin/env python3
+import math
+from array import array
+
+from touchpad_filters import PREDICT_LINEAR, Channel, Hysteresis
+from touchpad_layout import (
+	DEFAULT_LAYOUT,
+	ZONE_HANDBRAKE,
+	ZONE_SHIFTER,
+	ZONE_STEER,
+	compile_layout,
+	layout_key,
+	resolve_layout,
+)
+
+# Pure SYN_REPORT frame processor for the touchpad -> joystick bridge.
+# It turns MT protocol B events into steering, shifter and throttle outputs without touching
+# evdev, uinput, files or clocks: the caller feeds events and passes "now" to on_syn().
+# Where on the pad each of those happens comes from the config's touch layout (touchpad_layout).
+
+# Linux input event codes (linux/input-event-codes.h) used by the engine.
+EV_SYN = 0x00
+EV_KEY = 0x01
+EV_ABS = 0x03
+SYN_REPORT = 0
+
+ABS_X = 0x00
+ABS_Y = 0x01
+ABS_Z = 0x02
+ABS_RX = 0x03
+ABS_RY = 0x04
+ABS_RZ = 0x05
+ABS_HAT0X = 0x10
+ABS_HAT0Y = 0x11
+ABS_MT_SLOT = 0x2F
+ABS_MT_POSITION_X = 0x35
+ABS_MT_POSITION_Y = 0x36
+ABS_MT_TRACKING_ID = 0x39
+
+BTN_LEFT = 0x110
+BTN_RIGHT = 0x111
+BTN_MIDDLE = 0x112
+BTN_JOYSTICK = 0x120
+BTN_SOUTH = 0x130
+BTN_EAST = 0x131
+BTN_NORTH = 0x133
+BTN_WEST = 0x134
+BTN_TL = 0x136
+BTN_TR = 0x137
+BTN_SELECT = 0x13A
+BTN_START = 0x13B
+BTN_THUMBL = 0x13D
+
+# Layout zone of a contact that has not been placed yet; placed contacts keep the zone
+# (touchpad_layout.ZONE_*) they landed in.
+ZONE_UNKNOWN = -1
+
+# Slot table size when the device's ABS_MT_SLOT range is not given.
+DEFAULT_SLOTS = 16
+
+DEFAULT_CONFIG = {
+	"steer_delta_scale": 0.1,
+	"steer_deadzone": 10.0,
+	"shift_margin": 0.12,
+	"shift_gap": 0.18,
+	"neutral_min": 0.45,
+	"neutral_max": 0.55,
+	"gear_hold_time": 0.12,
+	"neutral_reset_hold": 0.15,
+	"throttle_neutral_band": 0.2,
+	"throttle_sensitivity": 1.0,
+	# Built-in layout name or a validated layout object (touchpad_config resolves layout files).
+	"layout": DEFAULT_LAYOUT,
+	# Filter stage (touchpad_filters). A min cutoff or prediction time of 0 switches that stage
+	# off; with these defaults the outputs are the unfiltered ones.
+	"steer_min_cutoff": 0.0,
+	"steer_beta": 0.0,
+	"steer_d_cutoff": 1.0,
+	"steer_predict_ms": 0.0,
+	"steer_predictor": float(PREDICT_LINEAR),
+	"steer_kalman_q": 1e6,
+	"steer_kalman_r": 4.0,
+	"steer_delta_cutoff": 0.01,
+	"steer_deadzone_hysteresis": 0.0,
+	"throttle_min_cutoff": 0.0,
+	"throttle_beta": 0.0,
+	"throttle_d_cutoff": 1.0,
+	"shift_hysteresis": 0.0,
+}
+
+# Order in which a frame is written to the virtual joystick (OutputFrame.out).
+OUTPUT_CODES = (
+	(EV_ABS, ABS_X),
+	(EV_ABS, ABS_Y),
+	(EV_ABS, ABS_RX),
+	(EV_ABS, ABS_RY),
+	(EV_ABS, ABS_Z),
+	(EV_ABS, ABS_RZ),
+	(EV_ABS, ABS_HAT0X),
+	(EV_ABS, ABS_HAT0Y),
+	(EV_KEY, BTN_JOYSTICK),
+	(EV_KEY, BTN_SOUTH),
+	(EV_KEY, BTN_EAST),
+	(EV_KEY, BTN_WEST),
+	(EV_KEY, BTN_NORTH),
+	(EV_KEY, BTN_SELECT),
+	(EV_KEY, BTN_START),
+	(EV_KEY, BTN_THUMBL),
+	(EV_KEY, BTN_TR),
+	(EV_KEY, BTN_TL),
+)
+# Positions in OUTPUT_CODES / OutputFrame.out.
+OUT_STEER = 0
+OUT_THROTTLE = 1
+OUT_RIGHT_AXES = 2
+OUT_LEFT_AXES = 6
+OUT_STEER_ACTIVE = 8
+OUT_GEAR1 = 9
+OUT_BRAKE = 13
+OUT_RIGHT1 = 14
+OUT_LEFT_TOUCH = 15
+OUT_RIGHT2 = 16
+OUT_REVERSE = 17
+
+
+class OutputFrame:
+	# One processed frame. on_syn() reuses a single instance and writes the joystick values into
+	# its preallocated `out` array, which the emitter diffs in place; copy() it to keep a snapshot.
+
+	__slots__ = (
+		"now",
+		"steer",
+		"gear",
+		"brake",
+		"right_count",
+		"left_touch_active",
+		"throttle",
+		"left_active",
+		"left_u",
+		"left_v",
+		"right_uv",
+		"out",
+	)
+
+	def __init__(self):
+		self.now = 0.0
+		self.steer = 0
+		self.gear = 0
+		self.brake = False
+		self.right_count = 0
+		self.left_touch_active = False
+		self.throttle = 0.0
+		self.left_active = False
+		self.left_u = 0.0
+		self.left_v = 0.0
+		self.right_uv = [0.0, 0.0, 0.0, 0.0]
+		self.out = array("i", bytes(4 * len(OUTPUT_CODES)))
+
+	def values(self):
+		# The joystick values in OUTPUT_CODES order; the same array every frame.
+		return self.out
+
+	def copy(self):
+		other = OutputFrame()
+		for name in OutputFrame.__slots__:
+			value = getattr(self, name)
+			if isinstance(value, list):
+				value = list(value)
+			elif isinstance(value, array):
+				value = array(value.typecode, value)
+			setattr(other, name, value)
+		return other
+
+
+class JoyBridgeEngine:
+	# Contacts live in a fixed slot table sized from ABS_MT_SLOT: parallel array('i') columns
+	# indexed by slot plus int bitmasks (bit n = slot n) for which slots are active, have a known
+	# X/Y, and changed since the last SYN. on_syn() only re-evaluates the changed slots' left /
+	# steer / right membership and picks fingers by lowest set bit, so a frame allocates nothing.
+
+	__slots__ = (
+		"config",
+		"x_min",
+		"x_max",
+		"y_min",
+		"y_max",
+		"layout",
+		"layout_key",
+		"num_slots",
+		"current_slot",
+		"current_bit",
+		"slot_ids",
+		"slot_xs",
+		"slot_ys",
+		"slot_zones",
+		"slot_cells",
+		"active",
+		"known_x",
+		"known_y",
+		"dirty",
+		"left_mask",
+		"steer_mask",
+		"right_mask",
+		"handbrake_mask",
+		"last_angle",
+		"last_gear",
+		"pending_gear",
+		"pending_since",
+		"brake_pressed",
+		"lock_active",
+		"locked_gear",
+		"last_throttle",
+		"throttle_mode_until",
+		"throttle_last_avg",
+		"steer_x",
+		"steer_y",
+		"steer_tracking",
+		"steer_gate",
+		"throttle_filter",
+		"held_gate",
+		"shift_gate",
+		"shift_target",
+		"frame",
+	)
+
+	def __init__(self, x_min, x_max, y_min, y_max, config=None, num_slots=DEFAULT_SLOTS):
+		self.config = dict(DEFAULT_CONFIG)
+		if config:
+			self.config.update(config)
+		self.x_min = x_min
+		self.x_max = x_max
+		self.y_min = y_min
+		self.y_max = y_max
+		self.num_slots = num_slots
+		self.slot_ids = array("i", [-1]) * num_slots
+		self.slot_xs = array("i", [0]) * num_slots
+		self.slot_ys = array("i", [0]) * num_slots
+		self.slot_zones = array("b", [ZONE_UNKNOWN]) * num_slots
+		self.slot_cells = array("i", [0]) * num_slots
+		self.frame = OutputFrame()
+		self.steer_x = Channel()
+		self.steer_y = Channel()
+		self.steer_gate = Hysteresis()
+		self.throttle_filter = Channel()
+		self.layout = None
+		self.layout_key = None
+		self.configure_filters()
+		self.configure_layout()
+		self.reset()
+
+	@classmethod
+	def from_absinfo(cls, abs_x, abs_y, config=None, abs_slot=None):
+		num_slots = abs_slot.max + 1 if abs_slot is not None else DEFAULT_SLOTS
+		return cls(abs_x.min, abs_x.max, abs_y.min, abs_y.max, config, num_slots)
+
+	def reset(self):
+		self.current_slot = 0
+		self.current_bit = 1
+		self.clear_slots()
+		self.last_angle = None
+		self.last_gear = 0
+		self.pending_gear = 0
+		self.pending_since = 0.0
+		self.brake_pressed = False
+		self.lock_active = False
+		self.locked_gear = 0
+		self.last_throttle = 0.0
+		self.throttle_mode_until = 0.0
+		self.throttle_last_avg = None
+		self.steer_tracking = -1
+		self.steer_x.reset()
+		self.steer_y.reset()
+		self.steer_gate.state = False
+		self.throttle_filter.reset()
+		self.held_gate = -1
+		self.shift_gate = -1
+		self.shift_target = 0
+
+	def clear_slots(self):
+		ids = self.slot_ids
+		zones = self.slot_zones
+		for s in range(self.num_slots):
+			ids[s] = -1
+			zones[s] = ZONE_UNKNOWN
+		self.active = 0
+		self.known_x = 0
+		self.known_y = 0
+		self.dirty = 0
+		self.left_mask = 0
+		self.steer_mask = 0
+		self.right_mask = 0
+		self.handbrake_mask = 0
+
+	def set_config(self, config):
+		self.config = config
+		self.configure_filters()
+		self.configure_layout()
+
+	def configure_filters(self):
+		# Retune the filter stage in place; filters that stay enabled keep their state.
+		get = self.config.get
+		horizon = get("steer_predict_ms", 0.0) / 1000.0
+		mode = int(get("steer_predictor", PREDICT_LINEAR))
+		for channel in (self.steer_x, self.steer_y):
+			channel.configure(
+				get("steer_min_cutoff", 0.0),
+				get("steer_beta", 0.0),
+				get("steer_d_cutoff", 1.0),
+				horizon,
+				mode,
+				get("steer_kalman_q", 1e6),
+				get("steer_kalman_r", 4.0),
+			)
+		self.steer_gate.threshold = get("steer_deadzone", DEFAULT_CONFIG["steer_deadzone"])
+		self.steer_gate.margin = get("steer_deadzone_hysteresis", 0.0)
+		self.throttle_filter.configure(
+			get("throttle_min_cutoff", 0.0), get("throttle_beta", 0.0), get("throttle_d_cutoff", 1.0)
+		)
+
+	def configure_layout(self):
+		# Recompile the zone grid when the layout, or the config keys it is built from, changed.
+		# Contacts keep the zone they landed in; every slot is reclassified on the next SYN.
+		config = dict(DEFAULT_CONFIG, **self.config)
+		key = layout_key(config)
+		if key == self.layout_key:
+			return
+		self.layout = compile_layout(
+			resolve_layout(config), self.x_min, self.x_max, self.y_min, self.y_max, config["shift_hysteresis"]
+		)
+		self.layout_key = key
+		self.dirty = (1 << self.num_slots) - 1
+		self.held_gate = -1
+		self.shift_gate = -1
+
+	def select_slot(self, slot):
+		# Slots outside the table (or negative) are tracked as current but their events ignored.
+		self.current_slot = slot
+		self.current_bit = 1 << slot if 0 <= slot < self.num_slots else 0
+
+	def resync(self, state):
+		# Rebuild slots from a device snapshot (touchpad_mt_sync.MTState) after SYN_DROPPED.
+		# Contacts that kept their tracking id keep their zone so steering stays continuous.
+		ids = self.slot_ids
+		xs = self.slot_xs
+		ys = self.slot_ys
+		zones = self.slot_zones
+		old_active = self.active
+		active = 0
+		for s, tracking_id in enumerate(state.tracking_ids[: self.num_slots]):
+			bit = 1 << s
+			if tracking_id == -1:
+				ids[s] = -1
+				zones[s] = ZONE_UNKNOWN
+				continue
+			if not (old_active & bit and ids[s] == tracking_id):
+				zones[s] = ZONE_UNKNOWN
+			ids[s] = tracking_id
+			xs[s] = state.xs[s]
+			ys[s] = state.ys[s]
+			active |= bit
+		self.active = active
+		self.known_x = active
+		self.known_y = active
+		# Every slot's membership is re-derived on the next SYN.
+		self.dirty = (1 << self.num_slots) - 1
+		self.select_slot(state.slot)
+		self.brake_pressed = bool(state.keys & {BTN_LEFT, BTN_RIGHT, BTN_MIDDLE})
+
+	def feed(self, event):
+		self.feed_values(event.type, event.code, event.value)
+
+	def feed_values(self, etype, code, value):
+		if etype == EV_ABS:
+			if code == ABS_MT_SLOT:
+				self.select_slot(value)
+				return
+			bit = self.current_bit
+			if not bit:
+				return
+			if code == ABS_MT_TRACKING_ID:
+				s = self.current_slot
+				mask = ~bit
+				self.known_x &= mask
+				self.known_y &= mask
+				self.slot_zones[s] = ZONE_UNKNOWN
+				if value == -1:
+					self.active &= mask
+					self.slot_ids[s] = -1
+				else:
+					self.active |= bit
+					self.slot_ids[s] = value
+				self.dirty |= bit
+			elif code == ABS_MT_POSITION_X:
+				self.slot_xs[self.current_slot] = value
+				self.active |= bit
+				self.known_x |= bit
+				self.dirty |= bit
+			elif code == ABS_MT_POSITION_Y:
+				self.slot_ys[self.current_slot] = value
+				self.active |= bit
+				self.known_y |= bit
+				self.dirty |= bit
+		elif etype == EV_KEY:
+			if code in (BTN_LEFT, BTN_RIGHT, BTN_MIDDLE):
+				self.brake_pressed = value == 1
+
+	def update_masks(self):
+		# Look up the layout cell of every slot that changed this frame and re-derive the left /
+		# steer / right / handbrake membership. A contact belongs to the zone it landed in and
+		# acts there while it stays inside; steering hands stay left-hand fingers anywhere.
+		dirty = self.dirty
+		if not dirty:
+			return
+		self.dirty = 0
+		placed = self.known_x & self.known_y
+		xs = self.slot_xs
+		ys = self.slot_ys
+		zones = self.slot_zones
+		cells = self.slot_cells
+		layout = self.layout
+		cols = layout.cols
+		rows = layout.rows
+		cell_zone = layout.cell_zone
+		x_origin = layout.x_origin
+		y_origin = layout.y_origin
+		x_last = layout.x_last
+		y_last = layout.y_last
+		left = self.left_mask & ~dirty
+		steer = self.steer_mask & ~dirty
+		right = self.right_mask & ~dirty
+		handbrake = self.handbrake_mask & ~dirty
+		while dirty:
+			bit = dirty & -dirty
+			dirty ^= bit
+			if not placed & bit:
+				continue
+			s = bit.bit_length() - 1
+			xi = xs[s] - x_origin
+			if xi < 0:
+				xi = 0
+			elif xi > x_last:
+				xi = x_last
+			yi = ys[s] - y_origin
+			if yi < 0:
+				yi = 0
+			elif yi > y_last:
+				yi = y_last
+			cell = cols[xi] + rows[yi]
+			cells[s] = cell
+			zone = cell_zone[cell]
+			owner = zones[s]
+			if owner == ZONE_UNKNOWN:
+				owner = zones[s] = zone
+			if owner == ZONE_STEER:
+				left |= bit
+				if zone == ZONE_STEER:
+					steer |= bit
+			elif owner == zone:
+				if zone == ZONE_SHIFTER:
+					right |= bit
+				elif zone == ZONE_HANDBRAKE:
+					handbrake |= bit
+		self.left_mask = left
+		self.steer_mask = steer
+		self.right_mask = right
+		self.handbrake_mask = handbrake
+
+	def on_syn(self, now):
+		config = self.config
+		layout = self.layout
+		xs = self.slot_xs
+		ys = self.slot_ys
+		self.update_masks()
+
+		# Use the lowest-numbered left-hand slot inside the steering zone for steering.
+		steer = 0
+		active_flag = 0
+		left = self.left_mask
+		left_touch_active = left != 0
+		left_slot = (left & -left).bit_length() - 1
+		steer_mask = self.steer_mask
+		steer_slot = (steer_mask & -steer_mask).bit_length() - 1
+		if steer_slot >= 0:
+			x = xs[steer_slot]
+			y = ys[steer_slot]
+			steer_x = self.steer_x
+			steer_y = self.steer_y
+			if steer_x.active:
+				# A new contact starts its filters from its own first sample.
+				tracking_id = self.slot_ids[steer_slot]
+				if tracking_id != self.steer_tracking:
+					self.steer_tracking = tracking_id
+					steer_x.reset()
+					steer_y.reset()
+				x = steer_x.update(x, now)
+				y = steer_y.update(y, now)
+			dx = x - layout.steer_center_x
+			dy = (y - layout.steer_center_y) * layout.steer_aspect
+			dist = math.hypot(dx, dy)
+			if self.steer_gate.update(dist):
+				angle = math.atan2(dy, dx)
+				last_angle = self.last_angle
+				if last_angle is not None:
+					delta = math.atan2(math.sin(angle - last_angle), math.cos(angle - last_angle))
+					if abs(delta) < config["steer_delta_cutoff"]:
+						delta = 0.0
+					steer = int(max(-1.0, min(1.0, delta / config["steer_delta_scale"])) * 32767)
+				self.last_angle = angle
+				active_flag = 1
+			else:
+				self.last_angle = None
+		else:
+			self.last_angle = None
+			self.steer_tracking = -1
+			self.steer_gate.state = False
+
+		# Fingers in the shifter zone control the shifter and throttle.
+		last_gear = self.last_gear
+		gear = last_gear
+		gear_candidate = last_gear
+		throttle = self.last_throttle
+		right_min_x, right_min_y, right_max_x, right_max_y = layout.shifter_rect
+		right_span = max(1.0, (right_max_x - right_min_x))
+		right_v_span = max(1.0, (right_max_y - right_min_y))
+		# Right fingers in slot order: the first two drive the axes, all of them the throttle.
+		right_count = 0
+		right_0 = right_1 = -1
+		v_sum = 0.0
+		right = self.right_mask
+		while right:
+			bit = right & -right
+			right ^= bit
+			s = bit.bit_length() - 1
+			if right_count == 0:
+				right_0 = s
+			elif right_count == 1:
+				right_1 = s
+			right_count += 1
+			v_sum += (ys[s] - right_min_y) / right_v_span
+
+		if right_count >= 2:
+			if not self.lock_active:
+				self.locked_gear = last_gear
+				self.lock_active = True
+			gear = self.locked_gear
+			gear_candidate = self.locked_gear
+			avg_v = v_sum / right_count
+			throttle_filter = self.throttle_filter
+			if self.throttle_last_avg is None:
+				throttle_filter.reset()
+			if throttle_filter.active:
+				avg_v = throttle_filter.update(avg_v, now)
+			if self.throttle_last_avg is None:
+				self.throttle_last_avg = avg_v
+			var_delta = (self.throttle_last_avg - avg_v) * config["throttle_sensitivity"]
+			throttle = max(-1.0, min(1.0, throttle + var_delta * 2.0))
+			self.throttle_last_avg = avg_v
+			self.last_throttle = throttle
+			self.throttle_mode_until = now + 0.2
+		else:
+			self.lock_active = False
+			self.throttle_last_avg = None
+			if now < self.throttle_mode_until:
+				gear = last_gear
+				self.held_gate = -1
+				self.shift_gate = -1
+			elif right_count == 1:
+				# The gate under the finger, unless it is still within shift_hysteresis of the
+				# gate it selected last frame.
+				cell = self.slot_cells[right_0]
+				gate = layout.cell_gate[cell]
+				held = self.held_gate
+				if held >= 0 and layout.cell_hold[cell] >> held & 1:
+					gate = held
+				self.held_gate = gate
+				if gate >= 0:
+					step = layout.gate_step[gate]
+					if not step:
+						gear_candidate = layout.gate_gear[gate]
+					else:
+						# Sequential gates step once per entry.
+						if gate != self.shift_gate:
+							self.shift_target = max(layout.min_gear, min(layout.max_gear, last_gear + step))
+						gear_candidate = self.shift_target
+				self.shift_gate = gate
+			else:
+				self.held_gate = -1
+				self.shift_gate = -1
+
+		if gear_candidate != last_gear:
+			if self.pending_gear != gear_candidate:
+				self.pending_gear = gear_candidate
+				self.pending_since = now
+			hold_time = config["gear_hold_time"]
+			if gear_candidate == 0:
+				hold_time = config["neutral_reset_hold"]
+			if now - self.pending_since >= hold_time:
+				gear = gear_candidate
+				self.last_gear = gear_candidate
+		else:
+			self.pending_gear = gear_candidate
+			self.pending_since = now
+
+		frame = self.frame
+		out = frame.out
+		right_uv = frame.right_uv
+		i = 0
+		while i < 4:
+			out[OUT_RIGHT_AXES + i] = 0
+			right_uv[i] = 0.0
+			i += 1
+		i = 0
+		s = right_0
+		while s >= 0:
+			u = (xs[s] - right_min_x) / right_span
+			v = (ys[s] - right_min_y) / right_v_span
+			u = max(0.0, min(1.0, u))
+			v = max(0.0, min(1.0, v))
+			right_uv[i] = u
+			right_uv[i + 1] = v
+			out[OUT_RIGHT_AXES + i] = int((u * 2.0 - 1.0) * 32767)
+			out[OUT_RIGHT_AXES + i + 1] = int((v * 2.0 - 1.0) * 32767)
+			if i:
+				break
+			i = 2
+			s = right_1
+
+		out[OUT_LEFT_AXES] = 0
+		out[OUT_LEFT_AXES + 1] = 0
+		left_u = 0.0
+		left_v = 0.0
+		if left_slot >= 0:
+			left_min_x, left_min_y, left_max_x, left_max_y = layout.steer_rect
+			u = (xs[left_slot] - left_min_x) / max(1.0, (left_max_x - left_min_x))
+			v = (ys[left_slot] - left_min_y) / max(1.0, (left_max_y - left_min_y))
+			left_u = max(0.0, min(1.0, u))
+			left_v = max(0.0, min(1.0, v))
+			out[OUT_LEFT_AXES] = int((left_u * 2.0 - 1.0) * 32767)
+			out[OUT_LEFT_AXES + 1] = int((left_v * 2.0 - 1.0) * 32767)
+
+		band = max(0.0, min(0.6, config["throttle_neutral_band"]))
+		var_out = 0.0
+		if abs(throttle) >= band:
+			var_out = (abs(throttle) - band) / (1.0 - band)
+			if throttle < 0.0:
+				var_out = -var_out
+
+		brake = self.brake_pressed or self.handbrake_mask != 0
+		out[OUT_STEER] = steer
+		out[OUT_THROTTLE] = int(max(-1.0, min(1.0, var_out)) * 32767)
+		out[OUT_STEER_ACTIVE] = active_flag
+		out[OUT_GEAR1] = gear == 1
+		out[OUT_GEAR1 + 1] = gear == 2
+		out[OUT_GEAR1 + 2] = gear == 3
+		out[OUT_GEAR1 + 3] = gear == 4
+		out[OUT_BRAKE] = brake
+		out[OUT_RIGHT1] = right_count > 0
+		out[OUT_LEFT_TOUCH] = left_touch_active
+		out[OUT_RIGHT2] = right_count > 1
+		out[OUT_REVERSE] = gear < 0
+
+		frame.now = now
+		frame.steer = steer
+		frame.gear = gear
+		frame.brake = brake
+		frame.right_count = right_count
+		frame.left_touch_active = left_touch_active
+		frame.throttle = throttle
+		frame.left_active = left_slot >= 0
+		frame.left_u = left_u
+		frame.left_v = left_v
+		return frame
+
+	def active_slots(self):
+		# (slot, x, y) for every active slot in slot order; x/y are None until reported.
+		out = []
+		active = self.active
+		known_x = self.known_x
+		known_y = self.known_y
+		while active:
+			bit = active & -active
+			active ^= bit
+			s = bit.bit_length() - 1
+			out.append(
+				(s, self.slot_xs[s] if known_x & bit else None, self.slot_ys[s] if known_y & bit else None)
+			)
+		return out
+
+	def placed_slots(self):
+		# (slot, tracking id, x, y, zone) for every active slot with a known position, in slot order.
+		# The zone is the one the contact landed in (touchpad_layout.ZONE_*).
+		out = []
+		placed = self.active & self.known_x & self.known_y
+		ids = self.slot_ids
+		xs = self.slot_xs
+		ys = self.slot_ys
+		zones = self.slot_zones
+		while placed:
+			bit = placed & -placed
+			placed ^= bit
+			s = bit.bit_length() - 1
+			out.append((s, ids[s], xs[s], ys[s], max(0, zones[s])))
+		return out
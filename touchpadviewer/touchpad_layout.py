@@ -0,0 +1,538 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import sys
+
+# Touch-zone layouts for the joy bridge: which part of the pad steers, shifts or pulls the
+# handbrake, and the shifter's gates.
+#
+# A layout is a JSON object:
+#   {"name": "h4",
+#    "zones": [
+#      {"role": "steer", "rect": [0, 0, 0.5, 1]},
+#      {"role": "shifter", "rect": [0.5, 0, 1, 1], "min_gear": -1, "max_gear": 4,
+#       "gates": [{"rect": [0, 0, 0.45, 0.45], "gear": 1}, {"rect": [...], "shift": "up"}, ...]},
+#      {"role": "handbrake", "rect": [0.9, 0, 1, 1]}]}
+# Zone rects are [u0, v0, u1, v1] in pad coordinates normalized to 0..1; gate rects are in the
+# same form relative to their shifter zone. Rects are closed and later entries paint over earlier
+# ones, so a band listed last owns its edges. Each role appears at most once.
+#   steer      a contact that lands here is a left-hand finger (left stick axes); while it stays
+#              inside it turns the wheel around the zone's centre
+#   shifter    one finger selects the gate under it, two or more drive the throttle; contacts
+#              that land here and stay inside feed the right stick axes
+#   handbrake  any finger that lands and stays here holds the brake button
+# A gate either selects a gear (-1 reverse, 0 neutral, 1-4) or steps the gear once on entry
+# ("shift": "up" / "down", clamped to the zone's min_gear..max_gear). Shifter area outside every
+# gate keeps the current gear.
+#
+# compile_layout() turns a layout into a lookup grid for one pad's coordinate range. Every rect
+# edge becomes a breakpoint on its axis; cols[x - x_origin] + rows[y - y_origin] indexes a cell, and
+# the cell tables hold its zone, gate and the sticky gates it is within shift_hysteresis of. The
+# per-integer tables are filled by evaluating the same float expressions the engine used to
+# compare against, so classification is exact rather than rounded to a cell size.
+
+ZONE_NONE = 0
+ZONE_STEER = 1
+ZONE_SHIFTER = 2
+ZONE_HANDBRAKE = 3
+
+ROLES = {"steer": ZONE_STEER, "shifter": ZONE_SHIFTER, "handbrake": ZONE_HANDBRAKE}
+ZONE_NAMES = ("none", "steer", "shifter", "handbrake")
+
+MIN_GEAR = -1
+MAX_GEAR = 4
+# Gates per layout: each one is a bit in the cells' hold masks.
+MAX_GATES = 32
+
+DEFAULT_LAYOUT = "h4"
+
+
+def _h4(config):
+	# The original geometry: steering on the left half, a 2x2 gate on the right with a neutral
+	# cross. The cross is listed last so the band edges are neutral.
+	lo = config["neutral_min"]
+	hi = config["neutral_max"]
+	return {
+		"name": "h4",
+		"zones": [
+			{"role": "steer", "rect": [0.0, 0.0, 0.5, 1.0]},
+			{
+				"role": "shifter",
+				"rect": [0.5, 0.0, 1.0, 1.0],
+				"gates": [
+					{"rect": [0.0, 0.0, lo, lo], "gear": 1},
+					{"rect": [0.0, hi, lo, 1.0], "gear": 2},
+					{"rect": [hi, 0.0, 1.0, lo], "gear": 4},
+					{"rect": [hi, hi, 1.0, 1.0], "gear": 3},
+					{"rect": [lo, 0.0, hi, 1.0], "gear": 0},
+					{"rect": [0.0, lo, 1.0, hi], "gear": 0},
+				],
+			},
+		],
+	}
+
+
+def _h4r(config):
+	# h4 with a third column: 1/2 and 4/3 as in h4, reverse top right. The neutral bar runs across
+	# all columns; the strips between columns and the bottom right are neutral too.
+	lo = config["neutral_min"]
+	hi = config["neutral_max"]
+	return {
+		"name": "h4r",
+		"zones": [
+			{"role": "steer", "rect": [0.0, 0.0, 0.5, 1.0]},
+			{
+				"role": "shifter",
+				"rect": [0.5, 0.0, 1.0, 1.0],
+				"gates": [
+					{"rect": [0.0, 0.0, 0.3, lo], "gear": 1},
+					{"rect": [0.0, hi, 0.3, 1.0], "gear": 2},
+					{"rect": [0.35, 0.0, 0.65, lo], "gear": 4},
+					{"rect": [0.35, hi, 0.65, 1.0], "gear": 3},
+					{"rect": [0.7, 0.0, 1.0, lo], "gear": -1},
+					{"rect": [0.7, hi, 1.0, 1.0], "gear": 0},
+					{"rect": [0.3, 0.0, 0.35, 1.0], "gear": 0},
+					{"rect": [0.65, 0.0, 0.7, 1.0], "gear": 0},
+					{"rect": [0.0, lo, 1.0, hi], "gear": 0},
+				],
+			},
+		],
+	}
+
+
+def _sequential(config):
+	# Flick up or down on the right half to step through R, N, 1-4; a strip along the right edge
+	# is the handbrake.
+	return {
+		"name": "sequential",
+		"zones": [
+			{"role": "steer", "rect": [0.0, 0.0, 0.5, 1.0]},
+			{
+				"role": "shifter",
+				"rect": [0.5, 0.0, 1.0, 1.0],
+				"min_gear": -1,
+				"max_gear": 4,
+				"gates": [
+					{"rect": [0.0, 0.0, 1.0, 0.3], "shift": "up"},
+					{"rect": [0.0, 0.7, 1.0, 1.0], "shift": "down"},
+				],
+			},
+			{"role": "handbrake", "rect": [0.88, 0.0, 1.0, 1.0]},
+		],
+	}
+
+
+BUILTIN_LAYOUTS = {"h4": _h4, "h4r": _h4r, "sequential": _sequential}
+
+
+def _number(value):
+	return not isinstance(value, bool) and isinstance(value, (int, float)) and value == value
+
+
+def _check_rect(rect, where, errors):
+	if not (isinstance(rect, list) and len(rect) == 4 and all(_number(v) for v in rect)):
+		errors.append(f"{where}.rect: expected [u0, v0, u1, v1]")
+		return None
+	u0, v0, u1, v1 = (float(v) for v in rect)
+	if not (0.0 <= u0 <= u1 <= 1.0 and 0.0 <= v0 <= v1 <= 1.0):
+		errors.append(f"{where}.rect: needs 0 <= u0 <= u1 <= 1 and 0 <= v0 <= v1 <= 1")
+		return None
+	return [u0, v0, u1, v1]
+
+
+def _check_gear(value, where, errors):
+	if isinstance(value, bool) or not isinstance(value, int) or not MIN_GEAR <= value <= MAX_GEAR:
+		errors.append(f"{where}: expected an integer gear from {MIN_GEAR} to {MAX_GEAR}")
+		return None
+	return value
+
+
+def validate_layout(data):
+	# Returns (layout, errors); layout is None when anything is wrong. The result is a plain,
+	# JSON-serializable copy with defaults filled in, so two layouts compare with ==.
+	errors = []
+	if not isinstance(data, dict):
+		return None, ["layout must be a JSON object"]
+	name = data.get("name", "custom")
+	if not isinstance(name, str):
+		errors.append("name: expected a string")
+	zones = data.get("zones")
+	if not isinstance(zones, list) or not zones:
+		return None, errors + ["zones: expected a non-empty list"]
+	out = []
+	seen = set()
+	for i, zone in enumerate(zones):
+		where = f"zones[{i}]"
+		if not isinstance(zone, dict):
+			errors.append(f"{where}: expected an object")
+			continue
+		role = zone.get("role")
+		if role not in ROLES:
+			errors.append(f"{where}.role: expected one of {', '.join(ROLES)}")
+			continue
+		if role in seen:
+			errors.append(f"{where}.role: more than one {role} zone")
+			continue
+		seen.add(role)
+		rect = _check_rect(zone.get("rect"), where, errors)
+		entry = {"role": role, "rect": rect}
+		if role == "shifter":
+			entry["min_gear"] = _check_gear(zone.get("min_gear", MIN_GEAR), f"{where}.min_gear", errors)
+			entry["max_gear"] = _check_gear(zone.get("max_gear", MAX_GEAR), f"{where}.max_gear", errors)
+			if None not in (entry["min_gear"], entry["max_gear"]) and entry["min_gear"] > entry["max_gear"]:
+				errors.append(f"{where}: min_gear > max_gear")
+			gates = zone.get("gates", [])
+			if not isinstance(gates, list) or len(gates) > MAX_GATES:
+				errors.append(f"{where}.gates: expected a list of at most {MAX_GATES} gates")
+				gates = []
+			entry["gates"] = []
+			for j, gate in enumerate(gates):
+				gwhere = f"{where}.gates[{j}]"
+				if not isinstance(gate, dict) or ("gear" in gate) == ("shift" in gate):
+					errors.append(f"{gwhere}: expected an object with either gear or shift")
+					continue
+				grect = _check_rect(gate.get("rect"), gwhere, errors)
+				if "gear" in gate:
+					entry["gates"].append({"rect": grect, "gear": _check_gear(gate["gear"], f"{gwhere}.gear", errors)})
+				elif gate["shift"] in ("up", "down"):
+					entry["gates"].append({"rect": grect, "shift": gate["shift"]})
+				else:
+					errors.append(f"{gwhere}.shift: expected up or down")
+		elif "gates" in zone:
+			errors.append(f"{where}.gates: only a shifter zone has gates")
+		out.append(entry)
+	if errors:
+		return None, errors
+	layout = {"name": name, "zones": out}
+	if isinstance(data.get("source"), str):
+		layout["source"] = data["source"]
+	return layout, []
+
+
+def load_layout(spec, directory=None):
+	# Config value -> (layout, errors). A built-in name stays a name (it follows the neutral band
+	# config keys); a path or an inline object becomes a validated layout. Relative paths are
+	# taken from `directory` when given. Runs off the input path.
+	if isinstance(spec, str):
+		if spec in BUILTIN_LAYOUTS:
+			return spec, []
+		path = os.path.expanduser(spec)
+		if directory and not os.path.isabs(path):
+			path = os.path.join(directory, path)
+		path = os.path.abspath(path)
+		try:
+			with open(path, "r", encoding="utf-8") as f:
+				data = json.load(f)
+		except OSError as exc:
+			return None, [str(exc)]
+		except ValueError as exc:
+			return None, [f"{path}: invalid JSON: {exc}"]
+		if isinstance(data, dict):
+			data = dict(data, source=path)
+		return validate_layout(data)
+	if isinstance(spec, dict):
+		return validate_layout(spec)
+	return None, [f"expected a built-in layout name ({', '.join(BUILTIN_LAYOUTS)}), a file path or an object"]
+
+
+def resolve_layout(config):
+	# The layout a config selects, as a validated layout object.
+	layout = config.get("layout", DEFAULT_LAYOUT)
+	if isinstance(layout, str):
+		layout, _ = validate_layout(BUILTIN_LAYOUTS[layout](config))
+	return layout
+
+
+def layout_source(config):
+	# The file a config's layout was read from, or None for built-ins and inline layouts.
+	layout = config.get("layout")
+	return layout.get("source") if isinstance(layout, dict) else None
+
+
+def layout_key(config):
+	# Everything compile_layout() reads from a config, for deciding whether to recompile.
+	layout = config.get("layout", DEFAULT_LAYOUT)
+	if isinstance(layout, str):
+		return (layout, config["neutral_min"], config["neutral_max"], config.get("shift_hysteresis", 0.0))
+	return (json.dumps(layout, sort_keys=True), config.get("shift_hysteresis", 0.0))
+
+
+def _at_least(edge, at=None, origin=0.0, span=1.0):
+	# Test for the low side of a rect edge at normalized `edge`: against the pad coordinate `at`,
+	# or against (t - origin) / span. Edges on the border reach past it, as pads report a little
+	# beyond their advertised range.
+	if edge <= 0.0:
+		return lambda t: True
+	if at is not None:
+		return lambda t: t >= at
+	return lambda t: (t - origin) / span >= edge
+
+
+def _at_most(edge, at=None, origin=0.0, span=1.0):
+	if edge >= 1.0:
+		return lambda t: True
+	if at is not None:
+		return lambda t: t <= at
+	return lambda t: (t - origin) / span <= edge
+
+
+def _first_true(pred, lo, hi):
+	# Smallest x in [lo, hi] with pred(x), pred monotone false -> true; hi + 1 if none.
+	end = hi + 1
+	while lo < end:
+		mid = (lo + end) // 2
+		if pred(mid):
+			end = mid
+		else:
+			lo = mid + 1
+	return lo
+
+
+def _int_span(lo_f, hi_f, a, b):
+	# Integer range [first, last] of t in [a, b] with lo_f(t) and hi_f(t); lo_f turns true and
+	# hi_f turns false as t grows.
+	first = _first_true(lo_f, a, b)
+	last = _first_true(lambda t: not hi_f(t), a, b) - 1
+	return first, last
+
+
+def _bands(spans, a, b):
+	# Split [a, b] at every span edge. Returns the band start of each band.
+	edges = {a}
+	for first, last in spans:
+		if first <= last:
+			if a < first <= b:
+				edges.add(first)
+			if a <= last < b:
+				edges.add(last + 1)
+	return sorted(edges)
+
+
+class CompiledLayout:
+	__slots__ = (
+		"name",
+		"x_origin",
+		"y_origin",
+		"x_last",
+		"y_last",
+		"cols",
+		"rows",
+		"cell_zone",
+		"cell_gate",
+		"cell_hold",
+		"gate_gear",
+		"gate_step",
+		"min_gear",
+		"max_gear",
+		"steer_rect",
+		"steer_center_x",
+		"steer_center_y",
+		"steer_aspect",
+		"shifter_rect",
+		"num_cols",
+		"num_rows",
+	)
+
+	def zone_at(self, x, y):
+		# (zone, gate) at a pad position; the engine inlines this lookup.
+		xi = min(max(x - self.x_origin, 0), self.x_last)
+		yi = min(max(y - self.y_origin, 0), self.y_last)
+		c = self.cols[xi] + self.rows[yi]
+		return self.cell_zone[c], self.cell_gate[c]
+
+
+def compile_layout(layout, x_min, x_max, y_min, y_max, hysteresis=0.0):
+	# Lookup grid for a pad with the given coordinate range. `hysteresis` widens every gear and
+	# shift gate by that fraction of the shifter for a finger that already selected it.
+	x_span = x_max - x_min
+	y_span = y_max - y_min
+	# The tables run one past each end of the range: every edge lies within the range, so the
+	# extra entries stand for all coordinates beyond it and lookups clamp onto them.
+	x_origin = x_min - 1
+	y_origin = y_min - 1
+	x_last = max(0, x_span) + 2
+	y_last = max(0, y_span) + 2
+	x_end = x_origin + x_last
+	y_end = y_origin + y_last
+
+	# Pad-coordinate rects, with the same expressions the engine uses for its normalized axes.
+	zones = []
+	for zone in layout["zones"]:
+		u0, v0, u1, v1 = zone["rect"]
+		zx0 = x_min + u0 * x_span
+		zx1 = x_min + u1 * x_span
+		zy0 = y_min + v0 * y_span
+		zy1 = y_min + v1 * y_span
+		zones.append((ROLES[zone["role"]], zx0, zy0, zx1, zy1, zone))
+
+	x_tests = []
+	y_tests = []
+	for _, zx0, zy0, zx1, zy1, zone in zones:
+		u0, v0, u1, v1 = zone["rect"]
+		x_tests.append((_at_least(u0, zx0), _at_most(u1, zx1)))
+		y_tests.append((_at_least(v0, zy0), _at_most(v1, zy1)))
+
+	gates = []
+	shifter = None
+	for role, zx0, zy0, zx1, zy1, zone in zones:
+		if role != ZONE_SHIFTER:
+			continue
+		shifter = (zx0, zy0, zx1, zy1, zone)
+		w = max(1.0, zx1 - zx0)
+		h = max(1.0, zy1 - zy0)
+		for gate in zone["gates"]:
+			u0, v0, u1, v1 = gate["rect"]
+			sticky = "shift" in gate or gate["gear"] != 0
+			m = hysteresis if sticky and hysteresis > 0.0 else 0.0
+			for a0, a1, o, span, out in ((u0, u1, zx0, w, x_tests), (v0, v1, zy0, h, y_tests)):
+				out.append((_at_least(a0, None, o, span), _at_most(a1, None, o, span)))
+				out.append((_at_least(a0 - m, None, o, span), _at_most(a1 + m, None, o, span)))
+			gates.append((gate, sticky and m > 0.0))
+
+	x_spans = [_int_span(lo_f, hi_f, x_origin, x_end) for lo_f, hi_f in x_tests]
+	y_spans = [_int_span(lo_f, hi_f, y_origin, y_end) for lo_f, hi_f in y_tests]
+	x_starts = _bands(x_spans, x_origin, x_end)
+	y_starts = _bands(y_spans, y_origin, y_end)
+	num_cols = len(x_starts)
+	num_rows = len(y_starts)
+
+	# Plain lists rather than arrays: indexing a list hands back the stored int, where an array
+	# boxes a new one on every read, and that is most of the lookup's cost in the engine.
+	cols = []
+	for c, start in enumerate(x_starts):
+		end = x_starts[c + 1] if c + 1 < num_cols else x_end + 1
+		cols += [c] * (end - start)
+	rows = []
+	for r, start in enumerate(y_starts):
+		end = y_starts[r + 1] if r + 1 < num_rows else y_end + 1
+		rows += [r * num_cols] * (end - start)
+
+	# Which tests hold at each band: a band's first coordinate stands for all of it.
+	def hits(spans, starts):
+		return [[first <= t <= last for first, last in spans] for t in starts]
+
+	x_hits = hits(x_spans, x_starts)
+	y_hits = hits(y_spans, y_starts)
+	n_zones = len(zones)
+	cell_zone = [ZONE_NONE] * (num_cols * num_rows)
+	cell_gate = [-1] * (num_cols * num_rows)
+	cell_hold = [0] * (num_cols * num_rows)
+	for r in range(num_rows):
+		yh = y_hits[r]
+		for c in range(num_cols):
+			xh = x_hits[c]
+			cell = r * num_cols + c
+			zone = ZONE_NONE
+			for i in range(n_zones):
+				if xh[i] and yh[i]:
+					zone = zones[i][0]
+			cell_zone[cell] = zone
+			if zone != ZONE_SHIFTER:
+				continue
+			gate = -1
+			hold = 0
+			for g, (_, held_ok) in enumerate(gates):
+				k = n_zones + 2 * g
+				if xh[k] and yh[k]:
+					gate = g
+				if held_ok and xh[k + 1] and yh[k + 1]:
+					hold |= 1 << g
+			cell_gate[cell] = gate
+			cell_hold[cell] = hold
+
+	compiled = CompiledLayout()
+	compiled.name = layout.get("name", "custom")
+	compiled.x_origin = x_origin
+	compiled.y_origin = y_origin
+	compiled.x_last = x_last
+	compiled.y_last = y_last
+	compiled.cols = cols
+	compiled.rows = rows
+	compiled.cell_zone = cell_zone
+	compiled.cell_gate = cell_gate
+	compiled.cell_hold = cell_hold
+	compiled.gate_gear = [gate.get("gear", 0) for gate, _ in gates]
+	compiled.gate_step = [{"up": 1, "down": -1}.get(gate.get("shift"), 0) for gate, _ in gates]
+	compiled.min_gear = shifter[4]["min_gear"] if shifter else MIN_GEAR
+	compiled.max_gear = shifter[4]["max_gear"] if shifter else MAX_GEAR
+	# Without a steer or shifter zone no contact ever uses their geometry; the whole pad stands in.
+	pad = (float(x_min), float(y_min), float(x_max), float(y_max))
+	compiled.steer_rect = pad
+	compiled.steer_center_x = compiled.steer_center_y = compiled.steer_aspect = 0.0
+	compiled.shifter_rect = shifter[:4] if shifter else pad
+	for role, zx0, zy0, zx1, zy1, _ in zones:
+		if role == ZONE_STEER:
+			compiled.steer_rect = (zx0, zy0, zx1, zy1)
+			compiled.steer_center_x = (zx0 + zx1) / 2.0
+			compiled.steer_center_y = (zy0 + zy1) / 2.0
+			# Scales Y so the steering motion feels circular on a rectangular zone.
+			compiled.steer_aspect = (zx1 - zx0) / max(1.0, zy1 - zy0)
+	compiled.num_cols = num_cols
+	compiled.num_rows = num_rows
+	return compiled
+
+
+def gate_label(compiled, gate):
+	if gate < 0:
+		return "hold"
+	step = compiled.gate_step[gate]
+	if step:
+		return "shift_up" if step > 0 else "shift_down"
+	gear = compiled.gate_gear[gate]
+	return "neutral" if gear == 0 else "reverse" if gear < 0 else f"gear{gear}"
+
+
+def render(compiled, x_min, x_max, y_min, y_max, width=64, height=20):
+	# ASCII map of the compiled grid: zone letters, gate gears in the shifter.
+	marks = {ZONE_NONE: ".", ZONE_STEER: "s", ZONE_HANDBRAKE: "H"}
+	lines = []
+	for j in range(height):
+		y = y_min + (y_max - y_min) * (j + 0.5) / height
+		row = []
+		for i in range(width):
+			x = x_min + (x_max - x_min) * (i + 0.5) / width
+			zone, gate = compiled.zone_at(int(x), int(y))
+			if zone != ZONE_SHIFTER:
+				row.append(marks[zone])
+			elif gate < 0:
+				row.append("-")
+			elif compiled.gate_step[gate]:
+				row.append("^" if compiled.gate_step[gate] > 0 else "v")
+			else:
+				gear = compiled.gate_gear[gate]
+				row.append("N" if gear == 0 else "R" if gear < 0 else str(gear))
+		lines.append("".join(row))
+	return "\n".join(lines)
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Check and preview a touch-zone layout")
+	parser.add_argument("layout", help=f"built-in name ({', '.join(BUILTIN_LAYOUTS)}) or layout JSON file")
+	parser.add_argument("--config", help="joy bridge config (neutral band, shift_hysteresis)")
+	parser.add_argument("--pad", default="0,3000,0,2000", help="x_min,x_max,y_min,y_max (default: %(default)s)")
+	parser.add_argument("--json", action="store_true", help="print the validated layout as JSON")
+	args = parser.parse_args()
+
+	from touchpad_config import load_config
+
+	config = load_config(args.config)
+	layout, errors = load_layout(args.layout)
+	if errors:
+		for err in errors:
+			print(f"layout: {err}", file=sys.stderr)
+		return 1
+	config["layout"] = layout
+	layout = resolve_layout(config)
+	if args.json:
+		print(json.dumps(layout, indent=2))
+		return 0
+	x_min, x_max, y_min, y_max = (int(v) for v in args.pad.split(","))
+	compiled = compile_layout(layout, x_min, x_max, y_min, y_max, config["shift_hysteresis"])
+	print(f"{compiled.name}: {compiled.num_cols} x {compiled.num_rows} cells")
+	print(render(compiled, x_min, x_max, y_min, y_max))
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
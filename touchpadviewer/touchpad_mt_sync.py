@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+import fcntl
+import struct
+import time
+from array import array
+from collections import namedtuple
+
+# Recovery from SYN_DROPPED (evdev client buffer overrun).
+# After a drop the kernel expects the client to discard events up to and including the next
+# SYN_REPORT and then read the current device state back with EVIOCG* ioctls.
+
+EV_SYN = 0x00
+EV_KEY = 0x01
+EV_ABS = 0x03
+SYN_REPORT = 0
+SYN_DROPPED = 3
+
+ABS_MT_SLOT = 0x2F
+ABS_MT_POSITION_X = 0x35
+ABS_MT_POSITION_Y = 0x36
+ABS_MT_TRACKING_ID = 0x39
+
+KEY_MAX = 0x2FF
+
+_IOC_READ = 2
+
+
+def _ioc(direction, nr, size):
+	return (direction << 30) | (size << 16) | (ord("E") << 8) | nr
+
+
+def EVIOCGKEY(length):
+	return _ioc(_IOC_READ, 0x18, length)
+
+
+def EVIOCGMTSLOTS(length):
+	return _ioc(_IOC_READ, 0x0A, length)
+
+
+_ABSINFO = struct.Struct("6i")
+
+
+def EVIOCGABS(code):
+	return _ioc(_IOC_READ, 0x40 + code, _ABSINFO.size)
+
+
+# Slot state as the kernel sees it. Lists are indexed by slot; tracking id -1 is an empty slot.
+MTState = namedtuple("MTState", "slot tracking_ids xs ys keys")
+
+
+def read_mt_column(fd, code, num_slots):
+	# EVIOCGMTSLOTS fills one ABS_MT_* value per slot after the requested code.
+	buf = array("i", [code] + [0] * num_slots)
+	fcntl.ioctl(fd, EVIOCGMTSLOTS(buf.itemsize * len(buf)), buf, True)
+	return buf[1:].tolist()
+
+
+def read_abs_value(fd, code):
+	buf = bytearray(_ABSINFO.size)
+	fcntl.ioctl(fd, EVIOCGABS(code), buf, True)
+	return _ABSINFO.unpack(buf)[0]
+
+
+def read_keys(fd):
+	buf = bytearray(KEY_MAX // 8 + 1)
+	fcntl.ioctl(fd, EVIOCGKEY(len(buf)), buf, True)
+	keys = set()
+	for i, byte in enumerate(buf):
+		while byte:
+			bit = byte & -byte
+			keys.add(i * 8 + bit.bit_length() - 1)
+			byte ^= bit
+	return keys
+
+
+def query_mt_state(dev, num_slots):
+	# Prefer the device's own snapshot (replayed traces), otherwise ask the kernel.
+	mt_state = getattr(dev, "mt_state", None)
+	if mt_state is not None:
+		return mt_state(num_slots)
+	fd = dev.fd
+	return MTState(
+		read_abs_value(fd, ABS_MT_SLOT),
+		read_mt_column(fd, ABS_MT_TRACKING_ID, num_slots),
+		read_mt_column(fd, ABS_MT_POSITION_X, num_slots),
+		read_mt_column(fd, ABS_MT_POSITION_Y, num_slots),
+		read_keys(fd),
+	)
+
+
+def replay_mt_state(records, num_slots):
+	# Device state after applying raw (sec, usec, type, code, value) records, as the kernel
+	# would report it after a drop.
+	slot = 0
+	ids = [-1] * num_slots
+	xs = [0] * num_slots
+	ys = [0] * num_slots
+	keys = set()
+	for _, _, etype, code, value in records:
+		if etype == EV_ABS:
+			if code == ABS_MT_SLOT:
+				slot = value
+			elif 0 <= slot < num_slots:
+				if code == ABS_MT_TRACKING_ID:
+					ids[slot] = value
+				elif code == ABS_MT_POSITION_X:
+					xs[slot] = value
+				elif code == ABS_MT_POSITION_Y:
+					ys[slot] = value
+		elif etype == EV_KEY:
+			if value:
+				keys.add(code)
+			else:
+				keys.discard(code)
+	return MTState(slot, ids, xs, ys, keys)
+
+
+class SyncStats:
+	__slots__ = ("drops", "resyncs", "failures", "last_us", "max_us", "total_us")
+
+	def __init__(self):
+		self.drops = 0
+		self.resyncs = 0
+		self.failures = 0
+		self.last_us = 0.0
+		self.max_us = 0.0
+		self.total_us = 0.0
+
+	def record(self, seconds):
+		us = seconds * 1e6
+		self.resyncs += 1
+		self.last_us = us
+		self.total_us += us
+		if us > self.max_us:
+			self.max_us = us
+
+	def as_dict(self):
+		return {
+			"drops": self.drops,
+			"resyncs": self.resyncs,
+			"failures": self.failures,
+			"last_resync_us": self.last_us,
+			"max_resync_us": self.max_us,
+			"mean_resync_us": self.total_us / self.resyncs if self.resyncs else 0.0,
+		}
+
+
+def resync(dev, num_slots, apply, stats):
+	# Query the device and hand the snapshot to `apply`; returns False if the query failed.
+	start = time.perf_counter()
+	try:
+		state = query_mt_state(dev, num_slots)
+	except OSError:
+		stats.failures += 1
+		return False
+	apply(state)
+	stats.record(time.perf_counter() - start)
+	return True
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+import fcntl
+import os
+import select
+import struct
+import time
+
+# Low-latency evdev reader.
+# Drains the device fd with one readv() into a preallocated buffer, decodes the struct
+# input_event records in bulk and hands out whole SYN_REPORT-delimited frames of raw
+# (sec, usec, type, code, value) tuples. epoll with a timeout lets the caller do periodic
+# work (config reloads, HUD publishing) while no touches arrive.
+
+EV_SYN = 0x00
+SYN_REPORT = 0
+SYN_DROPPED = 3
+
+# struct input_event as read from /dev/input/event* on this platform.
+INPUT_EVENT = struct.Struct("@llHHi")
+
+# Kernel event timestamps default to CLOCK_REALTIME; EVIOCSCLOCKID switches the client to
+# CLOCK_MONOTONIC so they compare directly with time.monotonic_ns().
+CLOCK_MONOTONIC = 1
+EVIOCSCLOCKID = (1 << 30) | (4 << 16) | (ord("E") << 8) | 0xA0
+
+# Yielded instead of a frame when the kernel reported SYN_DROPPED: the events up to and
+# including the next SYN_REPORT were discarded and the caller should resync from the device.
+DROPPED = object()
+
+
+class FrameReader:
+	def __init__(self, fd, batch=256):
+		self.fd = fd
+		self.buf = bytearray(INPUT_EVENT.size * batch)
+		self.bufs = (self.buf,)
+		self.view = memoryview(self.buf)
+		self.epoll = None
+		os.set_blocking(fd, False)
+		self.pending = []
+		self.dropping = False
+		self.reads = 0
+		self.events = 0
+
+	def close(self):
+		if self.epoll is not None:
+			self.epoll.close()
+			self.epoll = None
+
+	def read_frames(self):
+		# One non-blocking read. Returns the frames it completed (possibly none); a partial
+		# frame is kept until its SYN_REPORT arrives. Usable directly from an event loop reader.
+		try:
+			n = os.readv(self.fd, self.bufs)
+		except BlockingIOError:
+			return []
+		if not n:
+			raise OSError("input device closed")
+		self.reads += 1
+		self.events += n // INPUT_EVENT.size
+		out = []
+		pending = self.pending
+		dropping = self.dropping
+		for rec in INPUT_EVENT.iter_unpack(self.view[:n]):
+			if rec[2] == EV_SYN:
+				code = rec[3]
+				if code == SYN_REPORT:
+					if dropping:
+						dropping = False
+						out.append(DROPPED)
+						continue
+					pending.append(rec)
+					out.append(pending)
+					pending = []
+					continue
+				if code == SYN_DROPPED:
+					dropping = True
+					pending = []
+					continue
+			if not dropping:
+				pending.append(rec)
+		self.pending = pending
+		self.dropping = dropping
+		return out
+
+	def frames(self, timeout=None):
+		# Yields a list of records ending in SYN_REPORT, DROPPED, or None when `timeout`
+		# seconds pass without input. The epoll fd lives as long as the generator: it is closed
+		# when the generator ends, raises (device lost) or is dropped, e.g. on a hotplug rebind.
+		try:
+			if self.epoll is None:
+				self.epoll = select.epoll(1)
+				self.epoll.register(self.fd, select.EPOLLIN)
+			poll = self.epoll.poll
+			read_frames = self.read_frames
+			wait = -1 if timeout is None else timeout
+			while True:
+				if not poll(wait):
+					yield None
+					continue
+				yield from read_frames()
+		finally:
+			self.close()
+
+
+def use_monotonic_clock(fd):
+	# Returns True if the device now stamps events with CLOCK_MONOTONIC.
+	try:
+		fcntl.ioctl(fd, EVIOCSCLOCKID, struct.pack("i", CLOCK_MONOTONIC))
+	except OSError:
+		return False
+	return True
+
+
+class FrameClock:
+	# Engine time source. In "event" mode a frame's time is the kernel timestamp of its
+	# SYN_REPORT, so timers see when the touch happened rather than when Python got to it, and
+	# a replayed trace produces the same output at any speed. Frames without a timestamp
+	# (resyncs, device loss) reuse the last frame time. "monotonic" mode reads the clock instead.
+
+	__slots__ = ("event", "last")
+
+	def __init__(self, mode="event"):
+		if mode not in ("event", "monotonic"):
+			raise ValueError(f"unknown clock mode {mode!r}")
+		self.event = mode == "event"
+		self.last = 0.0
+
+	def frame_time(self, syn_record):
+		if self.event:
+			t = syn_record[0] + syn_record[1] * 1e-6
+			# Realtime event clocks can step backwards; the engine's timers must not.
+			if t < self.last:
+				t = self.last
+		else:
+			t = time.monotonic()
+		self.last = t
+		return t
+
+	def now(self):
+		if self.event:
+			return self.last
+		self.last = time.monotonic()
+		return self.last
+
+
+def frame_records(records):
+	# Same framing as FrameReader.frames() for an iterable of records (e.g. a replayed trace).
+	pending = []
+	dropping = False
+	for rec in records:
+		if rec[2] == EV_SYN:
+			code = rec[3]
+			if code == SYN_REPORT:
+				if dropping:
+					dropping = False
+					yield DROPPED
+					continue
+				pending.append(rec)
+				yield pending
+				pending = []
+				continue
+			if code == SYN_DROPPED:
+				dropping = True
+				pending = []
+				continue
+		if not dropping:
+			pending.append(rec)
+
+
+def open_frames(dev, timeout=None):
+	# Frame source for an InputDevice, or for a trace-backed device that provides its own.
+	frames = getattr(dev, "frames", None)
+	if frames is not None:
+		return frames(timeout)
+	return FrameReader(dev.fd).frames(timeout)
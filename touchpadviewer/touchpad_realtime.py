@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+import gc
+import os
+import sys
+import time
+
+# Opt-in real-time execution for the bridges (--realtime).
+# Each step is attempted independently: a real-time scheduling policy, CPU pinning, locking
+# memory, and moving the startup heap out of the collector's reach with gc.freeze(). Whatever
+# the system refuses is logged and skipped. The cyclic GC is then either switched off for the
+# loop or run by IdleGC, mostly in input gaps.
+
+MCL_CURRENT = 1
+MCL_FUTURE = 2
+
+
+def parse_cpus(text):
+	# "2", "2,3" or "2-3,6" -> {2, 3, 6}
+	cpus = set()
+	for part in text.split(","):
+		part = part.strip()
+		if not part:
+			continue
+		if "-" in part:
+			lo, hi = part.split("-", 1)
+			cpus.update(range(int(lo), int(hi) + 1))
+		else:
+			cpus.add(int(part))
+	if not cpus:
+		raise ValueError("empty CPU list")
+	return cpus
+
+
+def add_arguments(parser):
+	parser.add_argument(
+		"--realtime",
+		action="store_true",
+		help="SCHED_FIFO, CPU pinning, mlockall and GC control (each step is skipped if denied)",
+	)
+	parser.add_argument("--rt-priority", type=int, default=50, help="SCHED_FIFO priority for --realtime (1-99)")
+	parser.add_argument("--rt-cpus", type=parse_cpus, help="CPU list to pin to for --realtime, e.g. 3 or 2-3")
+	parser.add_argument(
+		"--rt-gc",
+		choices=("idle", "off"),
+		default="idle",
+		help="--realtime GC policy: collect only in input gaps, or not at all",
+	)
+
+
+def _log(step, ok, detail=""):
+	status = "ok" if ok else "denied"
+	print(f"realtime: {step}: {status}{' (' + detail + ')' if detail else ''}", file=sys.stderr)
+
+
+def set_fifo(priority):
+	try:
+		os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+	except (OSError, AttributeError, ValueError) as exc:
+		_log(f"SCHED_FIFO priority {priority}", False, str(exc))
+		return False
+	_log(f"SCHED_FIFO priority {priority}", True)
+	return True
+
+
+def pin_cpus(cpus):
+	try:
+		os.sched_setaffinity(0, cpus)
+	except (OSError, AttributeError, ValueError) as exc:
+		_log(f"CPU affinity {sorted(cpus)}", False, str(exc))
+		return False
+	_log(f"CPU affinity {sorted(cpus)}", True)
+	return True
+
+
+def lock_memory():
+	import ctypes
+
+	try:
+		libc = ctypes.CDLL(None, use_errno=True)
+		ok = libc.mlockall(MCL_CURRENT | MCL_FUTURE) == 0
+		err = ctypes.get_errno()
+	except (OSError, AttributeError) as exc:
+		_log("mlockall", False, str(exc))
+		return False
+	_log("mlockall", ok, "" if ok else os.strerror(err))
+	return ok
+
+
+class IdleGC:
+	# Cyclic GC only in input gaps: young generation when it passed its usual threshold, a full
+	# collection at most every full_interval seconds. Only the startup heap is frozen (once, in
+	# enter_realtime); objects the loop creates stay collectable.
+	# Input that never pauses would starve idle(), so frame() also collects the young generation
+	# every busy_frames frames once it is over the threshold. That bounds the young generation;
+	# the older ones and the full collection still wait for the next input gap.
+
+	__slots__ = ("threshold", "full_interval", "next_full", "busy_frames", "countdown", "collections")
+
+	def __init__(self, full_interval=30.0, busy_frames=1000):
+		self.threshold = gc.get_threshold()[0]
+		self.full_interval = full_interval
+		self.next_full = time.monotonic() + full_interval
+		self.busy_frames = busy_frames
+		self.countdown = busy_frames
+		self.collections = 0
+
+	def idle(self):
+		now = time.monotonic()
+		self.countdown = self.busy_frames
+		if now >= self.next_full:
+			self.next_full = now + self.full_interval
+			gc.collect()
+			self.collections += 1
+		elif gc.get_count()[0] >= self.threshold:
+			gc.collect(0)
+			self.collections += 1
+
+	def frame(self):
+		# Call once per input frame.
+		self.countdown -= 1
+		if self.countdown > 0:
+			return
+		self.countdown = self.busy_frames
+		if gc.get_count()[0] >= self.threshold:
+			gc.collect(0)
+			self.collections += 1
+
+
+def enter_realtime(priority=50, cpus=None, gc_mode="idle"):
+	# Call once setup is done, right before the input loop. Returns an IdleGC for gc_mode
+	# "idle" (call .idle() whenever the loop times out without input and .frame() after every
+	# input frame), else None.
+	if cpus:
+		pin_cpus(cpus)
+	lock_memory()
+	# Everything allocated during startup is long-lived: collect once, then freeze it so later
+	# collections only walk objects created by the loop.
+	gc.collect()
+	gc.freeze()
+	gc.disable()
+	_log(f"gc.freeze() + gc.disable(), {gc.get_freeze_count()} objects frozen, mode {gc_mode}", True)
+	# Last, so the setup above does not run at real-time priority.
+	set_fifo(priority)
+	return IdleGC() if gc_mode == "idle" else None
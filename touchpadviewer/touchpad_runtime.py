@@ -0,0 +1,799 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from array import array
+from evdev import InputDevice, UInput, UInputError, ecodes
+
+from touchpad_config import ConfigReloader, load_config, validate_config
+from touchpad_emit import FrameEmitter
+from touchpad_flight import add_arguments as add_flight_arguments
+from touchpad_discovery import DeviceWatcher, find_touchpad_device, identity_of
+from touchpad_joy_bridge import open_virtual_joystick
+from touchpad_joy_engine import OUTPUT_CODES, JoyBridgeEngine
+from touchpad_mt_sync import MTState, SyncStats, resync
+from touchpad_reader import DROPPED, FrameClock, FrameReader, frame_records, use_monotonic_clock
+from touchpad_stream import add_arguments as add_stream_arguments
+from touchpad_touch_engine import TouchscreenEngine
+
+# Single-process bridge runtime.
+# One asyncio loop serves any number of input devices: touchpads and gamepads feed one shared
+# virtual joystick, touchpads can also drive virtual touchscreens, and the HUD publisher and
+# config watcher run beside them. Input is processed synchronously in the fd reader callback;
+# anything that may block (JSON state file, config parsing) runs in a worker thread, and state
+# writes are skipped while the previous one is still in flight, so a slow sink never delays a frame.
+
+AXIS_MIN = -32768
+AXIS_MAX = 32767
+
+
+class JoystickMixer:
+	# Merges the outputs of several sources into one virtual joystick: per axis the value
+	# furthest from center wins, buttons are held while any source holds them. Inputs and the
+	# merged frame are preallocated array('i') rows, copied into and diffed in place.
+
+	__slots__ = ("emitter", "inputs", "merged", "is_axis")
+
+	def __init__(self, ui):
+		self.emitter = FrameEmitter(ui, OUTPUT_CODES)
+		self.inputs = []
+		self.merged = array("i", bytes(4 * len(OUTPUT_CODES)))
+		self.is_axis = tuple(etype == ecodes.EV_ABS for etype, _ in OUTPUT_CODES)
+
+	def add_input(self):
+		self.inputs.append(array("i", bytes(4 * len(OUTPUT_CODES))))
+		return len(self.inputs) - 1
+
+	def clear_input(self, index):
+		values = self.inputs[index]
+		for i in range(len(values)):
+			values[i] = 0
+		self.emit()
+
+	def update(self, index, values):
+		self.inputs[index][:] = values
+		self.emit()
+
+	def emit(self):
+		inputs = self.inputs
+		if len(inputs) == 1:
+			self.emitter.emit(inputs[0])
+			return
+		merged = self.merged
+		for i, axis in enumerate(self.is_axis):
+			best = 0
+			for values in inputs:
+				v = values[i]
+				if axis:
+					if abs(v) > abs(best):
+						best = v
+				elif v:
+					best = 1
+			merged[i] = best
+		self.emitter.emit(merged)
+
+
+class TouchpadJoySource:
+	# Touchpad -> joystick: the joy bridge engine, contributing to the mixer.
+
+	def __init__(self, dev, mixer, config, clock_mode="event"):
+		self.dev = dev
+		self.clock = FrameClock(clock_mode)
+		self.mixer = mixer
+		self.index = mixer.add_input()
+		abs_slot = dev.absinfo(ecodes.ABS_MT_SLOT)
+		self.engine = JoyBridgeEngine.from_absinfo(
+			dev.absinfo(ecodes.ABS_MT_POSITION_X), dev.absinfo(ecodes.ABS_MT_POSITION_Y), config, abs_slot
+		)
+		self.num_slots = abs_slot.max + 1
+		self.sync_stats = SyncStats()
+		self.frame = None
+		self.on_frame_done = None
+		self.stats = None
+		self.flight = None
+
+	def set_config(self, config):
+		self.engine.set_config(config)
+
+	def on_frame(self, records):
+		recv_ns = time.monotonic_ns() if self.stats is not None else 0
+		feed = self.engine.feed_values
+		for _, _, etype, code, value in records:
+			feed(etype, code, value)
+		if self.flight is not None:
+			self.flight.record_input(records)
+		self._publish(self.clock.frame_time(records[-1]), records, recv_ns)
+
+	def on_dropped(self):
+		self.sync_stats.drops += 1
+		if self.flight is not None:
+			self.flight.record_dropped()
+		if resync(self.dev, self.num_slots, self.engine.resync, self.sync_stats):
+			self.mixer.emitter.force_full()
+		self._publish()
+
+	def on_lost(self):
+		# Device gone: release everything it was holding.
+		self.engine.reset()
+		self._publish()
+
+	def rebind(self, dev):
+		self.dev = dev
+		self.engine.reset()
+		resync(dev, self.num_slots, self.engine.resync, self.sync_stats)
+		self.mixer.emitter.force_full()
+		self._publish()
+
+	def _publish(self, now=None, records=None, recv_ns=0):
+		if now is None:
+			now = self.clock.now()
+		self.frame = self.engine.on_syn(now)
+		values = self.frame.values()
+		stats = self.stats
+		if stats is None or not records:
+			self.mixer.update(self.index, values)
+		else:
+			engine_ns = time.monotonic_ns()
+			self.mixer.update(self.index, values)
+			stats.record_frame(records[-1], recv_ns, engine_ns, time.monotonic_ns(), len(records))
+		if self.flight is not None:
+			self.flight.record_output(values)
+		if self.on_frame_done is not None:
+			self.on_frame_done(self)
+
+
+class GamepadSource:
+	# Physical gamepad -> joystick: axes rescaled to the virtual range, buttons the virtual
+	# joystick also has are passed through.
+
+	def __init__(self, dev, mixer):
+		self.dev = dev
+		self.mixer = mixer
+		self.index = mixer.add_input()
+		self.values = array("i", bytes(4 * len(OUTPUT_CODES)))
+		self.slots = {}
+		self.ranges = {}
+		for i, (etype, code) in enumerate(OUTPUT_CODES):
+			self.slots[(etype, code)] = i
+			if etype == ecodes.EV_ABS:
+				try:
+					info = dev.absinfo(code)
+				except (OSError, KeyError):
+					continue
+				self.ranges[code] = (info.min, info.max)
+		self.sync_stats = SyncStats()
+		self.frame = None
+		self.on_frame_done = None
+		self.stats = None
+
+	def set_config(self, config):
+		pass
+
+	def on_frame(self, records):
+		slots = self.slots
+		values = self.values
+		ranges = self.ranges
+		for _, _, etype, code, value in records:
+			i = slots.get((etype, code))
+			if i is None:
+				continue
+			if etype == ecodes.EV_ABS:
+				lo_hi = ranges.get(code)
+				if lo_hi is not None and lo_hi[1] > lo_hi[0]:
+					lo, hi = lo_hi
+					v = max(lo, min(hi, value))
+					value = int((v - lo) * (AXIS_MAX - AXIS_MIN) / (hi - lo) + AXIS_MIN)
+			else:
+				value = 1 if value else 0
+			values[i] = value
+		self.mixer.update(self.index, values)
+
+	def on_dropped(self):
+		# No slot state to restore; keep the last values until the next report.
+		self.sync_stats.drops += 1
+
+	def on_lost(self):
+		for i in range(len(self.values)):
+			self.values[i] = 0
+		self.mixer.clear_input(self.index)
+
+	def rebind(self, dev):
+		self.dev = dev
+
+
+class TouchscreenSource:
+	# Touchpad -> virtual touchscreen, with its own output device.
+
+	def __init__(self, dev, ui, screen_w, screen_h):
+		self.dev = dev
+		self.ui = ui
+		self.engine = TouchscreenEngine.from_absinfo(
+			dev.absinfo(ecodes.ABS_MT_POSITION_X), dev.absinfo(ecodes.ABS_MT_POSITION_Y), screen_w, screen_h, ui
+		)
+		self.num_slots = dev.absinfo(ecodes.ABS_MT_SLOT).max + 1
+		self.sync_stats = SyncStats()
+		self.frame = None
+		self.on_frame_done = None
+		self.stats = None
+
+	def set_config(self, config):
+		pass
+
+	def on_frame(self, records):
+		feed = self.engine.feed_values
+		for _, _, etype, code, value in records:
+			feed(etype, code, value)
+
+	def on_dropped(self):
+		self.sync_stats.drops += 1
+		resync(self.dev, self.num_slots, self.engine.resync, self.sync_stats)
+
+	def on_lost(self):
+		# Lift every contact while the device is gone.
+		n = self.num_slots
+		self.engine.resync(MTState(0, [-1] * n, [0] * n, [0] * n, set()))
+
+	def rebind(self, dev):
+		self.dev = dev
+		resync(dev, self.num_slots, self.engine.resync, self.sync_stats)
+
+
+class HudPublisher:
+	# Publishes the most recent touchpad frame. Sources only set an event; the task picks up
+	# the latest frame when it runs, so bursts coalesce instead of queueing.
+
+	def __init__(self, shm_path=None, state_path=None, state_interval=0.02):
+		self.shm = None
+		self.shm_path = shm_path
+		self.state_path = state_path
+		self.state_interval = state_interval
+		self.wake = asyncio.Event()
+		self.source = None
+		self.published = 0
+		self.skipped = 0
+		self._writing = None
+		self._last_state_write = 0.0
+		if shm_path:
+			from touchpad_state_shm import ShmStateWriter
+
+			try:
+				self.shm = ShmStateWriter(shm_path)
+			except OSError as exc:
+				print(f"Warning: could not open shared state {shm_path} ({exc}).", file=sys.stderr)
+
+	def notify(self, source):
+		self.source = source
+		self.wake.set()
+
+	def close(self):
+		if self.shm is not None:
+			self.shm.close()
+			self.shm = None
+
+	async def run(self):
+		while True:
+			await self.wake.wait()
+			self.wake.clear()
+			frame = self.source.frame
+			if frame is None:
+				continue
+			if self.shm is not None:
+				self.shm.publish_frame(frame)
+			if self.state_path and frame.now - self._last_state_write > self.state_interval:
+				if self._writing is not None and not self._writing.done():
+					# Previous write still stuck in the filesystem; drop this one.
+					self.skipped += 1
+				else:
+					self._last_state_write = frame.now
+					payload = json.dumps({"left": {"active": frame.left_active, "x": frame.left_u, "y": frame.left_v}})
+					self._writing = asyncio.ensure_future(asyncio.to_thread(_write_state, self.state_path, payload))
+			self.published += 1
+
+def _frame_listeners(*listeners):
+	# One on_frame_done callback for whichever of the HUD and the stream are enabled.
+	listeners = [listener for listener in listeners if listener is not None]
+	if not listeners:
+		return None
+	if len(listeners) == 1:
+		return listeners[0]
+
+	def notify(source):
+		for listener in listeners:
+			listener(source)
+
+	return notify
+
+
+def _write_state(path, payload):
+	try:
+		with open(path, "w", encoding="ascii") as f:
+			f.write(payload)
+	except OSError:
+		pass
+
+
+class BridgeRuntime:
+	def __init__(self, config_path=None):
+		self.loop = None
+		self.sources = []
+		self.live = 0
+		self.readers = {}
+		self.tasks = []
+		self.devices = []
+		self.outputs = []
+		self.config_path = config_path
+		self.config = load_config(config_path)
+		self.reloader = None
+		self.stopping = None
+		self.stats = None
+		self.stats_export = None
+		self.flight_args = None
+		self.stream = None
+		self.control = None
+
+	def add_device(self, dev, source):
+		# Devices are grabbed for as long as the runtime owns them.
+		try:
+			dev.grab()
+		except OSError as exc:
+			print(f"Warning: could not grab {dev.path} ({exc}). Its events still reach the desktop.", file=sys.stderr)
+		self.devices.append(dev)
+		self.sources.append((dev, source))
+		self.live += 1
+		if self.stats is not None and isinstance(source, TouchpadJoySource):
+			source.stats = self.stats
+			if getattr(dev, "fd", None) is None:
+				self.stats.kernel_clock = False
+		if self.flight_args is not None and isinstance(source, TouchpadJoySource):
+			from touchpad_flight import from_args
+
+			source.flight = from_args(self.flight_args, dev, OUTPUT_CODES)
+		if self.stream is not None and isinstance(source, TouchpadJoySource):
+			self.stream.add_source(source)
+
+	def enable_flight_recorder(self, args):
+		# Call before add_device(): every touchpad -> joystick source gets its own recorder.
+		if args.flight_recorder > 0:
+			self.flight_args = args
+
+	def dump_flight(self, reason):
+		# Paths of the traces written, two per recorder.
+		paths = []
+		for _, source in self.sources:
+			flight = getattr(source, "flight", None)
+			if flight is not None:
+				paths.extend(flight.dump(reason) or ())
+		return paths
+
+	def enable_stream(self, host, port, keyframe_interval=60, origins=()):
+		# Call before add_device(): every touchpad -> joystick source is streamed as its own pad.
+		from touchpad_stream import TouchStream
+
+		self.stream = TouchStream(host, port, keyframe_interval, origins)
+
+	def enable_control(self, path):
+		# Control/state socket (see touchpad_control.py); the config file keeps working beside it.
+		from touchpad_control import ControlServer
+
+		dump = (lambda: self.dump_flight("control")) if self.flight_args is not None else None
+		self.control = ControlServer(path, self._push_config, self._control_stats, dump)
+
+	def enable_stats(self, spec, interval=1.0):
+		# Call before add_device(). Latency is tracked for the touchpad -> joystick path.
+		from touchpad_stats import BridgeStats, StatsExporter
+
+		self.stats = BridgeStats()
+		self.stats_export = StatsExporter(spec, self.stats, interval)
+
+	def add_output(self, ui):
+		self.outputs.append(ui)
+
+	async def run(self, hud=None):
+		self.loop = asyncio.get_running_loop()
+		self.stopping = asyncio.Event()
+		for sig in (signal.SIGINT, signal.SIGTERM):
+			try:
+				self.loop.add_signal_handler(sig, self.stopping.set)
+			except (NotImplementedError, RuntimeError):
+				pass
+		if self.flight_args is not None:
+			# Handlers run on the loop, between frames.
+			self.loop.add_signal_handler(signal.SIGUSR1, self.dump_flight, "sigusr1")
+			self.loop.set_exception_handler(self._on_loop_error)
+
+		for dev, source in self.sources:
+			if isinstance(source, TouchpadJoySource):
+				source.on_frame_done = _frame_listeners(
+					hud.notify if hud is not None else None,
+					self.stream.notify if self.stream is not None else None,
+					self.control.notify if self.control is not None else None,
+				)
+			if getattr(dev, "fd", None) is None:
+				self.tasks.append(asyncio.ensure_future(self._replay(dev, source)))
+			else:
+				self._watch(dev, source)
+		if hud is not None:
+			self.tasks.append(asyncio.ensure_future(hud.run()))
+		if self.stream is not None:
+			self.tasks.append(asyncio.ensure_future(self.stream.run()))
+		if self.stats_export is not None:
+			self.tasks.append(asyncio.ensure_future(self._export_stats()))
+		if self.control is not None:
+			try:
+				self.control.start(self.loop)
+			except OSError as exc:
+				print(f"Warning: no control socket at {self.control.path} ({exc}).", file=sys.stderr)
+				self.control = None
+		if self.config_path:
+			loop = self.loop
+			self.reloader = ConfigReloader(
+				self.config_path, self.config, notify=lambda: loop.call_soon_threadsafe(self._apply_config)
+			).start()
+
+		try:
+			await self.stopping.wait()
+		finally:
+			for fd in list(self.readers):
+				self._unwatch(fd)
+			for task in self.tasks:
+				task.cancel()
+			await asyncio.gather(*self.tasks, return_exceptions=True)
+			if self.reloader is not None:
+				self.reloader.stop()
+			if self.control is not None:
+				self.control.close()
+
+	def _on_loop_error(self, loop, context):
+		# An exception escaped a reader callback or task: keep the evidence, then report as usual.
+		if "exception" in context:
+			self.dump_flight("exception")
+		loop.default_exception_handler(context)
+
+	def _watch(self, dev, source):
+		# Frame times and latency stats want kernel timestamps on CLOCK_MONOTONIC.
+		if not use_monotonic_clock(dev.fd) and source.stats is not None:
+			# Kernel times are wall clock here; total latency falls back to receipt time.
+			source.stats.kernel_clock = False
+		reader = FrameReader(dev.fd)
+		self.readers[dev.fd] = reader
+		self.loop.add_reader(dev.fd, self._on_readable, dev, source, reader)
+
+	def _unwatch(self, fd):
+		reader = self.readers.pop(fd, None)
+		if reader is not None:
+			self.loop.remove_reader(fd)
+			reader.close()
+
+	def _on_readable(self, dev, source, reader):
+		try:
+			frames = reader.read_frames()
+		except OSError as exc:
+			print(f"{dev.path}: {exc}; waiting for it to come back", file=sys.stderr)
+			self._unwatch(dev.fd)
+			source.on_lost()
+			self.tasks.append(asyncio.ensure_future(self._rebind(dev, source)))
+			return
+		for frame in frames:
+			if frame is DROPPED:
+				source.on_dropped()
+			else:
+				source.on_frame(frame)
+
+	async def _replay(self, dev, source):
+		# Trace-backed devices have no fd; pace their frames on the loop clock instead.
+		speed = dev.speed
+		start = None
+		t0 = 0.0
+		for frame in frame_records(dev.records()):
+			if frame is DROPPED:
+				source.on_dropped()
+				continue
+			if speed > 0:
+				ts = frame[-1][0] + frame[-1][1] * 1e-6
+				if start is None:
+					start = time.monotonic()
+					t0 = ts
+				delay = (ts - t0) / speed - (time.monotonic() - start)
+				await asyncio.sleep(delay if delay > 0 else 0)
+			else:
+				await asyncio.sleep(0)
+			source.on_frame(frame)
+		self._device_gone(source)
+
+	async def _rebind(self, dev, source):
+		# Wait for the same physical device to reappear, then resume on the existing outputs.
+		lost_at = time.monotonic()
+		watcher = DeviceWatcher(identity_of(dev))
+		try:
+			dev.close()
+		except OSError:
+			pass
+		try:
+			while True:
+				new_dev = watcher.check()
+				if new_dev is not None:
+					break
+				if watcher.fd is None:
+					await asyncio.sleep(watcher.rescan_interval)
+					continue
+				ready = asyncio.Event()
+				self.loop.add_reader(watcher.fd, ready.set)
+				try:
+					await asyncio.wait_for(ready.wait(), watcher.rescan_interval)
+				except asyncio.TimeoutError:
+					pass
+				finally:
+					self.loop.remove_reader(watcher.fd)
+		finally:
+			watcher.close()
+		try:
+			new_dev.grab()
+		except OSError as exc:
+			print(f"Warning: could not grab {new_dev.path} ({exc}).", file=sys.stderr)
+		self.devices = [new_dev if d is dev else d for d in self.devices]
+		self.sources = [(new_dev if d is dev else d, s) for d, s in self.sources]
+		source.rebind(new_dev)
+		self._watch(new_dev, source)
+		print(
+			f"{new_dev.path}: rebound ({new_dev.name}) after {(time.monotonic() - lost_at) * 1000:.0f} ms",
+			file=sys.stderr,
+		)
+
+	def _device_gone(self, source):
+		# A replayed trace ran out.
+		source.on_lost()
+		self.live -= 1
+		if not self.live:
+			self.stopping.set()
+
+	def _apply_config(self):
+		# Runs on the loop, so it never lands in the middle of a frame.
+		config = self.reloader.take()
+		if config is not None:
+			self.config = config
+			for _, source in self.sources:
+				source.set_config(config)
+
+	def _push_config(self, data):
+		# Control socket config push: all or nothing, applied before the next frame. Unknown
+		# keys are ignored with a warning, as in the config file.
+		warnings = []
+		config, errors = validate_config(data, self.config, warnings=warnings)
+		for warning in warnings:
+			print(f"config push: {warning}", file=sys.stderr)
+		if errors:
+			return errors
+		self.config = config
+		if self.reloader is not None:
+			# File reloads are diffed against what is live now.
+			self.reloader.config = config
+		for _, source in self.sources:
+			source.set_config(config)
+		return []
+
+	def _control_stats(self):
+		out = {
+			"devices": [dev.path for dev in self.devices],
+			"live": self.live,
+			"config": self.config,
+			"config_reloads": self.reloader.reloads if self.reloader is not None else 0,
+			"sync": self.sync_stats(),
+		}
+		if self.stats is not None:
+			out["latency"] = self.stats.snapshot()
+		return out
+
+	async def _export_stats(self):
+		stats = self.stats
+		export = self.stats_export
+		interval = min(export.interval, 0.1)
+		while True:
+			await asyncio.sleep(interval)
+			stats.drops = sum(s.sync_stats.drops for _, s in self.sources)
+			stats.resyncs = sum(s.sync_stats.resyncs for _, s in self.sources)
+			stats.config_reloads = self.reloader.reloads if self.reloader is not None else 0
+			emitters = {s.mixer.emitter for _, s in self.sources if isinstance(s, TouchpadJoySource)}
+			stats.writes = sum(e.writes for e in emitters)
+			export.poll()
+
+	def sync_stats(self):
+		out = {}
+		for dev, source in self.sources:
+			if source.sync_stats.drops:
+				out[dev.path] = source.sync_stats.as_dict()
+		return out
+
+	def close(self):
+		for dev in self.devices:
+			try:
+				dev.ungrab()
+			except Exception:
+				pass
+			try:
+				dev.close()
+			except Exception:
+				pass
+		for ui in self.outputs:
+			ui.close()
+		if self.stats_export is not None:
+			self.stats_export.close()
+
+
+def open_input(spec, speed):
+	# A device path, a recorded trace file, or "auto" for the best-looking touchpad.
+	if spec == "auto":
+		dev = find_touchpad_device()
+		if dev is None:
+			raise OSError("no multitouch touchpad device found")
+		return dev
+	if os.path.isfile(spec):
+		from touchpad_trace import ReplayDevice
+
+		return ReplayDevice(spec, speed)
+	return InputDevice(spec)
+
+
+def parse_screen(text):
+	try:
+		w, h = [int(x) for x in text.lower().split("x")]
+	except ValueError:
+		raise argparse.ArgumentTypeError("expected WxH, e.g. 1920x1080")
+	return w, h
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Run several touchpad/gamepad bridges in one process")
+	parser.add_argument(
+		"--joy",
+		action="append",
+		default=[],
+		metavar="DEV",
+		help="touchpad feeding the virtual joystick: /dev/input/eventX, a trace file, or 'auto' (repeatable)",
+	)
+	parser.add_argument(
+		"--gamepad",
+		action="append",
+		default=[],
+		metavar="DEV",
+		help="gamepad merged into the virtual joystick (repeatable)",
+	)
+	parser.add_argument(
+		"--touchscreen",
+		action="append",
+		default=[],
+		metavar="DEV",
+		help="touchpad exposed as its own virtual touchscreen (repeatable)",
+	)
+	parser.add_argument("--screen", type=parse_screen, help="virtual touchscreen size WxH")
+	parser.add_argument("--config", help="path to JSON config file")
+	parser.add_argument("--state", help="path to write JSON state for HUD")
+	parser.add_argument(
+		"--state-shm",
+		nargs="?",
+		const="/dev/shm/touchpad_joy_state",
+		help="publish HUD state as a seqlocked binary record in this mmap'd file (default: %(const)s)",
+	)
+	parser.add_argument(
+		"--speed",
+		type=float,
+		default=1.0,
+		help="replay speed multiplier for trace inputs; 0 replays as fast as possible (default: 1.0)",
+	)
+	parser.add_argument(
+		"--sink",
+		choices=("uinput", "null", "memory"),
+		default="uinput",
+		help="output sink; null/memory stand in for the virtual devices",
+	)
+	parser.add_argument(
+		"--stats",
+		metavar="SPEC",
+		help="touchpad->joystick latency stats as JSON: unix:PATH socket or a periodically rewritten file",
+	)
+	parser.add_argument("--stats-interval", type=float, default=1.0, help="stats file dump interval in seconds")
+	parser.add_argument(
+		"--clock",
+		choices=("event", "monotonic"),
+		default="event",
+		help="engine time: kernel event timestamps (deterministic) or time.monotonic() at processing",
+	)
+	add_flight_arguments(parser)
+	add_stream_arguments(parser)
+	parser.add_argument(
+		"--control",
+		metavar="PATH",
+		help="SOCK_SEQPACKET Unix socket for config pushes, state subscriptions, heartbeats and stats",
+	)
+	args = parser.parse_args()
+
+	if not (args.joy or args.gamepad or args.touchscreen):
+		parser.error("nothing to do: pass --joy, --gamepad and/or --touchscreen")
+	if args.touchscreen and not args.screen:
+		from touchpad_uinput_bridge import read_screen_size
+
+		args.screen = read_screen_size()
+		if not args.screen:
+			parser.error("could not determine screen size; pass --screen WxH")
+
+	def _make_output(make_uinput):
+		if args.sink == "uinput":
+			return make_uinput()
+		from touchpad_trace import open_sink
+
+		return open_sink(args.sink, make_uinput)
+
+	runtime = BridgeRuntime(args.config)
+	hud = None
+	try:
+		if args.stats:
+			runtime.enable_stats(args.stats, args.stats_interval)
+		runtime.enable_flight_recorder(args)
+		if args.control:
+			runtime.enable_control(args.control)
+		if args.stream is not None:
+			runtime.enable_stream(args.stream_host, args.stream, args.stream_keyframe, args.stream_origin)
+		if args.joy or args.gamepad:
+			joy_ui = _make_output(open_virtual_joystick)
+			runtime.add_output(joy_ui)
+			mixer = JoystickMixer(joy_ui)
+			for spec in args.joy:
+				dev = open_input(spec, args.speed)
+				print(f"joy: {dev.path} ({dev.name})", file=sys.stderr)
+				runtime.add_device(dev, TouchpadJoySource(dev, mixer, runtime.config, args.clock))
+			for spec in args.gamepad:
+				dev = open_input(spec, args.speed)
+				print(f"gamepad: {dev.path} ({dev.name})", file=sys.stderr)
+				runtime.add_device(dev, GamepadSource(dev, mixer))
+			if args.joy and (args.state or args.state_shm):
+				hud = HudPublisher(args.state_shm, args.state)
+
+		if args.touchscreen:
+			from touchpad_uinput_bridge import touchscreen_capabilities
+
+			screen_w, screen_h = args.screen
+			for spec in args.touchscreen:
+				dev = open_input(spec, args.speed)
+				print(f"touchscreen: {dev.path} ({dev.name})", file=sys.stderr)
+				caps = touchscreen_capabilities(dev, screen_w, screen_h)
+				ui = _make_output(
+					lambda: UInput(caps, name="touchpad-virtual-touchscreen", bustype=dev.info.bustype)
+				)
+				runtime.add_output(ui)
+				runtime.add_device(dev, TouchscreenSource(dev, ui, screen_w, screen_h))
+	except (OSError, UInputError) as exc:
+		# Permission problems are diagnosed interactively by the single-device bridges.
+		print(f"Error: {exc}", file=sys.stderr)
+		runtime.close()
+		return 1
+
+	try:
+		asyncio.run(runtime.run(hud))
+	except Exception:
+		runtime.dump_flight("exception")
+		raise
+	finally:
+		runtime.close()
+		if hud is not None:
+			hud.close()
+			if hud.skipped:
+				print(f"hud: {hud.skipped} state writes skipped (sink busy)", file=sys.stderr)
+		if runtime.stream is not None:
+			print(runtime.stream.describe(), file=sys.stderr)
+		if args.sink != "uinput":
+			from touchpad_trace import describe_sink
+
+			for ui in runtime.outputs:
+				print(describe_sink(ui), file=sys.stderr)
+		stats = runtime.sync_stats()
+		if stats:
+			print(f"sync: {stats}", file=sys.stderr)
+
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+# Fixed-layout bridge -> HUD state record shared through an mmap'd file (normally under /dev/shm).
+# The writer bumps the sequence to an odd value, fills the payload, then stores the new even
+# sequence at the tail and the head. Readers only accept a record whose head and tail sequence
+# match and are even (seqlock), so a half-written record is never used.
+#
+# Layout (little endian, 72 bytes):
+#   0  u32 magic "TPSH"      4  u16 version       6  u16 record size
+#   8  u64 seq (head)
+#   16 f64 timestamp (seconds, bridge clock)
+#   24 i32 gear              28 u32 flags (FLAG_*)
+#   32 f32 throttle          36 f32 steer
+#   40 f32 left x, y         48 f32 right1 x, y     56 f32 right2 x, y
+#   64 u64 seq (tail)
+
+DEFAULT_PATH = "/dev/shm/touchpad_joy_state"
+
+MAGIC = 0x48535054
+VERSION = 1
+
+FLAG_LEFT = 1
+FLAG_RIGHT1 = 2
+FLAG_RIGHT2 = 4
+FLAG_BRAKE = 8
+
+_HEADER = struct.Struct("<IHH")
+_SEQ = struct.Struct("<Q")
+_PAYLOAD = struct.Struct("<diIff6fQ")
+
+SEQ_OFFSET = 8
+PAYLOAD_OFFSET = 16
+TAIL_OFFSET = 64
+RECORD_SIZE = PAYLOAD_OFFSET + _PAYLOAD.size
+
+def frame_flags(frame):
+	# FLAG_* bits for a joy engine OutputFrame.
+	flags = 0
+	if frame.left_active:
+		flags |= FLAG_LEFT
+	if frame.right_count > 0:
+		flags |= FLAG_RIGHT1
+	if frame.right_count > 1:
+		flags |= FLAG_RIGHT2
+	if frame.brake:
+		flags |= FLAG_BRAKE
+	return flags
+
+
+HudState = namedtuple(
+	"HudState",
+	"seq timestamp gear flags throttle steer left_x left_y right1_x right1_y right2_x right2_y",
+)
+
+
+class ShmStateWriter:
+	def __init__(self, path=DEFAULT_PATH):
+		self.path = path
+		# Reuse an existing file instead of recreating it so readers holding it open keep working.
+		fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+		try:
+			if os.fstat(fd).st_size != RECORD_SIZE:
+				os.ftruncate(fd, RECORD_SIZE)
+			self._map = mmap.mmap(fd, RECORD_SIZE, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+		finally:
+			os.close(fd)
+		seq = 0
+		if _HEADER.unpack_from(self._map, 0)[0] == MAGIC:
+			# Continue the previous sequence so a restarted bridge never looks older.
+			seq = _SEQ.unpack_from(self._map, SEQ_OFFSET)[0] & ~1
+		self._seq = seq
+		_SEQ.pack_into(self._map, SEQ_OFFSET, seq + 1)
+		_HEADER.pack_into(self._map, 0, MAGIC, VERSION, RECORD_SIZE)
+		_SEQ.pack_into(self._map, SEQ_OFFSET, seq)
+
+	def publish(
+		self,
+		timestamp,
+		gear,
+		flags,
+		throttle,
+		steer,
+		left_x=0.0,
+		left_y=0.0,
+		right1_x=0.0,
+		right1_y=0.0,
+		right2_x=0.0,
+		right2_y=0.0,
+	):
+		m = self._map
+		seq = self._seq + 2
+		_SEQ.pack_into(m, SEQ_OFFSET, seq - 1)
+		_PAYLOAD.pack_into(
+			m,
+			PAYLOAD_OFFSET,
+			timestamp,
+			gear,
+			flags,
+			throttle,
+			steer,
+			left_x,
+			left_y,
+			right1_x,
+			right1_y,
+			right2_x,
+			right2_y,
+			seq,
+		)
+		_SEQ.pack_into(m, SEQ_OFFSET, seq)
+		self._seq = seq
+
+	def publish_frame(self, frame):
+		# publish() straight from a joy engine OutputFrame, packed in place without an argument list.
+		m = self._map
+		seq = self._seq + 2
+		right_uv = frame.right_uv
+		_SEQ.pack_into(m, SEQ_OFFSET, seq - 1)
+		_PAYLOAD.pack_into(
+			m,
+			PAYLOAD_OFFSET,
+			frame.now,
+			frame.gear,
+			frame_flags(frame),
+			frame.throttle,
+			frame.steer / 32767.0,
+			frame.left_u,
+			frame.left_v,
+			right_uv[0],
+			right_uv[1],
+			right_uv[2],
+			right_uv[3],
+			seq,
+		)
+		_SEQ.pack_into(m, SEQ_OFFSET, seq)
+		self._seq = seq
+
+	def close(self):
+		if self._map is not None:
+			self._map.close()
+			self._map = None
+
+
+class ShmStateReader:
+	def __init__(self, path=DEFAULT_PATH):
+		self.path = path
+		fd = os.open(path, os.O_RDONLY)
+		try:
+			self._map = mmap.mmap(fd, RECORD_SIZE, mmap.MAP_SHARED, mmap.PROT_READ)
+		finally:
+			os.close(fd)
+		magic, version, size = _HEADER.unpack_from(self._map, 0)
+		if magic != MAGIC or version != VERSION or size != RECORD_SIZE:
+			self._map.close()
+			raise ValueError(f"{path} is not a touchpad state record")
+		self.last_seq = 0
+
+	def read(self, retries=64):
+		# Returns the latest consistent HudState, or None if the writer kept it busy.
+		m = self._map
+		for _ in range(retries):
+			seq = _SEQ.unpack_from(m, SEQ_OFFSET)[0]
+			if seq & 1:
+				continue
+			values = _PAYLOAD.unpack_from(m, PAYLOAD_OFFSET)
+			if values[-1] != seq or _SEQ.unpack_from(m, SEQ_OFFSET)[0] != seq:
+				continue
+			self.last_seq = seq
+			return HudState(seq, *values[:-1])
+		return None
+
+	def changed(self):
+		seq = _SEQ.unpack_from(self._map, SEQ_OFFSET)[0]
+		return seq != self.last_seq and not seq & 1
+
+	def close(self):
+		if self._map is not None:
+			self._map.close()
+			self._map = None
+
+
+def main():
+	import argparse
+	import time
+
+	parser = argparse.ArgumentParser(description="Print the bridge HUD state from shared memory")
+	parser.add_argument("path", nargs="?", default=DEFAULT_PATH)
+	parser.add_argument("--interval", type=float, default=0.1, help="seconds between reads")
+	args = parser.parse_args()
+
+	reader = ShmStateReader(args.path)
+	try:
+		while True:
+			state = reader.read()
+			if state is not None:
+				print("\r" + " ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in state._asdict().items()), end="", flush=True)
+			time.sleep(args.interval)
+	except KeyboardInterrupt:
+		pass
+	finally:
+		reader.close()
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import socket
+import time
+from array import array
+
+# End-to-end latency accounting for the bridges.
+# Each frame is timestamped at four points: the kernel's event time (the SYN_REPORT record),
+# receipt by the reader, after the engine, and after the output write. Stage latencies go into
+# log-linear (HDR-style) histograms over a rolling window. Snapshots are served as JSON on a Unix
+# socket or dumped to a file. Without --stats none of this exists and the loops skip it.
+
+STAGES = ("input", "engine", "output", "total")
+PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+
+class LatencyHistogram:
+	# Nanosecond values in buckets of 2**SUB_BITS linear steps per power of two (~3% error),
+	# covering 0 ns .. ~4.6 minutes in a few thousand counters.
+
+	SUB_BITS = 5
+	SUB = 1 << SUB_BITS
+	MAX_BITS = 38
+
+	__slots__ = ("counts", "total", "max")
+
+	def __init__(self):
+		self.counts = array("Q", bytes(8 * (self.MAX_BITS - self.SUB_BITS + 1) * self.SUB))
+		self.total = 0
+		self.max = 0
+
+	@classmethod
+	def index(cls, value):
+		if value < 2 * cls.SUB:
+			return value if value > 0 else 0
+		shift = value.bit_length() - cls.SUB_BITS - 1
+		return (shift + 1) * cls.SUB + (value >> shift) - cls.SUB
+
+	@classmethod
+	def bucket_high(cls, idx):
+		# Largest value that lands in bucket idx.
+		if idx < 2 * cls.SUB:
+			return idx
+		shift = idx // cls.SUB - 1
+		mantissa = cls.SUB + idx % cls.SUB
+		return ((mantissa + 1) << shift) - 1
+
+	def record(self, value):
+		idx = self.index(value)
+		counts = self.counts
+		if idx >= len(counts):
+			idx = len(counts) - 1
+		counts[idx] += 1
+		self.total += 1
+		if value > self.max:
+			self.max = value
+
+	def reset(self):
+		counts = self.counts
+		for i in range(len(counts)):
+			counts[i] = 0
+		self.total = 0
+		self.max = 0
+
+	def merged(self, other):
+		out = LatencyHistogram()
+		out.counts = array("Q", (a + b for a, b in zip(self.counts, other.counts)))
+		out.total = self.total + other.total
+		out.max = max(self.max, other.max)
+		return out
+
+	def percentile(self, q):
+		if not self.total:
+			return 0
+		rank = max(1, int(round(q / 100.0 * self.total)))
+		seen = 0
+		for idx, count in enumerate(self.counts):
+			if count:
+				seen += count
+				if seen >= rank:
+					return min(self.bucket_high(idx), self.max)
+		return self.max
+
+	def summary(self):
+		out = {"count": self.total, "max_us": self.max / 1000.0}
+		for q in PERCENTILES:
+			out[f"p{q:g}_us"] = self.percentile(q) / 1000.0
+		return out
+
+
+class BridgeStats:
+	# Per-frame timestamps in time.monotonic_ns(). kernel_offset_ns converts the kernel's event
+	# time to that clock: 0 when the device reports CLOCK_MONOTONIC, else the realtime offset.
+	# Without a usable kernel clock (replayed traces) the input stage is left out.
+
+	__slots__ = (
+		"window_ns",
+		"window_start",
+		"current",
+		"previous",
+		"kernel_clock",
+		"kernel_offset_ns",
+		"frames",
+		"events",
+		"drops",
+		"resyncs",
+		"config_reloads",
+		"writes",
+		"started",
+	)
+
+	def __init__(self, window=10.0, kernel_clock=True, kernel_offset_ns=0):
+		self.window_ns = int(window * 1e9)
+		self.window_start = time.monotonic_ns()
+		self.current = {stage: LatencyHistogram() for stage in STAGES}
+		self.previous = {stage: LatencyHistogram() for stage in STAGES}
+		self.kernel_clock = kernel_clock
+		self.kernel_offset_ns = kernel_offset_ns
+		self.frames = 0
+		self.events = 0
+		self.drops = 0
+		self.resyncs = 0
+		self.config_reloads = 0
+		self.writes = 0
+		self.started = time.time()
+
+	def record_frame(self, syn_record, recv_ns, engine_ns, write_ns, events):
+		current = self.current
+		if self.kernel_clock:
+			kernel_ns = syn_record[0] * 1000000000 + syn_record[1] * 1000 + self.kernel_offset_ns
+			current["input"].record(max(0, recv_ns - kernel_ns))
+			current["total"].record(max(0, write_ns - kernel_ns))
+		else:
+			current["total"].record(write_ns - recv_ns)
+		current["engine"].record(engine_ns - recv_ns)
+		current["output"].record(write_ns - engine_ns)
+		self.frames += 1
+		self.events += events
+		if write_ns - self.window_start > self.window_ns:
+			self.rotate(write_ns)
+
+	def rotate(self, now_ns):
+		# The window always covers the last one to two window lengths.
+		self.current, self.previous = self.previous, self.current
+		for hist in self.current.values():
+			hist.reset()
+		self.window_start = now_ns
+
+	def snapshot(self):
+		return {
+			"time": time.time(),
+			"uptime_s": time.time() - self.started,
+			"frames": self.frames,
+			"events": self.events,
+			"events_per_frame": self.events / self.frames if self.frames else 0.0,
+			"dropped": self.drops,
+			"resyncs": self.resyncs,
+			"config_reloads": self.config_reloads,
+			"writes": self.writes,
+			"window_s": self.window_ns / 1e9,
+			"kernel_clock": self.kernel_clock,
+			"latency": {
+				stage: self.current[stage].merged(self.previous[stage]).summary()
+				for stage in STAGES
+				if self.kernel_clock or stage != "input"
+			},
+		}
+
+
+def kernel_clock_offset(monotonic):
+	# Offset from the device's event clock to time.monotonic_ns().
+	if monotonic:
+		return 0
+	return time.monotonic_ns() - time.time_ns()
+
+
+class StatsExporter:
+	# "unix:PATH" serves one JSON snapshot per connection; any other spec is a file rewritten
+	# every `interval` seconds. poll() is cheap and meant for the bridge's periodic section.
+
+	def __init__(self, spec, stats, interval=1.0):
+		self.stats = stats
+		self.interval = interval
+		self.sock = None
+		self.path = None
+		self.next_dump = 0.0
+		if spec.startswith("unix:"):
+			path = spec[5:]
+			try:
+				os.unlink(path)
+			except FileNotFoundError:
+				pass
+			self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+			self.sock.bind(path)
+			self.sock.listen(4)
+			self.sock.setblocking(False)
+			self.path = path
+		else:
+			self.path = spec
+
+	def fileno(self):
+		return self.sock.fileno() if self.sock is not None else -1
+
+	def poll(self, now=None):
+		if self.sock is not None:
+			self.serve_pending()
+			return
+		if now is None:
+			now = time.monotonic()
+		if now >= self.next_dump:
+			self.next_dump = now + self.interval
+			self.dump()
+
+	def serve_pending(self):
+		while True:
+			try:
+				conn, _ = self.sock.accept()
+			except (BlockingIOError, InterruptedError):
+				return
+			try:
+				conn.settimeout(0.05)
+				conn.sendall(json.dumps(self.stats.snapshot()).encode("ascii") + b"\n")
+			except OSError:
+				pass
+			finally:
+				conn.close()
+
+	def dump(self):
+		tmp = self.path + ".tmp"
+		try:
+			with open(tmp, "w", encoding="ascii") as f:
+				json.dump(self.stats.snapshot(), f)
+			os.replace(tmp, self.path)
+		except OSError:
+			pass
+
+	def close(self):
+		if self.sock is not None:
+			self.sock.close()
+			self.sock = None
+			try:
+				os.unlink(self.path)
+			except OSError:
+				pass
+		elif self.path:
+			self.dump()
+
+
+def query(path):
+	with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+		sock.settimeout(1.0)
+		sock.connect(path)
+		data = b""
+		while True:
+			chunk = sock.recv(65536)
+			if not chunk:
+				break
+			data += chunk
+	return json.loads(data)
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Print bridge latency stats")
+	parser.add_argument("spec", help="unix:PATH of a running bridge, or a stats dump file")
+	args = parser.parse_args()
+	if args.spec.startswith("unix:"):
+		snap = query(args.spec[5:])
+	else:
+		with open(args.spec, "r", encoding="ascii") as f:
+			snap = json.load(f)
+	print(
+		f"frames {snap['frames']}  events/frame {snap['events_per_frame']:.1f}  dropped {snap['dropped']}  "
+		f"config reloads {snap['config_reloads']}  writes {snap['writes']}"
+	)
+	for stage, s in snap["latency"].items():
+		print(
+			f"{stage:7s} n={s['count']:<8d} p50 {s['p50_us']:8.1f} us  p99 {s['p99_us']:8.1f} us  "
+			f"p99.9 {s['p99.9_us']:8.1f} us  max {s['max_us']:8.1f} us"
+		)
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+import asyncio
+import json
+import socket
+import struct
+import sys
+
+from touchpad_layout import ROLES, resolve_layout
+
+# Live slot state for browser dashboards over WebSocket (RFC 6455, binary messages).
+# Sources only mark their pad dirty, like the HUD publisher; the stream task snapshots each dirty
+# pad once and hands the snapshot to every client. A client holds at most one unsent snapshot per
+# pad: a newer one replaces it, so a slow browser sees fewer frames instead of older ones, and the
+# small socket send buffer keeps the kernel from queueing seconds of history either.
+#
+# Messages (little-endian). The first message is a JSON text "hello" with the pad geometry and
+# the zones of each pad's current layout (side, normalized rect [u0, v0, u1, v1]).
+#   header  <BBHId  kind (1 keyframe, 2 delta), pad, entry count, input frame number, frame time
+#   entries          slot, op, ...
+#     FULL  <BBHii   slot, OP_FULL | side << 4, tracking id & 0xffff, x, y   (side: layout zone)
+#     MOVE  <BBhh    slot, OP_MOVE, dx, dy        (same contact, moved by less than 32768)
+#     UP    <BB      slot, OP_UP                  (contact ended)
+# A keyframe lists every placed slot and replaces the client's state for that pad; deltas are
+# relative to the last message sent to that client for the pad (not the last input frame).
+# Keyframes go out on the first message after every N input frames, so clients that keep up
+# receive identical messages and each one is encoded once for all of them.
+#
+# Socket buffers alone still let a stalled browser fall behind by whatever its receive buffer
+# holds, so clients may also send a text message "ack N" (N = binary messages handled so far).
+# From its first ack on, a client never has more than WINDOW unacknowledged messages in flight;
+# acking once per animation frame lets the page's render rate pace its stream.
+
+GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+KIND_KEYFRAME = 1
+KIND_DELTA = 2
+OP_FULL = 0
+OP_MOVE = 1
+OP_UP = 2
+
+HEADER = struct.Struct("<BBHId")
+FULL = struct.Struct("<BBHii")
+MOVE = struct.Struct("<BBhh")
+UP = struct.Struct("<BB")
+
+# Small send buffers: a stalled client should miss frames, not queue them.
+SEND_BUFFER = 16384
+WRITE_HIGH_WATER = 8192
+WINDOW = 8
+MAX_CLIENT_MESSAGE = 65536
+HANDSHAKE_TIMEOUT = 5.0
+
+LOCAL_ORIGINS = ("null", "file://", "http://localhost", "http://127.0.0.1", "http://[::1]")
+
+
+def accept_key(key):
+	# Imported here: the runtime loads this module at startup just for add_arguments().
+	import base64
+	import hashlib
+
+	return base64.b64encode(hashlib.sha1(key.encode("ascii") + GUID).digest()).decode("ascii")
+
+
+def origin_allowed(origin, allowed):
+	# Browsers send the page's origin; "null" for file:// pages. Ports are fine, other hosts are not.
+	for prefix in allowed:
+		if origin == prefix or (origin.startswith(prefix) and origin[len(prefix)] in ":/"):
+			return True
+	return False
+
+
+def ws_frame(opcode, payload):
+	# Unmasked server frame with FIN set.
+	n = len(payload)
+	if n < 126:
+		head = struct.pack("!BB", 0x80 | opcode, n)
+	elif n < 65536:
+		head = struct.pack("!BBH", 0x80 | opcode, 126, n)
+	else:
+		head = struct.pack("!BBQ", 0x80 | opcode, 127, n)
+	return head + payload
+
+
+def encode_frame(pad, seq, now, slots, last, keyframe):
+	# slots: placed_slots() snapshot; last: {slot: (id, x, y, side)} as of the previous message,
+	# updated in place. Returns the payload, or None for a delta with nothing in it.
+	parts = []
+	if keyframe:
+		last.clear()
+	seen = set()
+	for slot, tid, x, y, side in slots:
+		seen.add(slot)
+		prev = last.get(slot)
+		if prev is not None and prev[0] == tid and prev[3] == side:
+			dx = x - prev[1]
+			dy = y - prev[2]
+			if dx == 0 and dy == 0:
+				continue
+			if -32768 <= dx < 32768 and -32768 <= dy < 32768:
+				parts.append(MOVE.pack(slot, OP_MOVE, dx, dy))
+				last[slot] = (tid, x, y, side)
+				continue
+		parts.append(FULL.pack(slot, OP_FULL | (side << 4), tid & 0xFFFF, x, y))
+		last[slot] = (tid, x, y, side)
+	for slot in [s for s in last if s not in seen]:
+		del last[slot]
+		parts.append(UP.pack(slot, OP_UP))
+	if not parts and not keyframe:
+		return None
+	return HEADER.pack(KIND_KEYFRAME if keyframe else KIND_DELTA, pad, len(parts), seq & 0xFFFFFFFF, now) + b"".join(
+		parts
+	)
+
+
+class StreamClient:
+	__slots__ = ("writer", "peer", "wake", "pending", "last", "epoch", "messages", "acked", "dropped", "task")
+
+	def __init__(self, writer, peer):
+		self.writer = writer
+		self.peer = peer
+		self.wake = asyncio.Event()
+		self.pending = {}
+		self.last = {}
+		self.epoch = {}
+		self.messages = 0
+		self.acked = None
+		self.dropped = 0
+		self.task = None
+
+	def offer(self, pad, snapshot):
+		if pad in self.pending:
+			self.dropped += 1
+		self.pending[pad] = snapshot
+		self.wake.set()
+
+	def ack(self, count):
+		self.acked = count
+		if self.pending:
+			self.wake.set()
+
+	def window_full(self):
+		return self.acked is not None and self.messages - self.acked >= WINDOW
+
+
+class TouchStream:
+	def __init__(self, host="127.0.0.1", port=8765, keyframe_interval=60, origins=()):
+		self.host = host
+		self.port = port
+		self.keyframe_interval = max(1, keyframe_interval)
+		self.origins = LOCAL_ORIGINS + tuple(origins)
+		self.sources = []
+		self.pads = []
+		self.frames = []
+		self.dirty = set()
+		self.wake = asyncio.Event()
+		self.clients = set()
+		self.encoded = {}
+		self.server = None
+		self.served = 0
+		self.dropped = 0
+
+	def add_source(self, source):
+		# Touchpad -> joystick source; returns its pad index in the stream.
+		engine = source.engine
+		self.pads.append(
+			{
+				"name": getattr(source.dev, "name", ""),
+				"x_min": engine.x_min,
+				"x_max": engine.x_max,
+				"y_min": engine.y_min,
+				"y_max": engine.y_max,
+				"slots": engine.num_slots,
+			}
+		)
+		self.sources.append(source)
+		self.frames.append(0)
+		source.stream_pad = len(self.pads) - 1
+		return source.stream_pad
+
+	def notify(self, source):
+		# Input path: constant time, no allocation, nothing sent from here.
+		pad = source.stream_pad
+		self.frames[pad] += 1
+		self.dirty.add(pad)
+		self.wake.set()
+
+	def hello(self):
+		# Built per connection: a config reload may have switched the layout since the last one.
+		pads = []
+		for pad, source in zip(self.pads, self.sources):
+			zones = [
+				{"side": ROLES[zone["role"]], "rect": list(zone["rect"])}
+				for zone in resolve_layout(source.engine.config)["zones"]
+			]
+			pads.append(dict(pad, zones=zones))
+		return json.dumps(
+			{
+				"type": "hello",
+				"pads": pads,
+				"keyframe_interval": self.keyframe_interval,
+				"format": "header <BBHId, FULL <BBHii, MOVE <BBhh, UP <BB",
+			}
+		).encode("utf-8")
+
+	async def run(self):
+		self.server = await asyncio.start_server(self._serve, self.host, self.port)
+		print(f"stream: ws://{self.host}:{self.port}/", file=sys.stderr)
+		try:
+			while True:
+				await self.wake.wait()
+				self.wake.clear()
+				dirty = self.dirty
+				self.dirty = set()
+				if not self.clients:
+					continue
+				for pad in dirty:
+					source = self.sources[pad]
+					frame = source.frame
+					snapshot = (self.frames[pad], frame.now if frame is not None else 0.0, source.engine.placed_slots())
+					for client in self.clients:
+						client.offer(pad, snapshot)
+		finally:
+			self.server.close()
+			for client in list(self.clients):
+				client.writer.close()
+
+	async def _serve(self, reader, writer):
+		peer = writer.get_extra_info("peername")
+		sock = writer.get_extra_info("socket")
+		try:
+			ok = await asyncio.wait_for(self._handshake(reader, writer), HANDSHAKE_TIMEOUT)
+		except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, OSError, ValueError):
+			ok = False
+		if not ok:
+			writer.close()
+			return
+		if sock is not None:
+			try:
+				sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER)
+				sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+			except OSError:
+				pass
+		writer.transport.set_write_buffer_limits(high=WRITE_HIGH_WATER)
+		writer.write(ws_frame(0x1, self.hello()))
+
+		client = StreamClient(writer, peer)
+		client.task = asyncio.ensure_future(self._send(client))
+		self.clients.add(client)
+		self.served += 1
+		try:
+			await self._receive(reader, writer, client)
+		except (asyncio.IncompleteReadError, ConnectionError, OSError, ValueError):
+			pass
+		finally:
+			self.clients.discard(client)
+			self.dropped += client.dropped
+			client.task.cancel()
+			writer.close()
+
+	async def _handshake(self, reader, writer):
+		request = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+		lines = request.split("\r\n")
+		headers = {}
+		for line in lines[1:]:
+			name, sep, value = line.partition(":")
+			if sep:
+				headers[name.strip().lower()] = value.strip()
+		key = headers.get("sec-websocket-key")
+		origin = headers.get("origin")
+		if not lines[0].startswith("GET ") or headers.get("upgrade", "").lower() != "websocket" or not key:
+			writer.write(b"HTTP/1.1 426 Upgrade Required\r\nUpgrade: websocket\r\nContent-Length: 0\r\n\r\n")
+			return False
+		if origin is not None and not origin_allowed(origin, self.origins):
+			writer.write(b"HTTP/1.1 403 Forbidden\r\nContent-Length: 0\r\n\r\n")
+			return False
+		writer.write(
+			(
+				"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+				f"Sec-WebSocket-Accept: {accept_key(key)}\r\n\r\n"
+			).encode("ascii")
+		)
+		return True
+
+	async def _receive(self, reader, writer, client):
+		# Clients send acks and control frames; other data messages are ignored.
+		while True:
+			head = await reader.readexactly(2)
+			opcode = head[0] & 0x0F
+			n = head[1] & 0x7F
+			if n == 126:
+				n = struct.unpack("!H", await reader.readexactly(2))[0]
+			elif n == 127:
+				n = struct.unpack("!Q", await reader.readexactly(8))[0]
+			if n > MAX_CLIENT_MESSAGE:
+				raise ValueError("client message too large")
+			mask = await reader.readexactly(4) if head[1] & 0x80 else b"\0\0\0\0"
+			data = bytes(b ^ mask[i & 3] for i, b in enumerate(await reader.readexactly(n)))
+			if opcode == 0x8:
+				writer.write(ws_frame(0x8, data[:2]))
+				return
+			if opcode == 0x9:
+				writer.write(ws_frame(0xA, data))
+			elif opcode == 0x1 and data.startswith(b"ack "):
+				client.ack(int(data[4:]))
+
+	async def _send(self, client):
+		writer = client.writer
+		interval = self.keyframe_interval
+		try:
+			while True:
+				await client.wake.wait()
+				client.wake.clear()
+				pending = client.pending
+				for pad in list(pending):
+					if client.window_full():
+						# Left pending; the next ack wakes us, newer frames replace it meanwhile.
+						break
+					seq, now, slots = pending.pop(pad)
+					last = client.last.get(pad)
+					epoch = seq // interval
+					keyframe = last is None or client.epoch[pad] != epoch
+					if keyframe:
+						client.epoch[pad] = epoch
+					message, client.last[pad] = self._encode(pad, seq, now, slots, last, keyframe)
+					if message is None:
+						continue
+					client.messages += 1
+					writer.write(message)
+				# While this waits, newer snapshots replace pending ones instead of queueing.
+				await writer.drain()
+		except (ConnectionError, OSError):
+			writer.close()
+
+	def _encode(self, pad, seq, now, slots, last, keyframe):
+		# (WebSocket message or None, slot state after it). Clients in step share their `last`
+		# dict, so the previous result is reused; a shared dict is never modified, only replaced.
+		key = (seq, keyframe, None if keyframe else id(last))
+		cached = self.encoded.get(pad)
+		if cached is not None and cached[0] == key:
+			return cached[1], cached[2]
+		state = {} if keyframe else dict(last)
+		payload = encode_frame(pad, seq, now, slots, state, keyframe)
+		if payload is None:
+			message, state = None, last
+		else:
+			message = ws_frame(0x2, payload)
+		# Holding `last` keeps its id from being reused while it is part of the key.
+		self.encoded[pad] = (key, message, state, last)
+		return message, state
+
+	def describe(self):
+		dropped = self.dropped + sum(c.dropped for c in self.clients)
+		return f"stream: {self.served} clients served, {len(self.clients)} connected, {dropped} stale frames dropped"
+
+
+def add_arguments(parser):
+	parser.add_argument(
+		"--stream",
+		nargs="?",
+		const=8765,
+		type=int,
+		metavar="PORT",
+		help="stream touchpad slot state to browsers over WebSocket on this port (default: %(const)s)",
+	)
+	parser.add_argument("--stream-host", default="127.0.0.1", help="address to serve the stream on (default: %(default)s)")
+	parser.add_argument(
+		"--stream-keyframe",
+		type=int,
+		default=60,
+		metavar="N",
+		help="send a full keyframe every N input frames, deltas in between (default: %(default)s)",
+	)
+	parser.add_argument(
+		"--stream-origin",
+		action="append",
+		default=[],
+		metavar="ORIGIN",
+		help="extra allowed browser Origin prefix besides localhost and file:// pages (repeatable)",
+	)
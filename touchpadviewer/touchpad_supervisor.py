@@ -0,0 +1,610 @@
+#!/usr/bin/env python3
+import argparse
+import ctypes
+import gc
+import json
+import os
+import selectors
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+from touchpad_control import HEARTBEAT, MAX_MESSAGE, MSG_HEARTBEAT, MSG_PING, MSG_PONG, pack, unpack
+
+# Keeps one bridge runtime alive: starts it, watches it, restarts it, and shuts it down properly.
+#
+# The runtime's control socket (touchpad_control.py) gives liveness. Once the socket answers a
+# PING the bridge is ready (devices open, loop running). After that its HEARTBEATs must keep
+# arriving, or the bridge is considered hung. A pidfd reports the child's exit as it happens.
+# Restarts are immediate after a crash that followed a stable run. Repeated crashes back off
+# exponentially, so a station without a touchpad does not spin. SIGTERM, SIGINT and SIGHUP are
+# forwarded as SIGTERM; the runtime then ungrabs its devices and closes its virtual ones, and is
+# killed only if it does not exit within the grace period. SIGUSR1 (flight dump) is forwarded.
+# PR_SET_PDEATHSIG ties the supervisor to its parent and the bridge to the supervisor: if Godot
+# dies, the chain still shuts down in order.
+#
+# The supervisor imports the runtime once and forks each bridge from itself, so a (re)start skips
+# interpreter startup and module imports. --exec starts a fresh interpreter every time instead.
+
+PR_SET_PDEATHSIG = 1
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RUNTIME = os.path.join(HERE, "touchpad_runtime.py")
+CONNECT_INTERVAL = 0.01
+POLL_INTERVAL = 0.05
+
+
+def _prctl():
+	try:
+		return ctypes.CDLL(None, use_errno=True).prctl
+	except (OSError, AttributeError):
+		return None
+
+
+def set_parent_death_signal(sig=signal.SIGTERM):
+	# The kernel sends `sig` to this process when its parent exits. False if unsupported, or if
+	# the parent is already gone.
+	prctl = _prctl()
+	if prctl is None:
+		return False
+	ppid = os.getppid()
+	if prctl(PR_SET_PDEATHSIG, int(sig), 0, 0, 0) != 0:
+		return False
+	return ppid != 1
+
+
+def _child_setup(prctl, parent):
+	# Runs in the forked child before exec: die with the supervisor, even if it already died.
+	def setup():
+		prctl(PR_SET_PDEATHSIG, int(signal.SIGTERM), 0, 0, 0)
+		if os.getppid() != parent:
+			os._exit(1)
+
+	return setup
+
+
+def control_path_of(args):
+	# The --control PATH already in the runtime arguments, or None.
+	for i, arg in enumerate(args):
+		if arg == "--control" and i + 1 < len(args):
+			return args[i + 1]
+		if arg.startswith("--control="):
+			return arg.split("=", 1)[1]
+	return None
+
+
+def runtime_command(args):
+	# The runtime is imported rather than run as a script: Python never caches bytecode for
+	# __main__, and touchpad_runtime.py would otherwise be recompiled on every (re)start.
+	stub = (
+		f"import sys; sys.path[0] = {HERE!r}; sys.argv[0] = {RUNTIME!r}; "
+		"from touchpad_runtime import main; raise SystemExit(main())"
+	)
+	return [sys.executable, "-c", stub] + list(args)
+
+
+class ForkedBridge:
+	# The part of Popen the supervisor uses, for a bridge forked from this process.
+
+	__slots__ = ("pid", "returncode")
+
+	def __init__(self, pid):
+		self.pid = pid
+		self.returncode = None
+
+	def poll(self):
+		if self.returncode is None:
+			pid, status = os.waitpid(self.pid, os.WNOHANG)
+			if pid:
+				self.returncode = os.waitstatus_to_exitcode(status)
+		return self.returncode
+
+	def wait(self):
+		if self.returncode is None:
+			_, status = os.waitpid(self.pid, 0)
+			self.returncode = os.waitstatus_to_exitcode(status)
+		return self.returncode
+
+	def send_signal(self, sig):
+		if self.returncode is None:
+			os.kill(self.pid, sig)
+
+	def kill(self):
+		self.send_signal(signal.SIGKILL)
+
+
+def describe_exit(code):
+	if code is None:
+		return "running"
+	if code < 0:
+		try:
+			return f"killed by {signal.Signals(-code).name}"
+		except ValueError:
+			return f"killed by signal {-code}"
+	return f"exit code {code}"
+
+
+def restart_delay(failures, backoff_min, backoff_max):
+	# 0 for the first failure after a stable run, then backoff_min doubling up to backoff_max.
+	if failures <= 1:
+		return 0.0
+	return min(backoff_max, backoff_min * 2 ** (failures - 2))
+
+
+def _write_status(path, payload):
+	tmp = path + ".tmp"
+	try:
+		with open(tmp, "w", encoding="ascii") as f:
+			json.dump(payload, f)
+		os.replace(tmp, path)
+	except OSError:
+		pass
+
+
+class Supervisor:
+	# One bridge at a time, driven from a single selector: the child's pidfd, its control
+	# socket and the signal wakeup socket, with deadlines for connecting, heartbeats, the
+	# shutdown grace period and the restart backoff.
+
+	def __init__(
+		self,
+		runtime_args,
+		control_path,
+		heartbeat_timeout=2.0,
+		start_timeout=10.0,
+		grace=2.0,
+		backoff_min=0.1,
+		backoff_max=5.0,
+		stable=10.0,
+		restart="on-failure",
+		status_path=None,
+		main=None,
+	):
+		# main: the runtime's main(), already imported, to fork bridges from; None execs them.
+		self.runtime_args = list(runtime_args)
+		self.main = main
+		self.control_path = control_path
+		self.heartbeat_timeout = heartbeat_timeout
+		self.start_timeout = start_timeout
+		self.grace = grace
+		self.backoff_min = backoff_min
+		self.backoff_max = backoff_max
+		self.stable = stable
+		self.restart = restart
+		self.status_path = status_path
+		self.selector = selectors.DefaultSelector()
+		self.prctl = _prctl()
+		self.signal_socks = ()
+		self.old_handlers = {}
+		self.proc = None
+		self.pidfd = None
+		self.conn = None
+		# starting -> ready -> (exit) -> waiting -> starting ...; stopping while a child is asked
+		# to exit. `deadline` belongs to the current phase.
+		self.phase = None
+		self.deadline = None
+		self.spawned_at = 0.0
+		self.ready_at = None
+		self.last_beat = 0.0
+		self.frames = 0
+		self.hung = False
+		self.shutting_down = False
+		self.exit_code = 0
+		self.done = False
+		# Set when a bridge was lost; cleared when its replacement answers.
+		self.crashed_at = None
+		self.failures = 0
+		self.restarts = 0
+		self.last_exit = None
+		self.recoveries = []
+		self.started = time.monotonic()
+
+	def run(self):
+		rsock, wsock = socket.socketpair()
+		rsock.setblocking(False)
+		wsock.setblocking(False)
+		old_wakeup = signal.set_wakeup_fd(wsock.fileno())
+		handled = (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGUSR1)
+		# The handlers only need to exist; the signal numbers are read back from the wakeup socket.
+		old_handlers = {sig: signal.signal(sig, lambda signum, frame: None) for sig in handled}
+		self.signal_socks = (rsock, wsock)
+		self.old_handlers = old_handlers
+		self.selector.register(rsock, selectors.EVENT_READ, lambda: self._on_signals(rsock))
+		try:
+			self._spawn()
+			while not self.done:
+				timeout = None
+				if self.deadline is not None:
+					timeout = max(0.0, self.deadline - time.monotonic())
+				if self.pidfd is None and self.proc is not None:
+					timeout = POLL_INTERVAL if timeout is None else min(timeout, POLL_INTERVAL)
+				for key, _ in self.selector.select(timeout):
+					key.data()
+				if self.pidfd is None and self.proc is not None and self.proc.poll() is not None:
+					self._on_exit()
+				if self.deadline is not None and time.monotonic() >= self.deadline:
+					self._on_deadline()
+		finally:
+			if self.proc is not None and self.proc.poll() is None:
+				self.proc.kill()
+				self.proc.wait()
+			self._disconnect()
+			self.selector.close()
+			signal.set_wakeup_fd(old_wakeup)
+			for sig, handler in old_handlers.items():
+				signal.signal(sig, handler)
+			rsock.close()
+			wsock.close()
+			self._publish()
+		return self.exit_code
+
+	def _log(self, message):
+		print(f"supervisor: {message}", file=sys.stderr)
+
+	def _spawn(self):
+		try:
+			os.unlink(self.control_path)
+		except OSError:
+			pass
+		self.spawned_at = time.monotonic()
+		try:
+			if self.main is not None:
+				self.proc = self._fork()
+			else:
+				setup = _child_setup(self.prctl, os.getpid()) if self.prctl is not None else None
+				self.proc = subprocess.Popen(runtime_command(self.runtime_args), preexec_fn=setup)
+		except OSError as exc:
+			self._log(f"could not start the bridge ({exc})")
+			self.proc = None
+			self.failures += 1
+			self._schedule_restart()
+			return
+		self.ready_at = None
+		self.hung = False
+		try:
+			self.pidfd = os.pidfd_open(self.proc.pid)
+			self.selector.register(self.pidfd, selectors.EVENT_READ, self._on_exit)
+		except (AttributeError, OSError):
+			# No pidfd (old kernel): the loop polls instead.
+			self.pidfd = None
+		self.phase = "starting"
+		self.deadline = self.spawned_at + CONNECT_INTERVAL
+		self._publish()
+
+	def _fork(self):
+		parent = os.getpid()
+		for stream in (sys.stdout, sys.stderr):
+			stream.flush()
+		pid = os.fork()
+		if pid:
+			return ForkedBridge(pid)
+		# Child: drop the supervisor's descriptors and signal plumbing, then become the runtime.
+		code = 1
+		try:
+			signal.set_wakeup_fd(-1)
+			for sig, handler in self.old_handlers.items():
+				signal.signal(sig, handler)
+			# Closing an inherited epoll fd leaves the supervisor's registrations alone.
+			self.selector.close()
+			for sock in self.signal_socks:
+				sock.close()
+			if self.prctl is not None:
+				_child_setup(self.prctl, parent)()
+			sys.argv = [RUNTIME] + self.runtime_args
+			code = self.main()
+		except SystemExit as exc:
+			code = exc.code
+		except BaseException:
+			import traceback
+
+			traceback.print_exc()
+		finally:
+			if code is None:
+				code = 0
+			elif not isinstance(code, int):
+				print(code, file=sys.stderr)
+				code = 1
+			for stream in (sys.stdout, sys.stderr):
+				try:
+					stream.flush()
+				except Exception:
+					pass
+			os._exit(code)
+
+	def _connect(self):
+		sock = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+		try:
+			sock.connect(self.control_path)
+		except OSError:
+			sock.close()
+			return False
+		sock.setblocking(False)
+		self.conn = sock
+		self.selector.register(sock, selectors.EVENT_READ, self._on_control)
+		sock.send(pack(MSG_PING))
+		return True
+
+	def _disconnect(self):
+		if self.conn is not None:
+			self.selector.unregister(self.conn)
+			self.conn.close()
+			self.conn = None
+
+	def _on_control(self):
+		while self.conn is not None:
+			try:
+				packet = self.conn.recv(MAX_MESSAGE)
+			except (BlockingIOError, InterruptedError):
+				return
+			except OSError:
+				packet = b""
+			if not packet:
+				# The bridge closed its socket; its exit (or the heartbeat timeout) follows.
+				self._disconnect()
+				return
+			try:
+				msg_type, _, _, payload = unpack(packet)
+			except ValueError:
+				continue
+			now = time.monotonic()
+			if msg_type == MSG_HEARTBEAT and len(payload) == HEARTBEAT.size:
+				self.last_beat = now
+				self.frames = HEARTBEAT.unpack(payload)[1]
+			elif msg_type == MSG_PONG and self.phase == "starting":
+				self._on_ready(now)
+
+	def _on_ready(self, now):
+		self.phase = "ready"
+		self.ready_at = now
+		self.last_beat = now
+		self.deadline = now + self.heartbeat_timeout
+		startup = (now - self.spawned_at) * 1000
+		if self.crashed_at is not None:
+			recovery = (now - self.crashed_at) * 1000
+			self.recoveries.append(recovery)
+			self.crashed_at = None
+			self._log(f"bridge {self.proc.pid} recovered {recovery:.0f} ms after the failure (startup {startup:.0f} ms)")
+		else:
+			self._log(f"bridge {self.proc.pid} ready after {startup:.0f} ms")
+		self._publish()
+
+	def _on_deadline(self):
+		now = time.monotonic()
+		if self.phase == "starting":
+			if now - self.spawned_at >= self.start_timeout:
+				self._hang(f"no answer on {self.control_path} within {self.start_timeout:g} s")
+			elif self.conn is None and not self._connect():
+				self.deadline = now + CONNECT_INTERVAL
+			else:
+				self.deadline = self.spawned_at + self.start_timeout
+		elif self.phase == "ready":
+			if now - self.last_beat >= self.heartbeat_timeout:
+				self._hang(f"no heartbeat for {now - self.last_beat:.1f} s")
+			else:
+				self.deadline = self.last_beat + self.heartbeat_timeout
+		elif self.phase == "stopping":
+			self._log(f"bridge {self.proc.pid} still running {self.grace:g} s after SIGTERM; killing it")
+			self.proc.kill()
+			self.deadline = None
+		elif self.phase == "waiting":
+			self.deadline = None
+			self._spawn()
+
+	def _hang(self, reason):
+		self._log(f"bridge {self.proc.pid} looks hung ({reason}); stopping it")
+		self.hung = True
+		self.crashed_at = time.monotonic()
+		self._terminate()
+
+	def _terminate(self):
+		self.phase = "stopping"
+		self.deadline = time.monotonic() + self.grace
+		try:
+			self.proc.send_signal(signal.SIGTERM)
+		except OSError:
+			pass
+
+	def _on_exit(self):
+		now = time.monotonic()
+		code = self.proc.wait()
+		if self.pidfd is not None:
+			self.selector.unregister(self.pidfd)
+			os.close(self.pidfd)
+			self.pidfd = None
+		self._disconnect()
+		self.last_exit = code
+		if self.shutting_down:
+			self._log(f"bridge {self.proc.pid} stopped ({describe_exit(code)})")
+			self.proc = None
+			self.done = True
+			return
+		failed = self.hung or code != 0
+		if not failed and self.restart == "on-failure":
+			self._log(f"bridge {self.proc.pid} finished ({describe_exit(code)})")
+			self.proc = None
+			self.exit_code = code
+			self.done = True
+			return
+		if self.crashed_at is None:
+			self.crashed_at = now
+		if self.ready_at is not None and now - self.ready_at >= self.stable:
+			self.failures = 1
+		else:
+			self.failures += 1
+		reason = "after a hang" if self.hung else describe_exit(code)
+		self._log(f"bridge {self.proc.pid} lost ({reason})")
+		self.proc = None
+		self._schedule_restart()
+
+	def _schedule_restart(self):
+		if self.crashed_at is None:
+			self.crashed_at = time.monotonic()
+		delay = restart_delay(max(self.failures, 1), self.backoff_min, self.backoff_max)
+		self.restarts += 1
+		self._log(f"restart {self.restarts} in {delay * 1000:.0f} ms")
+		if delay == 0:
+			self._spawn()
+			return
+		self.phase = "waiting"
+		self.deadline = time.monotonic() + delay
+		self._publish()
+
+	def _on_signals(self, rsock):
+		try:
+			received = rsock.recv(64)
+		except (BlockingIOError, InterruptedError):
+			return
+		for signum in received:
+			if signum == signal.SIGUSR1:
+				if self.proc is not None:
+					self.proc.send_signal(signal.SIGUSR1)
+			elif not self.shutting_down:
+				self.shutdown(signum)
+			elif self.proc is not None:
+				# Asked twice: do not wait out the grace period.
+				self.proc.kill()
+
+	def _publish(self):
+		if self.status_path is None:
+			return
+		recoveries = sorted(self.recoveries)
+		_write_status(
+			self.status_path,
+			{
+				"pid": self.proc.pid if self.proc is not None else None,
+				"phase": self.phase,
+				"restarts": self.restarts,
+				"last_exit": self.last_exit,
+				"recoveries": len(recoveries),
+				"recovery_ms_last": self.recoveries[-1] if recoveries else None,
+				"recovery_ms_p50": recoveries[len(recoveries) // 2] if recoveries else None,
+				"recovery_ms_max": recoveries[-1] if recoveries else None,
+				"uptime_s": time.monotonic() - self.started,
+			},
+		)
+
+	def shutdown(self, signum):
+		self.shutting_down = True
+		if self.proc is None:
+			self.done = True
+			return
+		self._log(f"{signal.Signals(signum).name}: stopping bridge {self.proc.pid}")
+		self._terminate()
+
+	def summary(self):
+		if not self.recoveries:
+			return f"{self.restarts} restarts"
+		recoveries = sorted(self.recoveries)
+		return (
+			f"{self.restarts} restarts, {len(recoveries)} recoveries: "
+			f"p50 {recoveries[len(recoveries) // 2]:.0f} ms  max {recoveries[-1]:.0f} ms"
+		)
+
+
+def main():
+	parser = argparse.ArgumentParser(
+		description="Run the bridge runtime, restart it when it crashes or hangs, stop it cleanly on SIGTERM",
+		usage="%(prog)s [options] -- RUNTIME ARGS...",
+	)
+	parser.add_argument(
+		"--heartbeat-timeout",
+		type=float,
+		default=2.0,
+		help="seconds without a control socket heartbeat before the bridge counts as hung (default: %(default)s)",
+	)
+	parser.add_argument(
+		"--start-timeout",
+		type=float,
+		default=10.0,
+		help="seconds a new bridge may take to answer on its control socket (default: %(default)s)",
+	)
+	parser.add_argument(
+		"--grace",
+		type=float,
+		default=2.0,
+		help="seconds between SIGTERM and SIGKILL when stopping the bridge (default: %(default)s)",
+	)
+	parser.add_argument("--backoff-min", type=float, default=0.1, help="first non-zero restart delay in seconds")
+	parser.add_argument("--backoff-max", type=float, default=5.0, help="longest restart delay in seconds")
+	parser.add_argument(
+		"--stable",
+		type=float,
+		default=10.0,
+		help="seconds a bridge must run before its next crash restarts it immediately again (default: %(default)s)",
+	)
+	parser.add_argument(
+		"--restart",
+		choices=("on-failure", "always"),
+		default="on-failure",
+		help="on-failure: a bridge that exits with code 0 (e.g. a replayed trace ended) is not restarted",
+	)
+	parser.add_argument("--status", metavar="PATH", help="JSON status file rewritten on every change")
+	parser.add_argument(
+		"--exec",
+		action="store_true",
+		help="start every bridge in a fresh interpreter instead of forking it from the preloaded runtime",
+	)
+	parser.add_argument("runtime_args", nargs=argparse.REMAINDER, help="arguments for touchpad_runtime.py")
+	args = parser.parse_args()
+
+	runtime_args = args.runtime_args
+	if runtime_args[:1] == ["--"]:
+		runtime_args = runtime_args[1:]
+	if not runtime_args:
+		parser.error("nothing to run: pass the runtime arguments after --")
+
+	if not set_parent_death_signal():
+		print("supervisor: warning: not tied to the parent process (PR_SET_PDEATHSIG)", file=sys.stderr)
+
+	private_dir = None
+	control_path = control_path_of(runtime_args)
+	if control_path is None:
+		# Liveness needs the control socket; give the bridge a private one.
+		import tempfile
+
+		private_dir = tempfile.mkdtemp(prefix="touchpad-supervisor-")
+		control_path = os.path.join(private_dir, "control.sock")
+		runtime_args = runtime_args + ["--control", control_path]
+
+	bridge_main = None
+	if not args.exec:
+		try:
+			from touchpad_runtime import main as bridge_main
+		except ImportError as exc:
+			print(f"supervisor: warning: could not preload the runtime ({exc}); using --exec", file=sys.stderr)
+		else:
+			# Everything imported so far lives as long as the supervisor: keep the collector from
+			# touching (and un-sharing) those pages in every forked bridge.
+			gc.collect()
+			gc.freeze()
+
+	supervisor = Supervisor(
+		runtime_args,
+		control_path,
+		heartbeat_timeout=args.heartbeat_timeout,
+		start_timeout=args.start_timeout,
+		grace=args.grace,
+		backoff_min=args.backoff_min,
+		backoff_max=args.backoff_max,
+		stable=args.stable,
+		restart=args.restart,
+		status_path=args.status,
+		main=bridge_main,
+	)
+	try:
+		code = supervisor.run()
+	finally:
+		if private_dir is not None:
+			try:
+				os.unlink(control_path)
+			except OSError:
+				pass
+			os.rmdir(private_dir)
+	print(f"supervisor: {supervisor.summary()}", file=sys.stderr)
+	return code
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
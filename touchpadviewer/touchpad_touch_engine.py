@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+# Frame processor for the touchpad -> virtual touchscreen bridge.
+# Rescales MT protocol B events from pad coordinates to screen pixels and forwards them to a
+# sink with the UInput write()/syn() interface. No evdev, device or clock access.
+
+EV_SYN = 0x00
+EV_KEY = 0x01
+EV_ABS = 0x03
+SYN_REPORT = 0
+
+ABS_X = 0x00
+ABS_Y = 0x01
+ABS_MT_SLOT = 0x2F
+ABS_MT_POSITION_X = 0x35
+ABS_MT_POSITION_Y = 0x36
+ABS_MT_TRACKING_ID = 0x39
+
+BTN_TOOL_FINGER = 0x145
+BTN_TOUCH = 0x14A
+
+
+def scale(value, in_min, in_max, out_max):
+	if in_max == in_min:
+		return 0
+	# Clamp then scale to [0, out_max-1].
+	v = max(in_min, min(in_max, value))
+	return int((v - in_min) * (out_max - 1) / (in_max - in_min))
+
+
+class TouchscreenEngine:
+	__slots__ = (
+		"sink",
+		"x_min",
+		"x_max",
+		"y_min",
+		"y_max",
+		"screen_w",
+		"screen_h",
+		"current_slot",
+		"active",
+		"last_x",
+		"last_y",
+	)
+
+	def __init__(self, x_min, x_max, y_min, y_max, screen_w, screen_h, sink):
+		self.sink = sink
+		self.x_min = x_min
+		self.x_max = x_max
+		self.y_min = y_min
+		self.y_max = y_max
+		self.screen_w = screen_w
+		self.screen_h = screen_h
+		self.reset()
+
+	@classmethod
+	def from_absinfo(cls, abs_x, abs_y, screen_w, screen_h, sink):
+		return cls(abs_x.min, abs_x.max, abs_y.min, abs_y.max, screen_w, screen_h, sink)
+
+	def reset(self):
+		self.current_slot = 0
+		# Bit n set while slot n holds a contact.
+		self.active = 0
+		self.last_x = 0
+		self.last_y = 0
+
+	def feed(self, event):
+		self.feed_values(event.type, event.code, event.value)
+
+	def feed_values(self, etype, code, value):
+		if etype == EV_ABS:
+			write = self.sink.write
+			if code == ABS_MT_SLOT:
+				self.current_slot = value
+				write(etype, code, value)
+			elif code == ABS_MT_TRACKING_ID:
+				# TRACKING_ID == -1 indicates slot release.
+				slot = self.current_slot
+				if slot >= 0:
+					if value == -1:
+						self.active &= ~(1 << slot)
+					else:
+						self.active |= 1 << slot
+				write(etype, code, value)
+			elif code == ABS_MT_POSITION_X:
+				x = scale(value, self.x_min, self.x_max, self.screen_w)
+				self.last_x = x
+				write(etype, code, x)
+				write(EV_ABS, ABS_X, x)
+			elif code == ABS_MT_POSITION_Y:
+				y = scale(value, self.y_min, self.y_max, self.screen_h)
+				self.last_y = y
+				write(etype, code, y)
+				write(EV_ABS, ABS_Y, y)
+			else:
+				# Pass through any other ABS_MT_* codes untouched.
+				write(etype, code, value)
+		elif etype == EV_SYN and code == SYN_REPORT:
+			self.on_syn()
+		# Ignore non-ABS and non-SYN events for this minimal bridge.
+
+	def resync(self, state):
+		# Corrective frame after SYN_DROPPED: restate every slot from a device snapshot
+		# (touchpad_mt_sync.MTState) and rebuild the active slot mask.
+		write = self.sink.write
+		active = 0
+		for s, tracking_id in enumerate(state.tracking_ids):
+			write(EV_ABS, ABS_MT_SLOT, s)
+			write(EV_ABS, ABS_MT_TRACKING_ID, tracking_id)
+			if tracking_id == -1:
+				continue
+			active |= 1 << s
+			self.last_x = scale(state.xs[s], self.x_min, self.x_max, self.screen_w)
+			self.last_y = scale(state.ys[s], self.y_min, self.y_max, self.screen_h)
+			write(EV_ABS, ABS_MT_POSITION_X, self.last_x)
+			write(EV_ABS, ABS_MT_POSITION_Y, self.last_y)
+		write(EV_ABS, ABS_MT_SLOT, state.slot)
+		if active:
+			write(EV_ABS, ABS_X, self.last_x)
+			write(EV_ABS, ABS_Y, self.last_y)
+		self.current_slot = state.slot
+		self.active = active
+		self.on_syn()
+
+	def on_syn(self):
+		# Update BTN_TOUCH based on whether any slots are active.
+		sink = self.sink
+		active_flag = 1 if self.active else 0
+		sink.write(EV_KEY, BTN_TOUCH, active_flag)
+		sink.write(EV_KEY, BTN_TOOL_FINGER, active_flag)
+		sink.syn()
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+import json
+import os
+import struct
+import time
+from collections import namedtuple
+
+# Compact binary evdev traces for recording a touchpad and replaying it without hardware.
+#
+# File layout:
+#   header   8s magic, u32 version, u32 metadata length
+#   metadata UTF-8 JSON (device identity, absinfo, capabilities), zero padded to 16 bytes
+#   records  fixed 16-byte little-endian (u32 sec, u32 usec, u16 type, u16 code, i32 value)
+#
+# Fixed-size records keep the file appendable while recording and let analysis tools
+# memory-map the event section directly.
+
+MAGIC = b"TPTRACE\0"
+VERSION = 1
+
+EV_SYN = 0x00
+EV_ABS = 0x03
+SYN_REPORT = 0
+
+_HEADER = struct.Struct("<8sII")
+RECORD = struct.Struct("<IIHHi")
+RECORD_SIZE = RECORD.size
+
+TraceEvent = namedtuple("TraceEvent", "sec usec type code value")
+AbsInfo = namedtuple("AbsInfo", "value min max fuzz flat resolution")
+DeviceInfo = namedtuple("DeviceInfo", "bustype vendor product version")
+
+
+def device_metadata(dev):
+	meta = {
+		"name": dev.name,
+		"path": dev.path,
+		"phys": getattr(dev, "phys", ""),
+		"uniq": getattr(dev, "uniq", ""),
+		"info": list(dev.info),
+		"absinfo": {},
+		"capabilities": {},
+	}
+	for etype, codes in dev.capabilities(absinfo=True).items():
+		plain = []
+		for c in codes:
+			if isinstance(c, tuple):
+				code, info = c
+				meta["absinfo"][str(code)] = list(info)
+				plain.append(code)
+			else:
+				plain.append(c)
+		meta["capabilities"][str(etype)] = plain
+	return meta
+
+
+def encode_header(meta):
+	# Header plus padded metadata; records follow directly.
+	blob = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+	blob += b"\0" * (-(_HEADER.size + len(blob)) % 16)
+	return _HEADER.pack(MAGIC, VERSION, len(blob)) + blob
+
+
+class TraceWriter:
+	def __init__(self, path, meta):
+		self.path = path
+		self.events = 0
+		self._f = open(path, "wb")
+		self._f.write(encode_header(meta))
+		self._pack = RECORD.pack
+		self._write = self._f.write
+
+	def write(self, sec, usec, etype, code, value):
+		self._write(self._pack(sec, usec, etype, code, value))
+		self.events += 1
+
+	def write_event(self, event):
+		self._write(self._pack(event.sec, event.usec, event.type, event.code, event.value))
+		self.events += 1
+
+	def flush(self):
+		self._f.flush()
+
+	def close(self):
+		if not self._f.closed:
+			self._f.close()
+
+
+def read_header(f):
+	magic, version, meta_len = _HEADER.unpack(f.read(_HEADER.size))
+	if magic != MAGIC:
+		raise ValueError("not a touchpad trace file")
+	if version != VERSION:
+		raise ValueError(f"unsupported trace version {version}")
+	meta = json.loads(f.read(meta_len).rstrip(b"\0").decode("utf-8"))
+	return meta, _HEADER.size + meta_len
+
+
+def iter_records(path, chunk_records=4096):
+	# Yields plain (sec, usec, type, code, value) tuples.
+	with open(path, "rb") as f:
+		read_header(f)
+		chunk = RECORD_SIZE * chunk_records
+		while True:
+			data = f.read(chunk)
+			if not data:
+				break
+			tail = len(data) % RECORD_SIZE
+			if tail:
+				# Truncated last record (recording interrupted mid-write).
+				data = data[:-tail]
+			yield from RECORD.iter_unpack(data)
+			if tail:
+				break
+
+
+class RecordingDevice:
+	# Wraps an InputDevice and appends every event read through read_loop() to a trace.
+
+	def __init__(self, dev, path):
+		self._dev = dev
+		self.writer = TraceWriter(path, device_metadata(dev))
+
+	def __getattr__(self, name):
+		return getattr(self._dev, name)
+
+	def read_loop(self):
+		write = self.writer.write
+		try:
+			for event in self._dev.read_loop():
+				write(event.sec, event.usec, event.type, event.code, event.value)
+				yield event
+		finally:
+			self.writer.close()
+
+	def frames(self, timeout=None):
+		from touchpad_reader import DROPPED, SYN_DROPPED, FrameReader
+
+		write = self.writer.write
+		last = (0, 0)
+		try:
+			for frame in FrameReader(self._dev.fd).frames(timeout):
+				if frame is DROPPED:
+					# The dropped events never reached us; keep the marker so replay resyncs too.
+					write(last[0], last[1], EV_SYN, SYN_DROPPED, 0)
+					write(last[0], last[1], EV_SYN, SYN_REPORT, 0)
+				elif frame is not None:
+					for rec in frame:
+						write(*rec)
+					last = frame[-1]
+				yield frame
+		finally:
+			self.writer.close()
+
+	def close(self):
+		self.writer.close()
+		self._dev.close()
+
+
+class ReplayDevice:
+	# Stands in for evdev.InputDevice, feeding a recorded trace to the bridge loop.
+	# speed 1.0 replays in real time, N replays N times faster and 0 as fast as possible.
+
+	def __init__(self, path, speed=1.0):
+		self.trace_path = path
+		self.speed = speed
+		with open(path, "rb") as f:
+			self.meta, self.data_offset = read_header(f)
+		self.path = self.meta.get("path", path)
+		self.name = self.meta.get("name", "replay")
+		self.phys = self.meta.get("phys", "")
+		self.uniq = self.meta.get("uniq", "")
+		self.info = DeviceInfo(*self.meta.get("info", (0, 0, 0, 0)))
+		self.fd = None
+		self.position = 0
+		self._absinfo = {int(k): AbsInfo(*v) for k, v in self.meta.get("absinfo", {}).items()}
+
+	def absinfo(self, code):
+		return self._absinfo[code]
+
+	def capabilities(self, verbose=False, absinfo=True):
+		caps = {}
+		for etype, codes in self.meta.get("capabilities", {}).items():
+			etype = int(etype)
+			if etype == EV_ABS and absinfo:
+				caps[etype] = [(c, self._absinfo[c]) for c in codes if c in self._absinfo]
+			else:
+				caps[etype] = list(codes)
+		return caps
+
+	def grab(self):
+		pass
+
+	def ungrab(self):
+		pass
+
+	def close(self):
+		pass
+
+	def mt_state(self, num_slots):
+		# Device state at the current replay position, for SYN_DROPPED resync.
+		from itertools import islice
+
+		from touchpad_mt_sync import replay_mt_state
+
+		return replay_mt_state(islice(iter_records(self.trace_path), self.position), num_slots)
+
+	def records(self):
+		# Raw records in order, tracking the position for mt_state().
+		self.position = 0
+		for rec in iter_records(self.trace_path):
+			self.position += 1
+			yield rec
+
+	def frames(self, timeout=None):
+		# SYN-delimited frames paced like read_loop(); yields None while waiting longer than
+		# `timeout` for the next frame, as the live reader would.
+		from touchpad_reader import DROPPED, frame_records
+
+		speed = self.speed
+		start = None
+		t0 = 0.0
+		for frame in frame_records(self.records()):
+			if speed > 0 and frame is not DROPPED:
+				ts = frame[-1][0] + frame[-1][1] * 1e-6
+				if start is None:
+					start = time.monotonic()
+					t0 = ts
+				while True:
+					delay = (ts - t0) / speed - (time.monotonic() - start)
+					if delay <= 0:
+						break
+					if timeout is not None and delay > timeout:
+						time.sleep(timeout)
+						yield None
+					else:
+						time.sleep(delay)
+			yield frame
+
+	def read_loop(self):
+		speed = self.speed
+		start = None
+		t0 = 0.0
+		self.position = 0
+		for rec in iter_records(self.trace_path):
+			self.position += 1
+			if speed > 0 and rec[2] == EV_SYN and rec[3] == SYN_REPORT:
+				ts = rec[0] + rec[1] * 1e-6
+				if start is None:
+					start = time.monotonic()
+					t0 = ts
+				else:
+					delay = (ts - t0) / speed - (time.monotonic() - start)
+					if delay > 0:
+						time.sleep(delay)
+			yield TraceEvent(*rec)
+
+
+class NullSink:
+	# Drop-in for UInput that discards output and only counts it.
+
+	def __init__(self):
+		self.writes = 0
+		self.frames = 0
+
+	def write(self, etype, code, value):
+		self.writes += 1
+
+	def syn(self):
+		self.frames += 1
+
+	def close(self):
+		pass
+
+
+class MemorySink:
+	# Drop-in for UInput that keeps every emitted frame as a list of (type, code, value).
+
+	def __init__(self):
+		self.frames = []
+		self._pending = []
+
+	def write(self, etype, code, value):
+		self._pending.append((etype, code, value))
+
+	def syn(self):
+		self.frames.append(self._pending)
+		self._pending = []
+
+	def close(self):
+		pass
+
+
+def open_sink(kind, make_uinput):
+	if kind == "null":
+		return NullSink()
+	if kind == "memory":
+		return MemorySink()
+	return make_uinput()
+
+
+def describe_sink(sink):
+	if isinstance(sink, NullSink):
+		return f"null sink: {sink.frames} frames, {sink.writes} writes"
+	if isinstance(sink, MemorySink):
+		return f"memory sink: {len(sink.frames)} frames, {sum(len(f) for f in sink.frames)} writes"
+	return None
+
+
+def main():
+	import argparse
+
+	parser = argparse.ArgumentParser(description="Inspect a recorded touchpad trace")
+	parser.add_argument("trace")
+	parser.add_argument("--dump", action="store_true", help="print every event")
+	args = parser.parse_args()
+
+	with open(args.trace, "rb") as f:
+		meta, offset = read_header(f)
+	size = os.path.getsize(args.trace) - offset
+	print(f"device: {meta.get('name')} ({meta.get('path')})")
+	print(f"events: {size // RECORD_SIZE}")
+	frames = 0
+	first = last = None
+	for rec in iter_records(args.trace):
+		if args.dump:
+			print("{}.{:06d} type={} code={} value={}".format(*rec))
+		if rec[2] == EV_SYN and rec[3] == SYN_REPORT:
+			frames += 1
+			ts = rec[0] + rec[1] * 1e-6
+			if first is None:
+				first = ts
+			last = ts
+	print(f"frames: {frames}")
+	if first is not None and last > first:
+		print(f"duration: {last - first:.3f}s ({(frames - 1) / (last - first):.1f} Hz)")
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
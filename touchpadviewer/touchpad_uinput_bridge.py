@@ -2,7 +2,14 @@
 import argparse
 import os
 import sys
-from evdev import AbsInfo, InputDevice, UInput, ecodes, list_devices
+import time
+from evdev import AbsInfo, InputDevice, UInput, ecodes
+
+from touchpad_discovery import DeviceWatcher, find_touchpad_device, identity_of
+from touchpad_mt_sync import MTState, SyncStats, resync
+from touchpad_reader import DROPPED, open_frames
+from touchpad_realtime import add_arguments as add_realtime_arguments
+from touchpad_touch_engine import TouchscreenEngine
 
 # Minimal Linux multitouch-to-uinput bridge for Godot.
 # Reads MT protocol B slots from a touchpad device and emits a virtual touchscreen.
@@ -17,46 +24,28 @@ def read_screen_size():
 		return None
 
 
-def scale(value, in_min, in_max, out_max):
-	if in_max == in_min:
-		return 0
-	# Clamp then scale to [0, out_max-1].
-	v = max(in_min, min(in_max, value))
-	return int((v - in_min) * (out_max - 1) / (in_max - in_min))
-
-def is_mt_device(dev):
-	caps = dev.capabilities().get(ecodes.EV_ABS, [])
-	abs_codes = {c if isinstance(c, int) else c[0] for c in caps}
-	return (
-		ecodes.ABS_MT_SLOT in abs_codes
-		and ecodes.ABS_MT_POSITION_X in abs_codes
-		and ecodes.ABS_MT_POSITION_Y in abs_codes
-	)
-
-def find_touchpad_device(name_hint=None):
-	candidates = []
-	for path in list_devices():
-		dev = InputDevice(path)
-		if not is_mt_device(dev):
-			continue
-		candidates.append(dev)
-
-	if not candidates:
-		return None
-
-	if name_hint:
-		hint = name_hint.lower()
-		for dev in candidates:
-			if hint in dev.name.lower():
-				return dev
+def touchscreen_capabilities(dev, screen_w, screen_h):
+	abs_x = dev.absinfo(ecodes.ABS_MT_POSITION_X)
+	abs_y = dev.absinfo(ecodes.ABS_MT_POSITION_Y)
+	abs_slot = dev.absinfo(ecodes.ABS_MT_SLOT)
 
-	# Prefer devices whose names look like touchpads.
-	for dev in candidates:
-		n = dev.name.lower()
-		if "touchpad" in n or "trackpad" in n:
-			return dev
+	# Use the device's TRACKING_ID range; -1 is still allowed to signal release.
+	abs_tracking = dev.absinfo(ecodes.ABS_MT_TRACKING_ID)
+	tracking_min = abs_tracking.min
+	tracking_max = abs_tracking.max
 
-	return candidates[0]
+	# Virtual touchscreen capabilities (MT protocol B + legacy ABS_X/Y).
+	return {
+		ecodes.EV_ABS: [
+			(ecodes.ABS_MT_SLOT, AbsInfo(abs_slot.value, abs_slot.min, abs_slot.max, 0, 0, abs_slot.resolution)),
+			(ecodes.ABS_MT_POSITION_X, AbsInfo(0, 0, screen_w - 1, 0, 0, abs_x.resolution)),
+			(ecodes.ABS_MT_POSITION_Y, AbsInfo(0, 0, screen_h - 1, 0, 0, abs_y.resolution)),
+			(ecodes.ABS_MT_TRACKING_ID, AbsInfo(abs_tracking.value, tracking_min, tracking_max, 0, 0, abs_tracking.resolution)),
+			(ecodes.ABS_X, AbsInfo(0, 0, screen_w - 1, 0, 0, abs_x.resolution)),
+			(ecodes.ABS_Y, AbsInfo(0, 0, screen_h - 1, 0, 0, abs_y.resolution)),
+		],
+		ecodes.EV_KEY: [ecodes.BTN_TOUCH, ecodes.BTN_TOOL_FINGER],
+	}
 
 
 def main():
@@ -65,10 +54,29 @@ def main():
 	parser.add_argument("--auto", action="store_true", help="auto-detect a touchpad device")
 	parser.add_argument("--name", help="name substring to match for auto-detect")
 	parser.add_argument("--screen", help="screen size WxH, e.g. 1920x1080")
+	parser.add_argument("--record", metavar="FILE", help="record the raw event stream to a trace file")
+	parser.add_argument("--replay", metavar="FILE", help="read events from a recorded trace instead of a device")
+	parser.add_argument(
+		"--speed",
+		type=float,
+		default=1.0,
+		help="replay speed multiplier; 0 replays as fast as possible (default: 1.0)",
+	)
+	parser.add_argument(
+		"--sink",
+		choices=("uinput", "null", "memory"),
+		default="uinput",
+		help="output sink; null/memory stand in for the virtual touchscreen",
+	)
+	add_realtime_arguments(parser)
 	args = parser.parse_args()
 
 	dev = None
-	if args.device:
+	if args.replay:
+		from touchpad_trace import ReplayDevice
+
+		dev = ReplayDevice(args.replay, args.speed)
+	elif args.device:
 		dev = InputDevice(args.device)
 	else:
 		if not args.auto and not args.name:
@@ -92,75 +100,98 @@ def main():
 			return 1
 		screen_w, screen_h = size
 
+	if args.record:
+		from touchpad_trace import RecordingDevice
+
+		dev = RecordingDevice(dev, args.record)
+
 	abs_x = dev.absinfo(ecodes.ABS_MT_POSITION_X)
 	abs_y = dev.absinfo(ecodes.ABS_MT_POSITION_Y)
 	abs_slot = dev.absinfo(ecodes.ABS_MT_SLOT)
+	capabilities = touchscreen_capabilities(dev, screen_w, screen_h)
 
-	# Use the device's TRACKING_ID range; -1 is still allowed to signal release.
-	abs_tracking = dev.absinfo(ecodes.ABS_MT_TRACKING_ID)
-	tracking_min = abs_tracking.min
-	tracking_max = abs_tracking.max
-
-	# Virtual touchscreen capabilities (MT protocol B + legacy ABS_X/Y).
-	capabilities = {
-		ecodes.EV_ABS: [
-			(ecodes.ABS_MT_SLOT, AbsInfo(abs_slot.value, abs_slot.min, abs_slot.max, 0, 0, abs_slot.resolution)),
-			(ecodes.ABS_MT_POSITION_X, AbsInfo(0, 0, screen_w - 1, 0, 0, abs_x.resolution)),
-			(ecodes.ABS_MT_POSITION_Y, AbsInfo(0, 0, screen_h - 1, 0, 0, abs_y.resolution)),
-			(ecodes.ABS_MT_TRACKING_ID, AbsInfo(abs_tracking.value, tracking_min, tracking_max, 0, 0, abs_tracking.resolution)),
-			(ecodes.ABS_X, AbsInfo(0, 0, screen_w - 1, 0, 0, abs_x.resolution)),
-			(ecodes.ABS_Y, AbsInfo(0, 0, screen_h - 1, 0, 0, abs_y.resolution)),
-		],
-		ecodes.EV_KEY: [ecodes.BTN_TOUCH, ecodes.BTN_TOOL_FINGER],
-	}
-
-	ui = UInput(capabilities, name="touchpad-virtual-touchscreen", bustype=dev.info.bustype)
+	def _make_uinput():
+		return UInput(capabilities, name="touchpad-virtual-touchscreen", bustype=dev.info.bustype)
 
-	current_slot = 0
-	active_touches = 0
-	last_x = 0
-	last_y = 0
+	if args.sink == "uinput":
+		ui = _make_uinput()
+	else:
+		from touchpad_trace import open_sink
+
+		ui = open_sink(args.sink, _make_uinput)
+
+	engine = TouchscreenEngine.from_absinfo(abs_x, abs_y, screen_w, screen_h, ui)
+	feed = engine.feed_values
+	num_slots = abs_slot.max + 1
+	sync_stats = SyncStats()
+	# Live devices are followed across unplug/replug and suspend; the virtual touchscreen stays.
+	watcher = None if args.replay or args.record else DeviceWatcher(identity_of(dev))
+
+	def _frames():
+		# open_frames() that outlives the touchpad: all contacts are lifted while it is gone and
+		# restated from the device once it is back.
+		nonlocal dev
+		while True:
+			try:
+				yield from open_frames(dev, timeout)
+				return
+			except OSError as exc:
+				if watcher is None:
+					raise
+				print(f"Lost {dev.path} ({exc}); waiting for it to come back", file=sys.stderr)
+			try:
+				dev.close()
+			except OSError:
+				pass
+			engine.resync(MTState(0, [-1] * num_slots, [0] * num_slots, [0] * num_slots, set()))
+			lost_at = time.monotonic()
+			dev = watcher.wait()
+			resync(dev, num_slots, engine.resync, sync_stats)
+			print(
+				f"Rebound {dev.path} ({dev.name}) after {(time.monotonic() - lost_at) * 1000:.0f} ms",
+				file=sys.stderr,
+			)
+
+	idle_gc = None
+	if args.realtime:
+		from touchpad_realtime import enter_realtime
+
+		idle_gc = enter_realtime(args.rt_priority, args.rt_cpus, args.rt_gc)
+	# Without an idle collector there is nothing to do between frames, so block indefinitely.
+	timeout = 0.1 if idle_gc is not None else None
 
 	try:
-		for event in dev.read_loop():
-			if event.type == ecodes.EV_ABS:
-				if event.code == ecodes.ABS_MT_SLOT:
-					current_slot = event.value
-					ui.write(event.type, event.code, event.value)
-				elif event.code == ecodes.ABS_MT_TRACKING_ID:
-					# TRACKING_ID == -1 indicates slot release.
-					if event.value == -1:
-						active_touches = max(0, active_touches - 1)
-					else:
-						active_touches += 1
-					ui.write(event.type, event.code, event.value)
-				elif event.code == ecodes.ABS_MT_POSITION_X:
-					x = scale(event.value, abs_x.min, abs_x.max, screen_w)
-					last_x = x
-					ui.write(event.type, event.code, x)
-					ui.write(ecodes.EV_ABS, ecodes.ABS_X, x)
-				elif event.code == ecodes.ABS_MT_POSITION_Y:
-					y = scale(event.value, abs_y.min, abs_y.max, screen_h)
-					last_y = y
-					ui.write(event.type, event.code, y)
-					ui.write(ecodes.EV_ABS, ecodes.ABS_Y, y)
-				else:
-					# Pass through any other ABS_MT_* codes untouched.
-					ui.write(event.type, event.code, event.value)
-
-			elif event.type == ecodes.EV_SYN and event.code == ecodes.SYN_REPORT:
-				# Update BTN_TOUCH based on whether any slots are active.
-				active_flag = 1 if active_touches > 0 else 0
-				ui.write(ecodes.EV_KEY, ecodes.BTN_TOUCH, active_flag)
-				ui.write(ecodes.EV_KEY, ecodes.BTN_TOOL_FINGER, active_flag)
-				ui.syn()
-			else:
-				# Ignore non-ABS and non-SYN events for this minimal bridge.
-				pass
+		for events in _frames():
+			if events is None:
+				idle_gc.idle()
+				continue
+			if events is DROPPED:
+				# Kernel buffer overrun: restate every slot from the device instead.
+				sync_stats.drops += 1
+				resync(dev, num_slots, engine.resync, sync_stats)
+				print(
+					f"SYN_DROPPED #{sync_stats.drops}: resynced in {sync_stats.last_us:.0f} us",
+					file=sys.stderr,
+				)
+				continue
+			for _, _, etype, code, value in events:
+				feed(etype, code, value)
+			if idle_gc is not None:
+				idle_gc.frame()
 	except KeyboardInterrupt:
 		pass
 	finally:
 		ui.close()
+		if args.sink != "uinput":
+			from touchpad_trace import describe_sink
+
+			print(describe_sink(ui), file=sys.stderr)
+		if args.record:
+			dev.close()
+		if sync_stats.drops:
+			print(f"sync: {sync_stats.as_dict()}", file=sys.stderr)
+		if watcher is not None:
+			watcher.close()
 
 	return 0
 